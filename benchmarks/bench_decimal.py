@@ -0,0 +1,61 @@
+"""Latency of the DECIMAL number mode at 50, 200 and 1000 significant digits.
+
+"cold" includes computing π and e for a new precision; "warm" reuses the
+per-precision cache, which is the steady state in the GUI.
+
+Run from the repository root:
+
+    python benchmarks/bench_decimal.py
+"""
+import sys
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from calculator import decimal_math  # noqa: E402
+from calculator.logic import Evaluator  # noqa: E402
+
+DIGITS = (50, 200, 1000)
+
+EXPRESSIONS = {
+    "arithmetic": "1/3 + 2/7 * 5^20 - 0.1",
+    "π + e": "π + e",
+    "sin/cos/tan": "sin 37 + cos 0.5 + tan 12",
+    "asin/atan": "asin 0.3 + atan 7",
+    "ln/log/exp": "ln 2 + log 7 + exp 1.5",
+    "roots": "√2 + ³√10",
+    "mixed formula": "√(sin 30^2 + cos 30^2) * π / ln(e^2) + 50!",
+}
+
+
+def best_of(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'expression':<16}" + "".join(f"{f'{d} digits µs':>16}" for d in DIGITS))
+    for name, expr in EXPRESSIONS.items():
+        row = []
+        for digits in DIGITS:
+            ev = Evaluator(number_mode="DECIMAL", decimal_digits=digits)
+            ev.compute(expr)
+            number = 2000 if digits <= 200 else 100
+            row.append(best_of(lambda ev=ev, expr=expr: ev.compute(expr), number))
+        print(f"{name:<16}" + "".join(f"{t * 1e6:>16.1f}" for t in row))
+
+    print()
+    print(f"{'cold π + e':<16}", end="")
+    for digits in DIGITS:
+        decimal_math._pi.cache_clear()
+        decimal_math._e.cache_clear()
+        ev = Evaluator(number_mode="DECIMAL", decimal_digits=digits)
+        start = time.perf_counter()
+        ev.compute("π + e")
+        print(f"{(time.perf_counter() - start) * 1e6:>16.1f}", end="")
+    print()
+
+
+if __name__ == "__main__":
+    main()
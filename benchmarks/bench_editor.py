@@ -0,0 +1,62 @@
+"""Cost of one button press vs. expression length: EditorBuffer against the
+old read-concatenate-recount edit of the whole string.
+
+Run from the repository root:
+
+    python benchmarks/bench_editor.py
+"""
+import re
+import sys
+import timeit
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from calculator.editor import EditorBuffer  # noqa: E402
+
+UNIT = "sin(30)*2.5+"
+
+
+def legacy_toggle_sign(expr: str) -> str:
+    m = re.search(r'(-?\d*\.?\d*)$', expr)
+    num, start = m.group(1), m.start(1)
+    return expr[:start] + (num[1:] if num.startswith('-') else '-' + num)
+
+
+def legacy_keystrokes(expr: str) -> str:
+    # Dotychczasowa edycja: po każdym przycisku cały tekst od nowa i liczenie nawiasów.
+    # Sekwencja 7 ( Back ± ± Back przywraca tekst
+    for edit in (lambda e: e + "7", lambda e: e + "(", lambda e: e[:-1],
+                 legacy_toggle_sign, legacy_toggle_sign, lambda e: e[:-1]):
+        expr = edit(expr)
+        expr.count("(") - expr.count(")")
+    return expr
+
+
+def buffer_keystrokes(editor: EditorBuffer):
+    for edit in (lambda: editor.append("7"), lambda: editor.append("("),
+                 editor.backspace, editor.toggle_sign, editor.toggle_sign,
+                 editor.backspace):
+        edit()
+        _ = editor.depth
+        editor.take_changes()       # to, co trafia do pola przy odświeżeniu
+
+
+def best_of(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'chars':>8} {'legacy µs':>12} {'buffer µs':>12} {'speedup':>8}")
+    for repeat in (1, 100, 1000, 10000):
+        expr = UNIT * repeat + "1"
+        editor = EditorBuffer(expr)
+        legacy = best_of(partial(legacy_keystrokes, expr), 200)
+        buffer = best_of(partial(buffer_keystrokes, editor), 200)
+        print(f"{len(expr):>8} {legacy * 1e6:>12.1f} {buffer * 1e6:>12.1f} "
+              f"{legacy / buffer:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Import-time cost of the headless entry points, measured with ``-X importtime``.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py [--runs 5] [--budget-ms 100]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+MODULES = ("calculator.logic", "calculator.batch", "calculator.__main__")
+
+
+def import_time_us(module: str) -> tuple[int, set[str]]:
+    """Return cumulative import time of ``module`` and all modules it pulled in."""
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    cumulative, loaded = 0, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        loaded.add(name)
+        if name == module:
+            cumulative = int(cum)
+    return cumulative, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        samples, loaded = [], set()
+        for _ in range(args.runs):
+            us, loaded = import_time_us(module)
+            samples.append(us)
+        median_ms = statistics.median(samples) / 1000
+        tk = "tkinter" in loaded
+        print(f"{module:<22} {median_ms:8.1f} ms  tkinter={'yes' if tk else 'no'}")
+        if tk or (args.budget_ms is not None and median_ms > args.budget_ms):
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
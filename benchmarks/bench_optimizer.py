@@ -0,0 +1,78 @@
+"""Repeated-subexpression workloads: RPN interpreter vs. the optimized DAG.
+
+Run from the repository root:
+
+    python benchmarks/bench_optimizer.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from calculator.logic import (  # noqa: E402
+    BINARY_OPS,
+    CONSTANTS,
+    OPS,
+    CompiledExpression,
+    ExpressionTree,
+    Node,
+    evaluate_rpn,
+    evaluate_tree,
+    optimize,
+    shunting_yard,
+)
+
+TERM = "sin(π/4)*(Ans + {i}) + √(2^10 + 3!) * cos(π/3)"
+
+WORKLOADS = {
+    "repeated trig": "sin(π/4)*Ans + sin(π/4)*(Ans+1)",
+    "constant heavy": "(2^10 + 3!) / (π * e) - √(4^2 + 3^2) * ln(e^2)",
+    "pasted formula x10": " + ".join(TERM.format(i=i % 3) for i in range(10)),
+    "pasted formula x100": " + ".join(TERM.format(i=i % 3) for i in range(100)),
+}
+
+
+def unoptimized(rpn: list[str]) -> ExpressionTree:
+    # Drzewo 1:1 z RPN – bez składania stałych i bez współdzielenia węzłów
+    nodes: list[Node] = []
+    stack: list[int] = []
+    for token in rpn:
+        if token in OPS:
+            arity = 2 if token in BINARY_OPS else 1
+            args = tuple(stack[-arity:])
+            del stack[-arity:]
+            nodes.append(Node("operator", token, args))
+        elif token in CONSTANTS:
+            nodes.append(Node("constant", token))
+        else:
+            nodes.append(Node("number", float(token)))
+        stack.append(len(nodes) - 1)
+    return ExpressionTree(tuple(nodes))
+
+
+def best_of(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'workload':<22} {'rpn':>5} {'dag':>5} {'interp µs':>10} {'tree µs':>10} "
+          f"{'plain µs':>10} {'opt µs':>10} {'speedup':>8}")
+    for name, expr in WORKLOADS.items():
+        rpn = shunting_yard(expr)
+        tree = optimize(rpn)
+        number = max(10, 20000 // len(rpn))
+
+        interp = best_of(lambda rpn=rpn: evaluate_rpn(rpn), number)
+        walk = best_of(lambda tree=tree: evaluate_tree(tree), number)
+        plain = CompiledExpression(expr, rpn)
+        plain._tree = unoptimized(rpn)
+        plain = best_of(plain.compile(), number)
+        compiled = best_of(CompiledExpression(expr, rpn).compile(), number)
+        print(f"{name:<22} {len(rpn):>5} {len(tree):>5} {interp * 1e6:>10.2f} "
+              f"{walk * 1e6:>10.2f} {plain * 1e6:>10.2f} {compiled * 1e6:>10.2f} "
+              f"{plain / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Tokenizer scaling: single-pass lexer vs. the old regex cascade in add_spaces.
+
+Run from the repository root:
+
+    python benchmarks/bench_tokenizer.py
+"""
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from calculator.logic import CONSTANTS, OPS, tokenize  # noqa: E402
+
+
+def legacy_add_spaces(expr: str) -> str:
+    # Implementacja sprzed leksera – jedna podmiana regexem na wpis w OPS/CONSTANTS
+    if not expr.strip():
+        return ""
+
+    replacements = {
+        "³√": " 3√ ", "√": " √ ", "1/x": " 1/ ", "x²": " x² ", "x³": " x³ ", "!": " ! ",
+    }
+    for old, new in replacements.items():
+        expr = expr.replace(old, new)
+
+    expr = re.sub(r'([+\-*/^()])', r' \1 ', expr)
+
+    for name in list(OPS) + list(CONSTANTS):
+        expr = re.sub(rf'\b{re.escape(name)}\b', f' {name} ', expr, flags=re.IGNORECASE)
+
+    expr = re.sub(r'\s+', ' ', expr.strip())
+
+    expr = re.sub(r'(\d|\.)\s*([πeAns(])', r'\1 * \2', expr)
+    expr = re.sub(r'([)])\s*(\d|\.|π|e|Ans|[a-zA-Z])', r'\1 * \2', expr)
+
+    return expr.strip()
+
+
+UNIT = "sin(30)*2.5 + ln(e)^2 - 3! / (π+1) + "
+
+
+def make_expression(repeat: int) -> str:
+    return UNIT * repeat + "1"
+
+
+def best_of(func, expr: str, number: int) -> float:
+    return min(timeit.repeat(lambda: func(expr), number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'chars':>8} {'legacy µs':>12} {'lexer µs':>12} {'speedup':>8}")
+    for repeat in (1, 10, 100, 1000):
+        expr = make_expression(repeat)
+        number = max(1, 2000 // repeat)
+        legacy = best_of(legacy_add_spaces, expr, number)
+        lexer = best_of(tokenize, expr, number)
+        print(f"{len(expr):>8} {legacy * 1e6:>12.1f} {lexer * 1e6:>12.1f} "
+              f"{legacy / lexer:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
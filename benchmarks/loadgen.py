@@ -0,0 +1,172 @@
+"""Load generator for ``python -m calculator serve``.
+
+Opens ``--clients`` connections, each keeping up to ``--pipeline`` requests
+in flight, and reports throughput and p50/p90/p99 latency. Without
+``--port``/``--unix`` it starts a server in this process (same event loop,
+so the numbers include both sides). ``--spawn N`` also times N
+process-per-request runs of ``python -m calculator batch`` for comparison.
+
+Run from the repository root:
+
+    python benchmarks/loadgen.py --clients 50 --requests 200
+    python -m calculator serve --port 8765 &  python benchmarks/loadgen.py --port 8765
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+from calculator.server import EvalServer  # noqa: E402
+
+EXPRESSIONS = [
+    "2 + 3 * 4",
+    "sin(30) + cos(60)",
+    "√(16) * Ans",
+    "(1 + 2)^3 / 7",
+    "ln(e^2) + log(1000)",
+    "5! - 3!",
+    "Ans / 3 + 1",
+]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def client(open_connection, n_requests: int, pipeline: int, seed: int,
+                 latencies: list[float], errors: list[dict]):
+    rng = random.Random(seed)
+    reader, writer = await open_connection()
+    sent: dict[int, float] = {}
+    window = asyncio.Semaphore(pipeline)
+
+    async def receive():
+        for _ in range(n_requests):
+            reply = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent.pop(reply["id"]))
+            if "error" in reply:
+                errors.append(reply)
+            window.release()
+
+    receiver = asyncio.ensure_future(receive())
+    for i in range(n_requests):
+        await window.acquire()
+        sent[i] = time.perf_counter()
+        request = {"id": i, "expr": rng.choice(EXPRESSIONS)}
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+    await receiver
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_load(args) -> dict:
+    server = None
+    if args.unix:
+        def open_connection():
+            return asyncio.open_unix_connection(args.unix)
+    else:
+        port = args.port
+        if port is None:
+            server = EvalServer(batch_window=args.batch_window_ms / 1000)
+            listener = await server.start_tcp("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+
+        def open_connection():
+            return asyncio.open_connection(args.host, port)
+
+    latencies: list[float] = []
+    errors: list[dict] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(open_connection, args.requests, args.pipeline, seed, latencies, errors)
+        for seed in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await open_connection()
+    writer.write(b'{"op": "stats"}\n')
+    stats = json.loads(await reader.readline())["stats"]
+    writer.close()
+    await writer.wait_closed()
+    if server is not None:
+        await server.close()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies) * 1e3,
+            "p50": percentile(latencies, 0.50) * 1e3,
+            "p90": percentile(latencies, 0.90) * 1e3,
+            "p99": percentile(latencies, 0.99) * 1e3,
+            "max": latencies[-1] * 1e3,
+        },
+        "server": {k: stats[k] for k in ("batches", "batch_size_mean", "batch_size_max",
+                                         "timeouts")},
+    }
+
+
+def spawn_baseline(n: int) -> float:
+    # Dotychczasowy sposób: nowy proces Pythona na każde wyrażenie
+    env_path = str(SRC)
+    start = time.perf_counter()
+    for i in range(n):
+        subprocess.run([sys.executable, "-m", "calculator", "batch"],
+                       input=EXPRESSIONS[i % len(EXPRESSIONS)] + "\n", text=True,
+                       capture_output=True, check=True, cwd=env_path)
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="connect to a running server")
+    parser.add_argument("--unix",
+                        help="connect to a running server on this Unix socket")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per client")
+    parser.add_argument("--pipeline", type=int, default=4,
+                        help="requests in flight per client")
+    parser.add_argument("--batch-window-ms", type=float, default=0.5,
+                        help="batch window of the in-process server")
+    parser.add_argument("--spawn", type=int, default=0, metavar="N",
+                        help="also time N process-per-request runs")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(args))
+    if args.spawn:
+        result["spawn_per_request_ms"] = spawn_baseline(args.spawn) * 1e3
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    lat = result["latency_ms"]
+    print(f"{result['requests']} requests from {args.clients} clients "
+          f"in {result['elapsed_s']:.2f}s, {result['errors']} errors")
+    print(f"throughput  {result['throughput_rps']:,.0f} req/s")
+    print(f"latency ms  p50 {lat['p50']:.2f}  p90 {lat['p90']:.2f}  "
+          f"p99 {lat['p99']:.2f}  "
+          f"max {lat['max']:.2f}")
+    srv = result["server"]
+    print(f"batches     {srv['batches']} (mean {srv['batch_size_mean']:.1f}, "
+          f"max {srv['batch_size_max']}), timeouts {srv['timeouts']}")
+    if args.spawn:
+        print(f"process per request: {result['spawn_per_request_ms']:.1f} ms each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Reproducible benchmark suite for the evaluation pipeline and history I/O.
+
+Headless (tkinter is never imported). Generated workloads use fixed seeds, so
+two runs on the same machine measure the same inputs. Run from the
+repository root:
+
+    python benchmarks/suite.py                          # table on stdout
+    python benchmarks/suite.py --quick --json new.json  # smaller sizes, JSON results
+    python benchmarks/suite.py --history history.json   # also replay a real history
+    python benchmarks/suite.py --compare old.json       # exit 1 on regressions
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from calculator.history import (  # noqa: E402
+    HistoryPager,
+    HistoryRecord,
+    HistoryStore,
+    parse_legacy_entry,
+)
+from calculator.logic import (  # noqa: E402
+    add_spaces,
+    cache_info,
+    clear_cache,
+    evaluate_expression,
+    evaluate_rpn,
+    format_number,
+    set_cache_size,
+    shunting_yard,
+    tokenize,
+)
+
+SEED = 20240601
+FUNCTIONS = ("sin", "cos", "tan", "ln", "log", "√", "exp")
+OPERATORS = ("+", "-", "*", "/")
+
+
+# ────────────────────────────────────────────────
+# Workloady
+# ────────────────────────────────────────────────
+
+def long_expression(terms: int, seed: int = SEED) -> str:
+    rng = random.Random(seed + terms)
+    parts = []
+    for _ in range(terms):
+        number = f"{rng.uniform(1, 90):.2f}"
+        if rng.random() < 0.4:
+            number = f"{rng.choice(FUNCTIONS)}({number})"
+        parts.append(number)
+        parts.append(rng.choice(OPERATORS))
+    return " ".join(parts + ["1"])
+
+
+def nested_expression(depth: int) -> str:
+    return "(" * depth + "1" + " + 1)" * depth
+
+
+def history_records(n: int, seed: int = SEED) -> list[HistoryRecord]:
+    rng = random.Random(seed + n)
+    records = []
+    for i in range(n):
+        expr = long_expression(rng.randint(1, 6), seed + i)
+        ts = f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} 12:{i % 60:02d}:00"
+        records.append(HistoryRecord(ts, expr, evaluate_expression(expr)))
+    return records
+
+
+def load_replay(path: Path) -> list[HistoryRecord]:
+    if path.suffix == ".jsonl":
+        return HistoryStore(path).read_all()
+    with path.open(encoding="utf-8") as f:
+        entries = json.load(f).get("entries", [])
+    return [r for r in map(parse_legacy_entry, entries) if r is not None]
+
+
+# ────────────────────────────────────────────────
+# Pomiar
+# ────────────────────────────────────────────────
+
+class Suite:
+    def __init__(self, repeat: int, min_time: float):
+        self.repeat = repeat
+        self.min_time = min_time
+        self.results: list[dict] = []
+
+    def _number(self, func) -> int:
+        # Tyle wywołań w próbie, żeby jedna próba trwała co najmniej min_time
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            if time.perf_counter() - start >= self.min_time or number >= 1 << 20:
+                return number
+            number *= 4
+
+    def bench(self, name: str, func, setup=None, ops: int = 1, **params):
+        """Time ``func``; ``setup`` (if given) runs before every sample, untimed."""
+        if setup is not None:
+            setup()
+        number = 1 if setup is not None else self._number(func)
+        samples = []
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - start) / number)
+        best, median = min(samples), statistics.median(samples)
+        result = {
+            "name": name, "params": params, "number": number, "repeat": self.repeat,
+            "best_s": best, "median_s": median, "ops": ops,
+            "per_op_us": best / ops * 1e6,
+        }
+        self.results.append(result)
+        label = ", ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{name:<28} {label:<26} {best * 1e6:>12.1f} µs "
+              f"{result['per_op_us']:>10.2f} µs/op")
+        return result
+
+
+def key(result: dict) -> str:
+    params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]"
+
+
+# ────────────────────────────────────────────────
+# Grupy benchmarków
+# ────────────────────────────────────────────────
+
+def bench_pipeline(suite: Suite, expr: str, **params):
+    rpn = shunting_yard(expr)
+    suite.bench("add_spaces", lambda: add_spaces(expr), **params)
+    suite.bench("tokenize", lambda: tokenize(expr), **params)
+    suite.bench("shunting_yard", lambda: shunting_yard(expr), **params)
+    suite.bench("evaluate_rpn", lambda: evaluate_rpn(rpn), **params)
+
+    maxsize = cache_info()["maxsize"]
+    set_cache_size(0)
+    suite.bench("evaluate_expression.cold", lambda: evaluate_expression(expr), **params)
+    set_cache_size(maxsize)
+    clear_cache()
+    evaluate_expression(expr)
+    evaluate_expression(expr)
+    suite.bench("evaluate_expression.warm", lambda: evaluate_expression(expr), **params)
+
+
+def bench_format(suite: Suite):
+    rng = random.Random(SEED)
+    values = [rng.uniform(-1e6, 1e6) for _ in range(500)] + [1e-12, 3e15, 0.0, 1 / 3]
+    decimals = [Decimal(str(v)) for v in values]
+    for mode, data in (("FLOAT", values), ("FIXED", values), ("DEC", decimals)):
+        suite.bench("format_number",
+                    lambda mode=mode, data=data: [format_number(v, mode) for v in data],
+                    ops=len(data), mode=mode)
+
+
+def bench_history(suite: Suite, records: list[HistoryRecord], tmp: Path, **params):
+    path = tmp / f"history-{len(records)}.jsonl"
+
+    def fresh():
+        path.unlink(missing_ok=True)
+
+    store = HistoryStore(path)
+    suite.bench("save_history.append_many", lambda: store.append_many(records),
+                setup=fresh, ops=len(records), **params)
+    one = records[-1]
+    suite.bench("save_history.append", lambda: store.append(one), **params)
+
+    fresh()
+    store.append_many(records)
+    suite.bench("load_history.latest_page", lambda: HistoryPager(store).load_latest(),
+                **params)
+    suite.bench("load_history.read_all", store.read_all, ops=len(records), **params)
+
+
+def bench_replay(suite: Suite, records: list[HistoryRecord], tmp: Path):
+    expressions = [r.expression for r in records]
+
+    def each(func):
+        def run():
+            for expr in expressions:
+                try:
+                    func(expr)
+                except ValueError:
+                    pass
+        return run
+
+    n = len(expressions)
+    suite.bench("replay.tokenize", each(tokenize), ops=n, entries=n)
+    suite.bench("replay.shunting_yard", each(shunting_yard), ops=n, entries=n)
+    maxsize = cache_info()["maxsize"]
+    set_cache_size(0)
+    suite.bench("replay.evaluate_expression", each(evaluate_expression),
+                ops=n, entries=n)
+    set_cache_size(maxsize)
+    bench_history(suite, records, tmp, entries=n, replay=True)
+
+
+# ────────────────────────────────────────────────
+# Porównanie z poprzednim wynikiem
+# ────────────────────────────────────────────────
+
+def compare(results: list[dict], baseline_path: Path, threshold: float) -> bool:
+    with baseline_path.open(encoding="utf-8") as f:
+        baseline = {key(r): r for r in json.load(f)["results"]}
+    print(f"\n{'benchmark':<60} {'before µs':>12} {'after µs':>12} {'ratio':>7}")
+    regressed = False
+    for result in results:
+        old = baseline.get(key(result))
+        if old is None:
+            continue
+        ratio = result["best_s"] / old["best_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag, regressed = "  REGRESSION", True
+        print(f"{key(result):<60} {old['best_s'] * 1e6:>12.1f} "
+              f"{result['best_s'] * 1e6:>12.1f} {ratio:>6.2f}x{flag}")
+    return regressed
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller sizes, fewer repeats")
+    parser.add_argument("--json", type=Path, help="write machine-readable results here")
+    parser.add_argument("--history", type=Path,
+                        help="replay a real history.json / history.jsonl as a workload")
+    parser.add_argument("--compare", type=Path,
+                        help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown against --compare (default: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    suite = Suite(repeat=3 if args.quick else 7, min_time=0.02 if args.quick else 0.1)
+    lengths = (10, 100) if args.quick else (10, 100, 1000)
+    depths = (10, 100) if args.quick else (10, 100, 500)
+    history_sizes = (1_000, 10_000) if args.quick else (1_000, 10_000, 100_000)
+
+    for terms in lengths:
+        bench_pipeline(suite, long_expression(terms), terms=terms)
+    for depth in depths:
+        bench_pipeline(suite, nested_expression(depth), depth=depth)
+    bench_format(suite)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for size in history_sizes:
+            bench_history(suite, history_records(size), tmp, entries=size)
+        if args.history:
+            bench_replay(suite, load_replay(args.history), tmp)
+
+    if args.json:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "implementation": platform.python_implementation(),
+                "platform": platform.platform(),
+                "quick": args.quick,
+                "seed": SEED,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": suite.results,
+        }
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.compare and compare(suite.results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
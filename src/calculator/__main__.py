@@ -1,10 +1,73 @@
-import tkinter as tk
-from .ui import CalculatorGUI
+import argparse
+import atexit
+import os
+
+from . import metrics
+from .batch import add_batch_parser
+from .metrics import add_metrics_parser
+from .stats import add_stats_parser
+
+
+def run_gui():
+    # tkinter ładujemy dopiero przy starcie okna – tryby bez GUI go nie potrzebują
+    import tkinter as tk
+
+    from .ui import CalculatorGUI
+
+    # CALCULATOR_METRICS=plik.json – pomiary w oknie, zrzut przy zamknięciu
+    dump_path = os.environ.get("CALCULATOR_METRICS")
+    if dump_path:
+        metrics.enable()
+        atexit.register(metrics.dump, dump_path)
 
-def main():
     root = tk.Tk()
     CalculatorGUI(root)
     root.mainloop()
 
+
+def run_server(args):
+    # asyncio ładujemy dopiero przy starcie serwera
+    from .server import main_serve
+
+    return main_serve(args)
+
+
+def add_serve_parser(subparsers):
+    parser = subparsers.add_parser(
+        "serve", help="evaluate JSON-lines requests over a socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH",
+                        help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--timeout", type=float, default=1.0,
+                        help="per-request timeout in seconds")
+    parser.add_argument("--batch-window-ms", type=float, default=0.5,
+                        help="how long to wait for more requests "
+                             "before evaluating a batch")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--isolate", action="store_true",
+                        help="evaluate in a worker process killed at "
+                             "--timeout / --max-memory-mb")
+    parser.add_argument("--max-memory-mb", type=int, default=512,
+                        help="memory budget of the --isolate worker")
+    parser.set_defaults(func=run_server)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="calculator",
+                                     description="Scientific calculator")
+    subparsers = parser.add_subparsers()
+    add_batch_parser(subparsers)
+    add_metrics_parser(subparsers)
+    add_serve_parser(subparsers)
+    add_stats_parser(subparsers)
+    args = parser.parse_args(argv)
+
+    if not hasattr(args, "func"):
+        run_gui()
+        return 0
+    return args.func(args)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    raise SystemExit(main())
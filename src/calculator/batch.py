@@ -0,0 +1,151 @@
+import json
+import sys
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from typing import TextIO
+
+from . import metrics
+from .logic import Evaluator, describe_error
+
+# ────────────────────────────────────────────────
+# Tryb wsadowy – bez GUI
+# ────────────────────────────────────────────────
+
+def read_expressions(stream: TextIO) -> Iterator[str]:
+    for line in stream:
+        yield line.rstrip("\r\n")
+
+
+def chunked(items: Iterable[str], size: int) -> Iterator[list[str]]:
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def evaluate_chunk(lines: list[str],
+                   angle_mode: str = "DEG") -> list[tuple[str, str | None]]:
+    # Każda linia liczona niezależnie (nowy Evaluator, Ans = 0), więc wynik nie
+    # zależy od podziału na paczki
+    results = []
+    for line in lines:
+        if not line.strip():
+            results.append(("", None))
+            continue
+        try:
+            results.append((str(Evaluator(angle_mode).compute(line)), None))
+        except Exception as e:
+            results.append(("", describe_error(e)))
+    return results
+
+
+def run_batch(
+    lines: Iterable[str],
+    workers: int = 0,
+    chunk_size: int = 1000,
+    angle_mode: str = "DEG",
+    max_in_flight: int | None = None,
+) -> Iterator[tuple[str, str | None]]:
+    """Evaluate lines and yield ``(result, error)`` pairs in input order.
+
+    With ``workers > 0`` chunks are spread over a process pool; at most
+    ``max_in_flight`` chunks (default ``2 * workers``) are pending at once so
+    memory stays flat regardless of input size.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+
+    if workers <= 0:
+        for chunk in chunked(lines, chunk_size):
+            yield from evaluate_chunk(chunk, angle_mode)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    limit = max_in_flight or 2 * workers
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunked(lines, chunk_size):
+            pending.append(pool.submit(evaluate_chunk, chunk, angle_mode))
+            if len(pending) >= limit:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def format_result(expr: str, result: str, error: str | None, fmt: str) -> str:
+    if fmt == "jsonl":
+        if error:
+            record = {"expr": expr, "error": error}
+        else:
+            record = {"expr": expr, "result": result}
+        return json.dumps(record, ensure_ascii=False)
+    return error or result
+
+
+def main_batch(args) -> int:
+    if args.metrics or args.metrics_json:
+        if args.workers:
+            print("--metrics is collected in this process only; use --workers 0",
+                  file=sys.stderr)
+            return 2
+        metrics.enable(args.slow_ms / 1000)
+    if args.input in (None, "-"):
+        stream = sys.stdin
+    else:
+        stream = open(args.input, encoding="utf-8")
+    out = sys.stdout
+    count = 0
+    start = time.perf_counter()
+    try:
+        # Wyrażenia trzymamy tylko dla paczek w locie – potrzebne do JSONL
+        expressions = deque()
+
+        def remember(lines):
+            for line in lines:
+                expressions.append(line)
+                yield line
+
+        results = run_batch(
+            remember(read_expressions(stream)),
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            angle_mode=args.angle,
+        )
+        for result, error in results:
+            expr = expressions.popleft()
+            out.write(format_result(expr, result, error, args.format) + "\n")
+            count += 1
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        out.flush()
+
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else float("inf")
+    print(f"{count} expressions in {elapsed:.3f}s ({rate:,.0f} expr/s)",
+          file=sys.stderr)
+    if args.metrics:
+        print(metrics.report(), file=sys.stderr)
+    if args.metrics_json:
+        metrics.dump(args.metrics_json)
+    return 0
+
+
+def add_batch_parser(subparsers):
+    parser = subparsers.add_parser("batch", help="evaluate expressions without the GUI")
+    parser.add_argument("input", nargs="?",
+                        help="file with one expression per line (default: stdin)")
+    parser.add_argument("-j", "--workers", type=int, default=0,
+                        help="worker processes (0 = evaluate in this process)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--format", choices=("plain", "jsonl"), default="plain")
+    parser.add_argument("--angle", choices=("DEG", "RAD"), default="DEG")
+    parser.add_argument("--metrics", action="store_true",
+                        help="print per-stage timings and error counts to stderr")
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="write the metrics snapshot as JSON")
+    parser.add_argument("--slow-ms", type=float, default=50.0,
+                        help="log expressions slower than this (default: 50 ms)")
+    parser.set_defaults(func=main_batch)
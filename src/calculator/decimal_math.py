@@ -0,0 +1,332 @@
+import math
+from decimal import Decimal, localcontext
+from functools import lru_cache
+
+# ────────────────────────────────────────────────
+# Funkcje dla decimal.Decimal w bieżącej precyzji kontekstu
+# ────────────────────────────────────────────────
+# Każda funkcja liczy z kilkoma cyframi zapasu i zaokrągla wynik do
+# precyzji kontekstu wywołującego. Stałe (π, e) są pamiętane osobno dla
+# każdej precyzji, więc kolejne obliczenia w tym samym trybie ich nie liczą.
+
+GUARD_DIGITS = 10
+
+
+def _domain_error():
+    return ValueError("math domain error")
+
+
+@lru_cache(maxsize=16)
+def _pi(prec: int) -> Decimal:
+    # Chudnovsky z podziałem binarnym – ok. 14 cyfr na wyraz, same liczby całkowite
+    C3_OVER_24 = 640320 ** 3 // 24
+
+    def split(a: int, b: int) -> tuple[int, int, int]:
+        if b - a == 1:
+            if a == 0:
+                p = q = 1
+            else:
+                p = (6 * a - 5) * (2 * a - 1) * (6 * a - 1)
+                q = a * a * a * C3_OVER_24
+            t = p * (13591409 + 545140134 * a)
+            return p, q, -t if a & 1 else t
+        m = (a + b) // 2
+        p1, q1, t1 = split(a, m)
+        p2, q2, t2 = split(m, b)
+        return p1 * p2, q1 * q2, q2 * t1 + p1 * t2
+
+    terms = prec // 14 + 2
+    _, q, t = split(0, terms)
+    with localcontext() as ctx:
+        ctx.prec = prec + GUARD_DIGITS
+        value = Decimal(426880) * Decimal(10005).sqrt() * q / t
+        ctx.prec = prec
+        return +value
+
+
+@lru_cache(maxsize=16)
+def _e(prec: int) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec = prec
+        return exp(Decimal(1))
+
+
+def pi() -> Decimal:
+    with localcontext() as ctx:
+        return _pi(ctx.prec)
+
+
+def e() -> Decimal:
+    with localcontext() as ctx:
+        return _e(ctx.prec)
+
+
+def to_decimal(value) -> Decimal:
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if hasattr(value, "numerator") and hasattr(value, "denominator"):
+        return Decimal(value.numerator) / Decimal(value.denominator)
+    return Decimal(value)
+
+
+# ─── Pierwiastki, logarytmy, wykładnicza ─────────
+# Wbudowane Decimal.exp()/ln() są poprawnie zaokrąglane, ale przy setkach
+# cyfr kilka razy wolniejsze od szeregów poniżej
+def sqrt(x: Decimal) -> Decimal:
+    if x < 0:
+        raise _domain_error()
+    return x.sqrt()
+
+
+def cbrt(x: Decimal) -> Decimal:
+    if not x:
+        return x
+    with localcontext() as ctx:
+        prec = ctx.prec
+        ctx.prec += GUARD_DIGITS
+        root = exp(ln(abs(x)) / 3)
+        # Jeden krok Newtona poprawia ostatnie cyfry (np. ³√27 = 3 dokładnie)
+        root -= (root ** 3 - abs(x)) / (3 * root * root)
+        ctx.prec = prec
+        return +root if x > 0 else -root
+
+
+def exp(x: Decimal) -> Decimal:
+    # Taylor dla x / 2^k, potem k podniesień do kwadratu. Kwadraty wzmacniają
+    # błąd względny 2^k razy, więc dokładamy k·log10(2) cyfr zapasu.
+    with localcontext() as ctx:
+        prec = ctx.prec
+        k = int(math.sqrt(prec * 3.33)) + max(0, int(x.adjusted() * 3.33) + 1)
+        ctx.prec = prec + GUARD_DIGITS + int(k * 0.302)
+        r = x / 2 ** k
+        term = total = Decimal(1)
+        n = 0
+        while True:
+            n += 1
+            term = term * r / n
+            new = total + term
+            if new == total:
+                break
+            total = new
+        for _ in range(k):
+            total *= total
+        ctx.prec = prec
+        return +total
+
+
+def ln(x: Decimal) -> Decimal:
+    if x <= 0:
+        raise _domain_error()
+    # Halley na exp: y += 2(x - e^y) / (x + e^y). Zbieżność sześcienna, więc
+    # zaczynamy od logarytmu z float i potrajamy precyzję w każdym kroku.
+    with localcontext() as ctx:
+        prec = ctx.prec
+        target = prec + GUARD_DIGITS
+        e10 = x.adjusted()
+        y = Decimal(math.log(float(x.scaleb(-e10))) + e10 * math.log(10))
+        digits = 15
+        while digits < target:
+            digits = min(target, 3 * digits)
+            ctx.prec = digits + 5
+            ey = exp(y)
+            y += 2 * (x - ey) / (x + ey)
+        ctx.prec = prec
+        return +y
+
+
+@lru_cache(maxsize=16)
+def _ln10(prec: int) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec = prec
+        return ln(Decimal(10))
+
+
+def log10(x: Decimal) -> Decimal:
+    if x <= 0:
+        raise _domain_error()
+    if x == Decimal(1).scaleb(x.adjusted()):
+        # Dokładne potęgi dziesięciu: log 1000 = 3
+        return Decimal(x.adjusted())
+    with localcontext() as ctx:
+        prec = ctx.prec
+        ctx.prec += GUARD_DIGITS
+        result = ln(x) / _ln10(ctx.prec)
+        ctx.prec = prec
+        return +result
+
+
+# ─── Silnia dużych argumentów ───────────────────
+_BERNOULLI: list = []          # B_2, B_4, ... – dopisywane w miarę potrzeby
+_bernoulli_row: list = []      # stan algorytmu Akiyamy–Tanigawy
+
+
+def _bernoulli(i: int):
+    """B_2i as a Fraction (i >= 1)."""
+    from fractions import Fraction
+
+    while len(_BERNOULLI) < i:
+        for _ in range(2):
+            m = len(_bernoulli_row)
+            _bernoulli_row.append(Fraction(1, m + 1))
+            for j in range(m, 0, -1):
+                _bernoulli_row[j - 1] = j * (_bernoulli_row[j - 1] - _bernoulli_row[j])
+            if m >= 2 and m % 2 == 0:
+                _BERNOULLI.append(_bernoulli_row[0])
+    return _BERNOULLI[i - 1]
+
+
+def factorial(n: int) -> Decimal:
+    """n! rounded to the context precision, for large n (thousands and up).
+
+    Stirling's series for ln n! has a smallest term of about e^(-2πn), so for
+    large n it converges far past the working precision in a handful of
+    terms, and the cost hardly depends on n. The exact n! is not an option
+    there: 10**5! has 456574 digits and converting it to Decimal takes seconds.
+    """
+    with localcontext() as ctx:
+        prec = ctx.prec
+        if n <= max(1000, prec):
+            # Szereg nie zbiegnie do tylu cyfr – a dokładna silnia jest tu tania
+            return +Decimal(math.factorial(n))
+        # exp() zgubi tyle cyfr, ile ma część całkowita ln n! ≈ n ln n
+        ctx.prec = prec + GUARD_DIGITS + len(str(n)) + 2
+        x = Decimal(n)
+        total = (x + Decimal("0.5")) * ln(x) - x + ln(2 * _pi(ctx.prec)) / 2
+        eps = Decimal(1).scaleb(-ctx.prec)
+        power, x2, i = x, x * x, 1
+        while True:
+            b = _bernoulli(i)
+            scale = Decimal(b.denominator) * (2 * i) * (2 * i - 1) * power
+            term = Decimal(b.numerator) / scale
+            total += term
+            if abs(term) < eps:
+                break
+            power *= x2
+            i += 1
+        result = exp(total)
+        ctx.prec = prec
+        return +result
+
+
+# ─── Trygonometria ──────────────────────────────
+def _sin_series(x: Decimal) -> Decimal:
+    # Szereg Taylora dla małego |x|; kontekst ma już cyfry zapasu
+    x2 = x * x
+    term = total = x
+    n = 1
+    while True:
+        term = -term * x2 / ((n + 1) * (n + 2))
+        n += 2
+        new = total + term
+        if new == total:
+            return total
+        total = new
+
+
+def _sin_reduced(r: Decimal, prec: int) -> Decimal:
+    # |r| <= π/4. Dzielimy argument przez 3^k i odbudowujemy wzorem
+    # sin 3y = 3 sin y - 4 sin³ y – szereg zbiega wtedy w kilku wyrazach
+    k = max(0, int(math.sqrt(prec) / 2))
+    s = _sin_series(r / 3 ** k)
+    for _ in range(k):
+        s = s * (3 - 4 * s * s)
+    return s
+
+
+def sin_cos(x: Decimal, degrees: bool = False) -> tuple[Decimal, Decimal]:
+    with localcontext() as ctx:
+        prec = ctx.prec
+        # Przy dużym |x| redukcja modulo π/2 zjada cyfry – dodajemy zapas
+        ctx.prec += GUARD_DIGITS + max(0, x.adjusted()) + int(math.sqrt(prec))
+        if degrees:
+            # Redukcja w stopniach jest dokładna: sin 180 = 0, cos 90 = 0
+            n = (x / 90).to_integral_value()
+            r = (x - 90 * n) * _pi(ctx.prec) / 180
+        else:
+            half_pi = _pi(ctx.prec) / 2
+            n = (x / half_pi).to_integral_value()
+            r = x - n * half_pi
+        s = _sin_reduced(r, ctx.prec)
+        c = (1 - s * s).sqrt()
+        quadrant = int(n % 4)
+        s, c = ((s, c), (c, -s), (-s, -c), (-c, s))[quadrant]
+        ctx.prec = prec
+        # Zero z redukcji ma wykładnik w rodzaju 0E-385 i czasem znak
+        return (+s if s else Decimal(0)), (+c if c else Decimal(0))
+
+
+def sin(x: Decimal, degrees: bool = False) -> Decimal:
+    return sin_cos(x, degrees)[0]
+
+
+def cos(x: Decimal, degrees: bool = False) -> Decimal:
+    return sin_cos(x, degrees)[1]
+
+
+def tan(x: Decimal, degrees: bool = False) -> Decimal:
+    s, c = sin_cos(x, degrees)
+    return s / c
+
+
+def _atan_series(x: Decimal) -> Decimal:
+    x2 = x * x
+    power = total = x
+    n = 1
+    while True:
+        power = -power * x2
+        n += 2
+        new = total + power / n
+        if new == total:
+            return total
+        total = new
+
+
+def atan(x: Decimal, degrees: bool = False) -> Decimal:
+    with localcontext() as ctx:
+        prec = ctx.prec
+        ctx.prec += GUARD_DIGITS
+        pi_ = _pi(ctx.prec)
+        y = abs(x)
+        invert = y > 1
+        if invert:
+            y = 1 / y
+        # atan y = 2 atan(y / (1 + √(1 + y²))) – każde połowienie przyspiesza szereg
+        k = int(math.sqrt(prec) / 2)
+        for _ in range(k):
+            y = y / (1 + (1 + y * y).sqrt())
+        result = _atan_series(y) * 2 ** k
+        if invert:
+            result = pi_ / 2 - result
+        if x < 0:
+            result = -result
+        if degrees:
+            result = result * 180 / pi_
+        ctx.prec = prec
+        return +result
+
+
+def asin(x: Decimal, degrees: bool = False) -> Decimal:
+    if abs(x) > 1:
+        raise _domain_error()
+    if abs(x) == 1:
+        with localcontext() as ctx:
+            half = Decimal(90) if degrees else _pi(ctx.prec) / 2
+            return half if x > 0 else -half
+    with localcontext() as ctx:
+        ctx.prec += GUARD_DIGITS
+        y = x / (1 - x * x).sqrt()
+    return atan(y, degrees)
+
+
+def acos(x: Decimal, degrees: bool = False) -> Decimal:
+    if abs(x) > 1:
+        raise _domain_error()
+    with localcontext() as ctx:
+        prec = ctx.prec
+        ctx.prec += GUARD_DIGITS
+        half = Decimal(90) if degrees else _pi(ctx.prec) / 2
+        result = half - asin(x, degrees)
+        ctx.prec = prec
+        return +result
@@ -0,0 +1,147 @@
+# ────────────────────────────────────────────────
+# Bufor edycji wyrażenia – zmiany przyrostowe
+# ────────────────────────────────────────────────
+# Dla każdego znaku pamiętamy głębokość nawiasów po nim i początek tokenu,
+# do którego należy. Dopisanie, Back i ± zmieniają tylko koniec list, więc
+# nie zależą od długości wyrażenia; widok dostaje tylko zmieniony ogon.
+
+_NUMBER = frozenset("0123456789.")
+
+
+def _kind(ch: str) -> str | None:
+    # Liczby i nazwy (sin, Ans, π) to tokeny wieloznakowe; reszta – pojedyncze znaki
+    if ch in _NUMBER:
+        return "number"
+    if ch.isalpha():
+        return "name"
+    return None
+
+
+class EditorBuffer:
+    """Expression text with its parenthesis depth and token boundaries
+    maintained incrementally.
+
+    ``append``, ``backspace`` and ``toggle_sign`` cost time proportional to
+    the edited tail, not to the whole expression. ``text`` is joined only
+    when asked for; ``take_changes`` tells a view which tail to redraw.
+    """
+
+    __slots__ = ("_chars", "_depths", "_starts", "_text", "_dirty")
+
+    def __init__(self, text: str = ""):
+        self._chars: list[str] = []
+        self._depths: list[int] = []      # głębokość nawiasów po znaku i
+        self._starts: list[int] = []      # początek tokenu ze znakiem i
+        self._text: str | None = ""
+        self._dirty: int | None = None    # od tego indeksu widok jest nieaktualny
+        self.load(text)
+
+    def __len__(self) -> int:
+        return len(self._chars)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(self._chars)
+        return self._text
+
+    @property
+    def depth(self) -> int:
+        """Open minus closed parentheses (negative when there are extra ``)``)."""
+        return self._depths[-1] if self._depths else 0
+
+    def last_token(self) -> str:
+        if not self._chars:
+            return ""
+        return "".join(self._chars[self._starts[-1]:])
+
+    def token_start(self, index: int) -> int:
+        """Index where the token containing ``index`` starts."""
+        return self._starts[index]
+
+    # ─── Edycja ─────────────────────────────────
+    def _touch(self, index: int):
+        self._text = None
+        if self._dirty is None or index < self._dirty:
+            self._dirty = index
+
+    def _push(self, text: str):
+        chars, depths, starts = self._chars, self._depths, self._starts
+        depth = depths[-1] if depths else 0
+        for ch in text:
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+            kind = _kind(ch)
+            i = len(chars)
+            starts.append(starts[-1] if i and kind and _kind(chars[-1]) == kind else i)
+            chars.append(ch)
+            depths.append(depth)
+
+    def _restart(self, index: int):
+        # Początki tokenów od index do końca (ogon jednej liczby po ±)
+        chars, starts = self._chars, self._starts
+        for i in range(index, len(chars)):
+            kind = _kind(chars[i])
+            same = i and kind and _kind(chars[i - 1]) == kind
+            starts[i] = starts[i - 1] if same else i
+
+    def append(self, text: str):
+        if text:
+            self._touch(len(self._chars))
+            self._push(text)
+
+    def backspace(self):
+        if self._chars:
+            self._touch(len(self._chars) - 1)
+            self._chars.pop()
+            self._depths.pop()
+            self._starts.pop()
+
+    def clear(self):
+        self._touch(0)
+        self._chars.clear()
+        self._depths.clear()
+        self._starts.clear()
+
+    def set(self, text: str):
+        """Replace the text; the view redraws all of it."""
+        self.clear()
+        self._push(text)
+
+    def load(self, text: str):
+        """Replace the text with what the view already shows (nothing to redraw)."""
+        self.set(text)
+        self._text = text
+        self._dirty = None
+
+    def toggle_sign(self):
+        """Negate the trailing number: add ``-`` before it or remove one."""
+        chars = self._chars
+        # Liczba to najwyżej jedna kropka – "1.2.3" kończy się liczbą "2.3"
+        start, dot = len(chars), False
+        while start and chars[start - 1] in _NUMBER:
+            if chars[start - 1] == ".":
+                if dot:
+                    break
+                dot = True
+            start -= 1
+        if start and chars[start - 1] == "-":
+            self._touch(start - 1)
+            del chars[start - 1], self._depths[start - 1], self._starts[start - 1]
+            self._restart(start - 1)
+        else:
+            self._touch(start)
+            chars.insert(start, "-")
+            self._depths.insert(start, self._depths[start - 1] if start else 0)
+            self._starts.insert(start, start)
+            self._restart(start + 1)
+
+    def take_changes(self) -> tuple[int, str] | None:
+        """``(index, tail)``: the view should replace its text from ``index``
+        on with ``tail``. None when nothing changed since the last call."""
+        if self._dirty is None:
+            return None
+        index, self._dirty = self._dirty, None
+        return index, "".join(self._chars[index:])
@@ -0,0 +1,228 @@
+import multiprocessing
+import os
+import threading
+import time
+
+from .logic import Evaluator, describe_error, error_kind, result_text
+from .metrics import METRICS
+
+# ────────────────────────────────────────────────
+# Twardy limit czasu i pamięci – obliczenia w osobnym procesie
+# ────────────────────────────────────────────────
+# estimate_bits odrzuca wyrażenia, których wynik byłby za duży, ale nie
+# wszystko da się oszacować z góry. GuardedEvaluator liczy w procesie
+# roboczym: po przekroczeniu czasu proces jest zabijany (i przy następnym
+# obliczeniu uruchamiany od nowa), a pamięć ogranicza mu RLIMIT_AS.
+# Pomiary (METRICS) proces roboczy zbiera u siebie i odsyła z wynikiem.
+
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_MAX_MEMORY = 512 * 1024 * 1024
+
+
+class EvaluationTimeout(TimeoutError):
+    pass
+
+
+class EvaluationCancelled(Exception):
+    pass
+
+
+def _address_space() -> int:
+    # Bieżący rozmiar przestrzeni adresowej (tylko Linux; gdzie indziej 0)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _limit_memory(max_memory: int | None):
+    if max_memory is None:
+        return
+    try:
+        import resource
+    except ImportError:         # Windows – bez limitu pamięci
+        return
+    limit = _address_space() + max_memory
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _worker(conn, max_memory: int | None):
+    _limit_memory(max_memory)
+    evaluator = Evaluator()
+    conn.send(None)             # gotowy – limit czasu liczymy od teraz
+    while True:
+        try:
+            method, expression, settings, ans, slow_threshold = conn.recv()
+        except EOFError:
+            return
+        for name, value in settings.items():
+            setattr(evaluator, name, value)
+        evaluator.ans = ans
+        # slow_threshold None – pomiary w procesie głównym są wyłączone
+        METRICS.enabled = slow_threshold is not None
+        if METRICS.enabled:
+            METRICS.slow_threshold = slow_threshold
+        try:
+            result = getattr(evaluator, method)(expression)
+            reply = (True, result, evaluator.ans)
+        except MemoryError:
+            reply = (False, MemoryError("Evaluation ran out of memory"), None)
+        except Exception as e:
+            reply = (False, e, None)
+        measured = METRICS.drain() if METRICS.enabled else None
+        try:
+            conn.send((*reply, measured))
+        except Exception:
+            # Wyjątek, którego nie da się przesłać – wystarczy jego opis
+            conn.send((False, ValueError(describe_error(reply[1])), None, measured))
+
+
+def _context():
+    # Nie forkujemy procesu, który może mieć inne wątki (serwer, okno) –
+    # forkserver tworzy procesy robocze z czystego procesu
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+class GuardedEvaluator:
+    """Evaluates in a worker process with a wall-clock and memory budget.
+
+    ``compute`` takes the modes and Ans from an Evaluator and writes the
+    new Ans back to it, like Evaluator.compute. An evaluation running
+    longer than ``timeout`` seconds raises EvaluationTimeout and the worker
+    is killed; one needing more than ``max_memory`` bytes raises
+    MemoryError (the memory limit needs RLIMIT_AS, i.e. Linux or macOS).
+    ``None`` disables either limit. ``cancel()``, called from another
+    thread, kills the evaluation in progress, which then raises
+    EvaluationCancelled.
+    """
+
+    def __init__(self, timeout: float | None = DEFAULT_TIMEOUT,
+                 max_memory: int | None = DEFAULT_MAX_MEMORY):
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout must be > 0")
+        if max_memory is not None and max_memory <= 0:
+            raise ValueError("max_memory must be > 0")
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.restarts = 0
+        self._process = None
+        self._conn = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker now instead of on the first evaluation."""
+        with self._lock:
+            if self._process is None:
+                self._start()
+
+    def _start(self):
+        parent, child = multiprocessing.Pipe()
+        process = _context().Process(target=_worker, args=(child, self.max_memory),
+                                     name="calc-guard", daemon=True)
+        process.start()
+        child.close()
+        self._process, self._conn = process, parent
+        parent.recv()
+
+    def _stop(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._conn.close()
+            self._process = self._conn = None
+
+    def compute(self, expression: str, evaluator: Evaluator):
+        return self._call("compute", expression, evaluator)
+
+    def compute_command(self, expression: str, evaluator: Evaluator):
+        """Evaluator.compute_command in the worker: SolveResult or IntegralResult."""
+        return self._call("compute_command", expression, evaluator)
+
+    def _call(self, method: str, expression: str, evaluator: Evaluator):
+        settings = {"angle_mode": evaluator.angle_mode,
+                    "number_mode": evaluator.number_mode,
+                    "decimal_digits": evaluator.decimal_digits,
+                    "max_bits": evaluator.max_bits}
+        slow_threshold = METRICS.slow_threshold if METRICS.enabled else None
+        with self._lock:
+            self._cancelled = False
+            start = time.perf_counter()
+            try:
+                if self._process is not None and not self._process.is_alive():
+                    self._stop()        # zabity przez cancel() między obliczeniami
+                if self._process is None:
+                    self._start()
+                self._conn.send((method, expression, settings, evaluator.ans,
+                                 slow_threshold))
+                finished = self._conn.poll(self.timeout)
+                if finished:
+                    ok, value, ans, measured = self._conn.recv()
+            except (EOFError, OSError):
+                # Proces roboczy zginął: cancel() albo system – najczęściej za pamięć
+                self.restarts += 1
+                self._stop()
+                if self._cancelled:
+                    raise EvaluationCancelled("Evaluation cancelled") from None
+                self._lost(expression, start, MemoryError())
+                raise MemoryError("Evaluation ran out of memory") from None
+            if not finished:
+                self.restarts += 1
+                self._stop()
+                error = EvaluationTimeout(
+                    f"Evaluation took longer than {self.timeout:g} s")
+                self._lost(expression, start, error)
+                raise error
+        if measured is not None:
+            METRICS.merge(measured)
+        if not ok:
+            raise value
+        evaluator.ans = ans
+        return value
+
+    @staticmethod
+    def _lost(expression: str, start: float, error: Exception):
+        # Proces roboczy zginął razem ze swoimi pomiarami – błąd liczymy tutaj
+        if METRICS.enabled:
+            kind = error_kind(error)
+            METRICS.error(kind)
+            METRICS.finished(expression, time.perf_counter() - start, kind)
+
+    def evaluate(self, expression: str, evaluator: Evaluator) -> str:
+        if not expression.strip():
+            return ""
+
+        ans = evaluator.ans
+        try:
+            return result_text(self.compute(expression, evaluator))
+        except Exception as e:
+            evaluator.ans = ans
+            return describe_error(e)
+
+    def cancel(self):
+        """Kill the evaluation in progress; safe to call from any thread."""
+        process = self._process
+        if process is not None:
+            self._cancelled = True
+            process.kill()
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
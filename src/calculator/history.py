@@ -0,0 +1,597 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+from .metrics import METRICS
+
+try:
+    import fcntl
+except ImportError:             # Windows
+    fcntl = None
+    import msvcrt
+
+
+# ────────────────────────────────────────────────
+# Historia – dziennik JSON Lines (tylko dopisywanie)
+# ────────────────────────────────────────────────
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class HistoryRecord(NamedTuple):
+    timestamp: str
+    expression: str
+    result: str
+
+    @classmethod
+    def now(cls, expression: str, result: str) -> "HistoryRecord":
+        return cls(datetime.now().strftime(TIMESTAMP_FORMAT), expression, result)
+
+    def format(self) -> str:
+        return f"[{self.timestamp}] {self.expression} = {self.result}"
+
+
+_LEGACY_ENTRY = re.compile(r"^\[(.*?)\] (.*) = (.*)$")
+
+
+def parse_legacy_entry(entry: str) -> HistoryRecord | None:
+    m = _LEGACY_ENTRY.match(entry)
+    return HistoryRecord(*m.groups()) if m else None
+
+
+class HistoryRow(NamedTuple):
+    # Offsety w pliku; None dla wpisów, których zapis jeszcze czeka w kolejce
+    start: int | None
+    end: int | None
+    record: HistoryRecord
+
+
+def _encode(record: HistoryRecord) -> bytes:
+    data = {"t": record.timestamp, "e": record.expression, "r": record.result}
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+_CLEAR = object()
+
+
+def _decode(line: bytes):
+    # Zwraca HistoryRecord, _CLEAR albo None dla uszkodzonej linii
+    try:
+        data = json.loads(line)
+        if "clear" in data:
+            return _CLEAR
+        return HistoryRecord(data["t"], data["e"], data["r"])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+class HistoryStore:
+    """Append-only, line-delimited history file.
+
+    Appends and clears are O(1) writes at the end of the file; ``tail`` reads
+    backwards from the end and stops after the requested number of records or
+    at the most recent clear marker. Data made dead by clears is dropped by
+    compaction once it exceeds ``compact_threshold`` bytes.
+
+    Several windows and processes may share one file: every write, repair and
+    compaction holds an exclusive lock on ``<name>.lock`` next to it.
+    """
+
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, path: Path | str, compact_threshold: int = 1024 * 1024):
+        self.path = Path(path)
+        self.compact_threshold = compact_threshold
+        self._dead_bytes = 0
+        self._lock = threading.Lock()
+        # Zakresy bajtów zapisane przez ten obiekt – HistoryFollower je pomija
+        self._own: list[tuple[int, int]] | None = None
+        self._repair_tail()
+
+    @contextmanager
+    def _locked(self):
+        # Osobny plik blokady: kompaktowanie podmienia sam plik historii.
+        # flock blokuje też między obiektami w jednym procesie – bez zagnieżdżania!
+        lock_path = self.path.with_name(self.path.name + ".lock")
+        with self._lock, lock_path.open("a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                yield
+                return
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    # ─── Zapis ───────────────────────────────────────
+    def _write(self, data: bytes) -> int:
+        # Pod blokadą: dopisanie na koniec i zapamiętanie własnego zakresu
+        with self.path.open("ab") as f:
+            start = f.seek(0, os.SEEK_END)
+            f.write(data)
+        end = start + len(data)
+        own = self._own
+        if own is not None:
+            if own and own[-1][1] == start:
+                own[-1] = (own[-1][0], end)
+            else:
+                own.append((start, end))
+        return end
+
+    def append(self, record: HistoryRecord):
+        self.append_many([record])
+
+    def append_many(self, records: Iterable[HistoryRecord]):
+        data = b"".join(_encode(r) for r in records)
+        if data:
+            with self._locked():
+                self._write(data)
+
+    def clear(self):
+        marker = json.dumps({"clear": datetime.now().strftime(TIMESTAMP_FORMAT)}) + "\n"
+        with self._locked():
+            self._dead_bytes = self._write(marker.encode("utf-8"))
+        self.maybe_compact()
+
+    # ─── Odczyt ──────────────────────────────────────
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _reverse_lines(self, end: int) -> Iterator[tuple[int, bytes]]:
+        # Linie od końca pliku wraz z offsetem ich początku
+        with self.path.open("rb") as f:
+            pos, rest = end, b""
+            while pos > 0:
+                size = min(self.BLOCK_SIZE, pos)
+                pos -= size
+                f.seek(pos)
+                chunk = f.read(size) + rest
+                lines = chunk.split(b"\n")
+                rest = lines.pop(0)
+                cur = pos + len(chunk)
+                for line in reversed(lines):
+                    start = cur - len(line)
+                    if line.strip():
+                        yield start, line
+                    cur = start - 1
+            if rest.strip():
+                yield 0, rest
+
+    def rows_before(self, offset: int | None,
+                    n: int) -> tuple[list["HistoryRow"], bool]:
+        """Up to ``n`` rows ending before byte ``offset`` (default: EOF), oldest first.
+
+        The flag is True when the beginning of the live history (file start or
+        last clear marker) was reached.
+        """
+        end = self.size() if offset is None else offset
+        rows: list[HistoryRow] = []
+        if end == 0:
+            return rows, True
+        if n <= 0:
+            return rows, False
+        reached = True
+        for start, line in self._reverse_lines(end):
+            item = _decode(line)
+            if item is _CLEAR:
+                self._dead_bytes = max(self._dead_bytes, start + len(line) + 1)
+                break
+            if item is not None:
+                rows.append(HistoryRow(start, start + len(line) + 1, item))
+                if len(rows) >= n:
+                    reached = start == 0
+                    break
+        rows.reverse()
+        return rows, reached
+
+    def rows_after(self, offset: int, n: int) -> list["HistoryRow"]:
+        """Up to ``n`` complete rows starting at byte ``offset``, oldest first."""
+        rows: list[HistoryRow] = []
+        if n <= 0 or not self.path.exists():
+            return rows
+        with self.path.open("rb") as f:
+            f.seek(offset)
+            pos = offset
+            for line in f:
+                start, pos = pos, pos + len(line)
+                if not line.endswith(b"\n"):
+                    break
+                item = _decode(line)
+                if item is _CLEAR:
+                    rows.clear()
+                elif item is not None:
+                    rows.append(HistoryRow(start, pos, item))
+                    if len(rows) >= n:
+                        break
+        return rows
+
+    def read_before(self, offset: int | None,
+                    n: int) -> tuple[list[HistoryRecord], int]:
+        """Return up to ``n`` records ending before byte ``offset`` (default: EOF).
+
+        The second value is the offset of the oldest returned record, or 0 when
+        the beginning of the live history (file start or last clear) was reached.
+        """
+        rows, reached = self.rows_before(offset, n)
+        start = 0 if reached or not rows else rows[0].start
+        return [row.record for row in rows], start
+
+    def tail(self, n: int) -> list[HistoryRecord]:
+        return self.read_before(None, n)[0]
+
+    def read_all(self, end: int | None = None) -> list[HistoryRecord]:
+        """The whole live history (up to byte ``end``), oldest first."""
+        records: list[HistoryRecord] = []
+        if not self.path.exists():
+            return records
+        with self.path.open("rb") as f:
+            data = f.read() if end is None else f.read(end)
+        for line in data.split(b"\n"):
+            if not line:
+                continue
+            item = _decode(line)
+            if item is _CLEAR:
+                records.clear()
+            elif item is not None:
+                records.append(item)
+        return records
+
+    def __iter__(self) -> Iterator[HistoryRecord]:
+        return iter(self.read_all())
+
+    # ─── Utrzymanie ──────────────────────────────────
+    def _repair_tail(self):
+        # Przerwany zapis zostawia linię bez "\n" – domykamy ją, żeby nie skleić
+        # jej z następnym wpisem. Pod blokadą, bo inny proces może właśnie pisać.
+        if not self.size():
+            return
+        with self._locked(), self.path.open("rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def maybe_compact(self) -> bool:
+        if self._dead_bytes >= self.compact_threshold:
+            self.compact()
+            return True
+        return False
+
+    def compact(self):
+        # Pod blokadą nikt nie dopisze niczego między odczytem a podmianą pliku
+        with self._locked():
+            live = list(self)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with tmp.open("wb") as f:
+                f.write(b"".join(_encode(r) for r in live))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._dead_bytes = 0
+            if self._own is not None:
+                self._own.clear()
+
+
+class HistoryChanges(NamedTuple):
+    rows: list[HistoryRow]      # nowe wpisy innych instancji, od najstarszego
+    cleared: bool = False       # przed nimi ktoś wyczyścił historię
+    reset: bool = False         # plik podmieniony (kompaktowanie) albo obcięty
+
+
+class HistoryFollower:
+    """Picks up records other windows and processes append to a shared history file.
+
+    ``poll`` stats the file and reads only the bytes appended since the last
+    call, so its cost is proportional to the new records (an unchanged file
+    costs one ``stat``). Records written through ``store`` itself are skipped.
+    When the file was replaced or truncated, offsets no longer mean anything:
+    ``poll`` reports ``reset`` and the caller reloads what it shows.
+    """
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        if store._own is None:
+            store._own = []
+        self.offset = 0
+        self._file: tuple[int, int] | None = None
+        self.seek_end()
+
+    def _stat(self) -> os.stat_result | None:
+        try:
+            return os.stat(self.store.path)
+        except FileNotFoundError:
+            return None
+
+    def seek_end(self) -> int:
+        """Skip everything written so far; returns the new offset."""
+        with self.store._lock:
+            st = self._stat()
+            self._file = (st.st_dev, st.st_ino) if st else None
+            self.offset = st.st_size if st else 0
+            self._forget_own()
+        return self.offset
+
+    def _forget_own(self):
+        own = self.store._own
+        while own and own[0][1] <= self.offset:
+            own.pop(0)
+
+    def poll(self) -> HistoryChanges:
+        # Blokada obiektu: własny zapis rejestruje swój zakres, zanim ją zwolni
+        with self.store._lock:
+            st = self._stat()
+            file = (st.st_dev, st.st_ino) if st else None
+            size = st.st_size if st else 0
+            if file != self._file and not (self._file is None and self.offset == 0):
+                return self._reset()
+            self._file = file
+            if size < self.offset:
+                return self._reset()
+            if size == self.offset:
+                return HistoryChanges([])
+            # Bajt przed offsetem to "\n" – inaczej plik podmieniono bez zmiany i-węzła
+            start = max(self.offset - 1, 0)
+            with self.store.path.open("rb") as f:
+                f.seek(start)
+                data = f.read(size - start)
+            if self.offset and data[:1] != b"\n":
+                return self._reset()
+            data = data[self.offset - start:]
+            # niedokończoną linię czytamy następnym razem
+            complete = data.rfind(b"\n") + 1
+            changes = self._parse(data[:complete], self.offset)
+            self.offset += complete
+            self._forget_own()
+            return changes
+
+    def _reset(self) -> HistoryChanges:
+        st = self._stat()
+        self._file = (st.st_dev, st.st_ino) if st else None
+        self.offset = st.st_size if st else 0
+        self.store._own.clear()
+        return HistoryChanges([], reset=True)
+
+    def _parse(self, data: bytes, offset: int) -> HistoryChanges:
+        rows: list[HistoryRow] = []
+        cleared = False
+        own = self.store._own
+        i = 0
+        pos = offset
+        for line in data.split(b"\n")[:-1]:
+            start, pos = pos, pos + len(line) + 1
+            while i < len(own) and own[i][1] <= start:
+                i += 1
+            if i < len(own) and own[i][0] <= start:
+                continue
+            item = _decode(line)
+            if item is _CLEAR:
+                rows.clear()
+                cleared = True
+            elif item is not None:
+                rows.append(HistoryRow(start, pos, item))
+        return HistoryChanges(rows, cleared)
+
+
+class HistoryPager:
+    """Bounded window over the history file for the history panel.
+
+    Only ``page_size * max_pages`` rows are kept in memory. Older and newer
+    pages are read on demand by byte offset, so startup cost and memory do not
+    depend on the total size of the history.
+    """
+
+    def __init__(self, store: HistoryStore, page_size: int = 100, max_pages: int = 3,
+                 flush=None):
+        self.store = store
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self.flush = flush
+        self.rows: list[HistoryRow] = []
+        self.has_older = False
+        self.has_newer = False
+        self.follower = HistoryFollower(store)
+
+    @property
+    def records(self) -> list[HistoryRecord]:
+        return [row.record for row in self.rows]
+
+    def _has_pending(self) -> bool:
+        return any(row.start is None for row in self.rows)
+
+    def load_latest(self) -> list[HistoryRecord]:
+        if self._has_pending() and self.flush:
+            self.flush()
+        # Wpisy innych instancji bierzemy od końca tej strony
+        end = self.follower.seek_end()
+        self.rows, reached = self.store.rows_before(end, self.page_size)
+        self.has_older = not reached
+        self.has_newer = False
+        return self.records
+
+    def _sync_pending(self):
+        # Wpisy z tej sesji dostają offsety dopiero po zapisie na dysk
+        if self._has_pending():
+            if self.flush:
+                self.flush()
+            first = self.rows[0].start
+            rows, _ = self.store.rows_before(None, len(self.rows))
+            self.rows = [row for row in rows if first is None or row.start >= first]
+
+    def load_older(self) -> tuple[list[HistoryRecord], int]:
+        """Prepend one older page; returns the new rows and how many newest
+        rows were dropped."""
+        if not self.has_older or not self.rows:
+            return [], 0
+        self._sync_pending()
+        rows, reached = self.store.rows_before(self.rows[0].start, self.page_size)
+        self.has_older = not reached
+        self.rows[:0] = rows
+        dropped = max(0, len(self.rows) - self.max_rows)
+        if dropped:
+            del self.rows[-dropped:]
+            self.has_newer = True
+        return [row.record for row in rows], dropped
+
+    def load_newer(self) -> tuple[list[HistoryRecord], int]:
+        """Append one newer page; returns the new rows and how many oldest
+        rows were dropped."""
+        if not self.has_newer or not self.rows:
+            return [], 0
+        rows = self.store.rows_after(self.rows[-1].end, self.page_size)
+        if len(rows) < self.page_size:
+            self.has_newer = False
+        self.rows.extend(rows)
+        dropped = max(0, len(self.rows) - self.max_rows)
+        if dropped:
+            del self.rows[:dropped]
+            self.has_older = True
+        return [row.record for row in rows], dropped
+
+    def append(self, record: HistoryRecord) -> int:
+        """Add a record written in this session; returns how many oldest rows
+        were dropped."""
+        self.rows.append(HistoryRow(None, None, record))
+        dropped = max(0, len(self.rows) - self.max_rows)
+        if dropped:
+            del self.rows[:dropped]
+            self.has_older = True
+        return dropped
+
+    def follow(self) -> tuple[HistoryChanges, int]:
+        """Take in records other instances appended; returns the changes and how
+        many oldest rows were dropped. After ``cleared`` or ``reset`` the caller
+        should show ``load_latest()`` instead."""
+        changes = self.follower.poll()
+        if changes.cleared or changes.reset or self.has_newer:
+            # Przy przewiniętym oknie nowe wiersze dojdą z load_newer
+            return changes, 0
+        self.rows.extend(changes.rows)
+        dropped = max(0, len(self.rows) - self.max_rows)
+        if dropped:
+            del self.rows[:dropped]
+            self.has_older = True
+        return changes, dropped
+
+    def clear(self):
+        self.rows = []
+        self.has_older = self.has_newer = False
+
+
+_CLEAR_REQUEST = object()
+_STOP = object()
+
+
+class HistoryWriter:
+    """Persists history on a dedicated thread so callers never wait for the disk.
+
+    ``append`` and ``clear`` only enqueue work. The writer collects records that
+    arrive within ``flush_interval`` seconds of the first one and writes them in
+    a single ``append_many`` call.
+    """
+
+    def __init__(self, store: HistoryStore, flush_interval: float = 0.25,
+                 max_batch: int = 1000):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.last_error: OSError | None = None
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="history-writer",
+                                        daemon=True)
+        self._thread.start()
+
+    def append(self, record: HistoryRecord):
+        self._queue.put(record)
+
+    def clear(self):
+        self._queue.put(_CLEAR_REQUEST)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float | None = None):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _write(self, pending: list[HistoryRecord]):
+        if not pending:
+            return
+        try:
+            with METRICS.measure("history.write"):
+                self.store.append_many(pending)
+        except OSError as e:
+            self.last_error = e
+        pending.clear()
+
+    def _run(self):
+        pending: list[HistoryRecord] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._write(pending)
+                continue
+
+            if isinstance(item, HistoryRecord):
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.append(item)
+                if len(pending) >= self.max_batch:
+                    self._write(pending)
+            elif item is _CLEAR_REQUEST:
+                pending.clear()
+                try:
+                    self.store.clear()
+                except OSError as e:
+                    self.last_error = e
+            elif item is _STOP:
+                self._write(pending)
+                return
+            else:
+                self._write(pending)
+                item.set()
+
+
+def migrate_legacy(legacy_path: Path | str, store: HistoryStore) -> int:
+    """Import a pre-JSONL ``history.json`` once and rename it to ``*.bak``."""
+    legacy_path = Path(legacy_path)
+    if not legacy_path.exists() or store.size():
+        return 0
+    with store._locked():
+        # Dwa okna uruchomione naraz: drugie czeka na blokadę i zastaje już
+        # zaimportowaną historię albo przeniesiony plik
+        if not legacy_path.exists() or store.size():
+            return 0
+        try:
+            with legacy_path.open("r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", [])
+        except (OSError, ValueError, AttributeError):
+            entries = []
+        records = [r for r in map(parse_legacy_entry, entries) if r is not None]
+        data = b"".join(_encode(r) for r in records)
+        if data:
+            store._write(data)
+        try:
+            legacy_path.replace(legacy_path.with_name(legacy_path.name + ".bak"))
+        except FileNotFoundError:
+            return 0                        # ktoś inny już go przeniósł
+    return len(records)
@@ -1,35 +1,87 @@
-import operator
+import heapq
 import math
+import operator
 import re
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from decimal import MAX_EMAX, Decimal, localcontext
+from decimal import Overflow as DecimalOverflow
+from fractions import Fraction
+from functools import partial
+from typing import NamedTuple
 
+from . import decimal_math
+from .metrics import METRICS
+from .units import UNITS, Quantity, split_conversion
 
 # ────────────────────────────────────────────────
 # FUNKCJE TRYGONOMETRYCZNE
 # ────────────────────────────────────────────────
-ANGLE_MODE = "DEG"
+ANGLE_MODES = ("DEG", "RAD")
 
-def set_angle_mode(mode: str):
-    global ANGLE_MODE
-    if mode not in ("DEG", "RAD"):
+# Osobny, niezmienny zestaw funkcji dla każdego trybu – nic nie czyta
+# globalnego trybu w trakcie obliczeń.
+ANGLE_FUNCTIONS = {
+    "DEG": {
+        "sin": lambda x: math.sin(math.radians(x)),
+        "cos": lambda x: math.cos(math.radians(x)),
+        "tan": lambda x: math.tan(math.radians(x)),
+        "asin": lambda x: math.degrees(math.asin(x)),
+        "acos": lambda x: math.degrees(math.acos(x)),
+        "atan": lambda x: math.degrees(math.atan(x)),
+    },
+    "RAD": {
+        "sin": math.sin, "cos": math.cos, "tan": math.tan,
+        "asin": math.asin, "acos": math.acos, "atan": math.atan,
+    },
+}
+
+
+def _check_angle_mode(mode: str) -> str:
+    if mode not in ANGLE_MODES:
         raise ValueError("Mode must be 'DEG' or 'RAD'")
-    ANGLE_MODE = mode
+    return mode
 
 
-def _to_rad(x: float) -> float:
-    return math.radians(x) if ANGLE_MODE == "DEG" else x
+def set_angle_mode(mode: str):
+    DEFAULT_EVALUATOR.set_angle_mode(mode)
+
+
+def __getattr__(name):
+    # ANGLE_MODE zostaje dostępny jako atrybut modułu (tylko do odczytu)
+    if name == "ANGLE_MODE":
+        return DEFAULT_EVALUATOR.angle_mode
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-def _from_rad(x: float) -> float:
-    return math.degrees(x) if ANGLE_MODE == "DEG" else x
+def factorial(x):
+    if not (isinstance(x, (int, float)) and x == int(x) and x >= 0):
+        raise ValueError("Factorial tylko dla nieujemnych liczb całkowitych")
+    n = int(x)
+    # log2(n!) ≈ n·log2(n) – zbyt dużych silni nawet nie zaczynamy liczyć
+    if n > 2 and n * math.log2(n) > MAX_EXACT_BITS:
+        raise OverflowError("Factorial result too large")
+    return math.factorial(n)
 
 
-def sin(x):    return math.sin(_to_rad(x))
-def cos(x):    return math.cos(_to_rad(x))
-def tan(x):    return math.tan(_to_rad(x))
+def power(a, b):
+    # int ** int (np. 20!^20!) liczyłoby się minutami – duże wyniki przez float
+    if (type(a) is int and type(b) is int and b > 0
+            and b * a.bit_length() > MAX_EXACT_BITS):
+        return float(a) ** b
+    return a ** b
 
-def asin(x):   return _from_rad(math.asin(x))
-def acos(x):   return _from_rad(math.acos(x))
-def atan(x):   return _from_rad(math.atan(x))
+
+def sin(x):    return ANGLE_FUNCTIONS[DEFAULT_EVALUATOR.angle_mode]["sin"](x)
+def cos(x):    return ANGLE_FUNCTIONS[DEFAULT_EVALUATOR.angle_mode]["cos"](x)
+def tan(x):    return ANGLE_FUNCTIONS[DEFAULT_EVALUATOR.angle_mode]["tan"](x)
+
+def asin(x):   return ANGLE_FUNCTIONS[DEFAULT_EVALUATOR.angle_mode]["asin"](x)
+def acos(x):   return ANGLE_FUNCTIONS[DEFAULT_EVALUATOR.angle_mode]["acos"](x)
+def atan(x):   return ANGLE_FUNCTIONS[DEFAULT_EVALUATOR.angle_mode]["atan"](x)
 
 
 # ────────────────────────────────────────────────
@@ -37,17 +89,22 @@ def atan(x):   return _from_rad(math.atan(x))
 # ────────────────────────────────────────────────
 
 OPS = {
-    "+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv, "^": operator.pow,
+    "+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv,
+    "^": power,
     "x²": lambda x: x ** 2, "x³": lambda x: x ** 3,
     "√": math.sqrt, "³√": lambda x: x ** (1 / 3), "1/x": lambda x: 1 / x,
-    "%": lambda x: x / 100, "!": math.factorial,
+    "%": lambda x: x / 100, "!": factorial,
     "sin": sin, "cos": cos, "tan": tan,
     "asin": asin, "acos": acos, "atan": atan,
     "ln": math.log, "log": math.log10, "exp": math.exp,
+    "neg": operator.neg,
 }
 
 CONSTANTS = {"π": math.pi, "e": math.e, "Ans": 0.0}
 
+# Tablice OPS z funkcjami trygonometrycznymi ustalonymi dla danego trybu
+MODE_OPS = {mode: {**OPS, **funcs} for mode, funcs in ANGLE_FUNCTIONS.items()}
+
 PRECEDENCE = {
     "+": (1, "L"), "-": (1, "L"),
     "*": (2, "L"), "/": (2, "L"),
@@ -57,100 +114,2031 @@ PRECEDENCE = {
     "sin": (4, "R"), "cos": (4, "R"), "tan": (4, "R"),
     "asin": (4, "R"), "acos": (4, "R"), "atan": (4, "R"),
     "ln": (4, "R"), "log": (4, "R"), "exp": (4, "R"),
+    "neg": (3, "R"),
 }
 
 # ────────────────────────────────────────────────
-# PARSER + EVALUATOR
+# TRYB DOKŁADNY: int + Fraction
 # ────────────────────────────────────────────────
 
-def add_spaces(expr: str) -> str:
-    if not expr.strip():
-        return ""
+NUMBER_MODES = ("FLOAT", "EXACT", "DECIMAL")
+# Powyżej tego rozmiaru wyniku (w bitach) potęgi i silnie przechodzą na float
+MAX_EXACT_BITS = 1 << 22
+# Podgląd liczy się przy każdym klawiszu – większe wyniki pomija
+PREVIEW_MAX_BITS = 1 << 16
+_EXACT_TYPES = (int, Fraction)
 
-    replacements = {"³√": " 3√ ", "√": " √ ", "1/x": " 1/ ", "x²": " x² ", "x³": " x³ ", "!": " ! "}
-    for old, new in replacements.items():
-        expr = expr.replace(old, new)
 
-    expr = re.sub(r'([+\-*/^()])', r' \1 ', expr)
+def _check_decimal_digits(digits: int) -> int:
+    if not isinstance(digits, int) or digits < 1:
+        raise ValueError("decimal_digits must be a positive integer")
+    return digits
 
-    for name in list(OPS) + list(CONSTANTS):
-        expr = re.sub(rf'\b{re.escape(name)}\b', f' {name} ', expr, flags=re.IGNORECASE)
 
-    expr = re.sub(r'\s+', ' ', expr.strip())
+def _check_number_mode(mode: str) -> str:
+    if mode not in NUMBER_MODES:
+        raise ValueError(f"Unknown number mode {mode!r}")
+    return mode
 
-    expr = re.sub(r'(\d|\.)\s*([πeAns(])', r'\1 * \2', expr)
-    expr = re.sub(r'([)])\s*(\d|\.|π|e|Ans|[a-zA-Z])', r'\1 * \2', expr)
 
-    return expr.strip()
+def _exact(value):
+    if isinstance(value, Fraction) and value.denominator == 1:
+        return value.numerator
+    return value
 
 
-def shunting_yard(expr: str) -> list[str]:
-    output, stack = [], []
-    tokens = add_spaces(expr).split()
+def exact_number(token: str):
+    # "1e400" jako Fraction to 10**400 – sensowne; "1e999999999" już nie
+    mantissa, _, exponent = token.lower().partition("e")
+    if exponent and abs(int(exponent)) > 1000:
+        return float(token)
+    return _exact(Fraction(token))
 
-    for token in tokens:
-        if token in OPS:
-            while stack and stack[-1] != '(' and stack[-1] in PRECEDENCE:
-                p1, assoc = PRECEDENCE[token]
-                p2, _ = PRECEDENCE[stack[-1]]
-                if (assoc == "L" and p1 <= p2) or (assoc == "R" and p1 < p2):
-                    output.append(stack.pop())
-                else:
-                    break
-            stack.append(token)
-        elif token == '(':
-            stack.append(token)
-        elif token == ')':
-            while stack and stack[-1] != '(':
-                output.append(stack.pop())
-            stack.pop() if stack else None
-        else:
-            output.append(token)
 
-    while stack:
-        output.append(stack.pop())
+def exact_div(a, b):
+    if isinstance(a, _EXACT_TYPES) and isinstance(b, _EXACT_TYPES):
+        return _exact(Fraction(a, b))
+    return a / b
+
+
+def _bits(x) -> int:
+    if isinstance(x, Fraction):
+        return max(x.numerator.bit_length(), x.denominator.bit_length())
+    return x.bit_length()
+
+
+def _int_root(n: int, k: int) -> int | None:
+    # Dokładny pierwiastek k-tego stopnia z n >= 0 albo None
+    if n < 2:
+        return n
+    if k == 2:
+        r = math.isqrt(n)
+    elif n.bit_length() <= 52:
+        r = round(n ** (1 / k))
+    else:
+        # Newton na liczbach całkowitych – float nie ma tu dość cyfr
+        r = 1 << -(-n.bit_length() // k)
+        while True:
+            s = ((k - 1) * r + n // r ** (k - 1)) // k
+            if s >= r:
+                break
+            r = s
+    for c in (r - 1, r, r + 1):
+        if c >= 0 and c ** k == n:
+            return c
+    return None
+
+
+def exact_root(x, k: int):
+    if isinstance(x, _EXACT_TYPES):
+        sign = -1 if x < 0 and k % 2 else 1
+        if x >= 0 or sign < 0:
+            x = Fraction(abs(x))
+            num, den = _int_root(x.numerator, k), _int_root(x.denominator, k)
+            if num is not None and den is not None:
+                return _exact(sign * Fraction(num, den))
+    return math.sqrt(x) if k == 2 else x ** (1 / k)
+
+
+def exact_pow(a, b):
+    if isinstance(a, _EXACT_TYPES) and isinstance(b, _EXACT_TYPES):
+        b = Fraction(b)
+        if b.denominator == 1:
+            n = b.numerator
+            if a == 0 and n < 0:
+                raise ZeroDivisionError("0 cannot be raised to a negative power")
+            if abs(n) * max(_bits(a), 1) <= MAX_EXACT_BITS:
+                return _exact(Fraction(a) ** n)
+        elif b.denominator <= 64:
+            root = exact_root(a, b.denominator)
+            if isinstance(root, _EXACT_TYPES):
+                return exact_pow(root, b.numerator)
+        return float(a) ** float(b)
+    return a ** b
+
+
+def _range_product(lo: int, hi: int) -> int:
+    # Iloczyn lo * (lo+1) * ... * hi przez podział na połowy – mnożymy
+    # liczby podobnej wielkości, co jest dużo szybsze niż mnożenie po kolei
+    if hi - lo < 16:
+        result = 1
+        for i in range(lo, hi + 1):
+            result *= i
+        return result
+    mid = (lo + hi) // 2
+    return _range_product(lo, mid) * _range_product(mid + 1, hi)
+
+
+_FACTORIAL_MEMO: OrderedDict[int, int] = OrderedDict()
+_FACTORIAL_MEMO_SIZE = 16
+_factorial_lock = threading.Lock()
+
+
+def exact_factorial(x):
+    if isinstance(x, Fraction):
+        x = _exact(x)
+    if isinstance(x, float) or not isinstance(x, int):
+        return factorial(x)
+    if x < 0:
+        raise ValueError("Factorial tylko dla nieujemnych liczb całkowitych")
+    # log2(n!) ≈ n·log2(n) – nie liczymy wyników, których i tak nie pokażemy
+    if x > 2 and x * math.log2(x) > MAX_EXACT_BITS:
+        raise OverflowError("Factorial result too large")
+
+    with _factorial_lock:
+        if x in _FACTORIAL_MEMO:
+            _FACTORIAL_MEMO.move_to_end(x)
+            return _FACTORIAL_MEMO[x]
+        # Zaczynamy od najbliższej zapamiętanej mniejszej silni, jeśli jest blisko
+        base = max((n for n in _FACTORIAL_MEMO if x // 2 <= n < x), default=None)
+        start = _FACTORIAL_MEMO[base] if base is not None else 1
+
+    if base is None:
+        result = math.factorial(x)
+    else:
+        result = start * _range_product(base + 1, x)
+
+    with _factorial_lock:
+        _FACTORIAL_MEMO[x] = result
+        while len(_FACTORIAL_MEMO) > _FACTORIAL_MEMO_SIZE:
+            _FACTORIAL_MEMO.popitem(last=False)
+    return result
+
+
+EXACT_OPS = {
+    # 1/2 + 1/2 to Fraction(1, 1) – wynik sprowadzamy z powrotem do int
+    "+": lambda a, b: _exact(a + b), "-": lambda a, b: _exact(a - b),
+    "*": lambda a, b: _exact(a * b),
+    "/": exact_div, "^": exact_pow,
+    "√": lambda x: exact_root(x, 2), "³√": lambda x: exact_root(x, 3),
+    "1/x": lambda x: exact_div(1, x), "%": lambda x: exact_div(x, 100),
+    "!": exact_factorial,
+}
+
+# Funkcje przestępne zostają z MODE_OPS – przyjmują Fraction i zwracają float
+EXACT_MODE_OPS = {mode: {**ops, **EXACT_OPS} for mode, ops in MODE_OPS.items()}
+
+
+# ────────────────────────────────────────────────
+# TRYB DZIESIĘTNY: decimal.Decimal z zadaną precyzją
+# ────────────────────────────────────────────────
+
+DECIMAL_DIGITS = 50
+
+
+# Powyżej tego argumentu silnia idzie ze wzoru Stirlinga – dokładny wynik
+# ma dziesiątki tysięcy cyfr, a Decimal(int) jest kwadratowe względem ich liczby
+DECIMAL_EXACT_FACTORIAL = 10_000
+
+
+def _decimal_factorial(x):
+    if x != x.to_integral_value() or x < 0:
+        raise ValueError("Factorial tylko dla nieujemnych liczb całkowitych")
+    if x.adjusted() >= 18:
+        # Wynik i tak przekroczy zakres wykładnika Decimal; int(x) byłby ogromny
+        raise OverflowError("Factorial result too large")
+    if x > DECIMAL_EXACT_FACTORIAL:
+        return decimal_math.factorial(int(x))
+    return +Decimal(exact_factorial(int(x)))
+
+
+DECIMAL_OPS = {
+    "+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv,
+    "^": operator.pow,
+    "x²": lambda x: x * x, "x³": lambda x: x * x * x,
+    "√": decimal_math.sqrt, "³√": decimal_math.cbrt, "1/x": lambda x: 1 / x,
+    "%": lambda x: x / 100, "!": _decimal_factorial,
+    "ln": decimal_math.ln, "log": decimal_math.log10, "exp": decimal_math.exp,
+    "neg": operator.neg,
+}
+
+DECIMAL_MODE_OPS = {
+    mode: {
+        **DECIMAL_OPS,
+        **{
+            name: partial(getattr(decimal_math, name), degrees=mode == "DEG")
+            for name in ANGLE_FUNCTIONS[mode]
+        },
+    }
+    for mode in ANGLE_MODES
+}
+
+
+def _decimal_constants(constants: dict) -> dict:
+    # π i e w bieżącej precyzji (pamiętane per precyzja), Ans zamieniony na Decimal
+    return {
+        **constants,
+        "π": decimal_math.pi(), "e": decimal_math.e(),
+        "Ans": decimal_math.to_decimal(constants.get("Ans", 0)),
+    }
+
+
+def _default_decimal(name: str):
+    # Funkcja kąta DECIMAL w trybie kątów domyślnej instancji
+    return lambda x: DECIMAL_MODE_OPS[DEFAULT_EVALUATOR.angle_mode][name](x)
+
+
+NUMBER_OPS = {"FLOAT": MODE_OPS, "EXACT": EXACT_MODE_OPS, "DECIMAL": DECIMAL_MODE_OPS}
+# Tablice bez ustalonego trybu kątów (funkcje modułu czytają tryb domyślnej instancji)
+DEFAULT_OPS = {
+    "FLOAT": OPS,
+    "EXACT": {**OPS, **EXACT_OPS},
+    "DECIMAL": {
+        **DECIMAL_OPS,
+        **{name: _default_decimal(name) for name in ANGLE_FUNCTIONS["DEG"]},
+    },
+}
+NUMBER_LITERALS = {"FLOAT": float, "EXACT": exact_number, "DECIMAL": Decimal}
+
+# ────────────────────────────────────────────────
+# LEKSER + PARSER + EVALUATOR
+# ────────────────────────────────────────────────
+
+class ParseError(ValueError):
+    def __init__(self, message: str, pos: int):
+        super().__init__(f"{message} at position {pos}")
+        self.message = message
+        self.pos = pos
+
+    def __reduce__(self):
+        # Domyślne odtwarzanie woła cls(*args) – a args to jeden napis
+        return type(self), (self.message, self.pos)
+
+
+class Token(NamedTuple):
+    kind: str
+    value: str
+    pos: int
+
+
+# Rodzaje tokenów
+NUMBER = "number"
+CONSTANT = "constant"
+FUNCTION = "function"
+OPERATOR = "operator"
+PAREN = "paren"
+VARIABLE = "variable"
+
+BINARY_OPS = frozenset({"+", "-", "*", "/", "^"})
+# Operatory jednoargumentowe, które można pisać także za argumentem ("5!", "5x²")
+POSTFIX_OPS = frozenset({"x²", "x³", "!", "%"})
+UNARY_MINUS = "neg"
+
+
+def _build_lexer() -> re.Pattern:
+    names = [name for name in OPS if name not in BINARY_OPS and name != UNARY_MINUS]
+    names += list(CONSTANTS)
+    names.sort(key=len, reverse=True)
+    return re.compile(
+        r"(?P<ws>\s+)"
+        # Nazwy funkcji i stałych bez względu na wielkość liter – jak dawne add_spaces
+        rf"|(?P<name>(?i:{'|'.join(map(re.escape, names))}))"
+        r"|(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)"
+        r"|(?P<ident>[A-Za-z_]\w*)"
+        r"|(?P<op>[-+*/^])"
+        r"|(?P<paren>[()])"
+        r"|(?P<error>.)",
+        re.DOTALL,
+    )
+
+
+_LEXER = _build_lexer()
+# "SIN", "Ans", "ANS" -> nazwa z tablic OPS / CONSTANTS
+_CANONICAL_NAMES = {name.lower(): name for name in [*OPS, *CONSTANTS]}
+_OPERATOR_FOLLOWS = re.compile(r"\s*(?:$|[-+*/^)!%])")
+_OPERAND_KINDS = {"number": NUMBER, "name": CONSTANT, "ident": VARIABLE}
+
+
+def _scan(expr: str, pos: int = 0, expect_operand: bool = True,
+          after_open: bool = True, parens: tuple | None = None):
+    # Leksem po leksemie:
+    # (tokeny, koniec, zajrzane_do, expect_operand, after_open, parens).
+    # Stan jest niemutowalny – parens to lista jednokierunkowa (pozycja "(", reszta) –
+    # więc IncrementalParser może wznowić skanowanie z dowolnego miejsca.
+    for m in _LEXER.finditer(expr, pos):
+        kind, value, start, end = m.lastgroup, m.group(), m.start(), m.end()
+
+        if kind == "ws":
+            continue
+        if kind == "error":
+            raise ParseError(f"Unexpected character {value!r}", start)
+
+        if kind == "op":
+            if expect_operand:
+                if value == "+" and after_open:
+                    yield [], end, end, expect_operand, after_open, parens
+                    continue
+                if value == "-":
+                    after_open = False
+                    yield ([Token(OPERATOR, UNARY_MINUS, start)], end, end,
+                           expect_operand, after_open, parens)
+                    continue
+                raise ParseError(f"Missing operand before {value!r}", start)
+            expect_operand, after_open = True, False
+            yield ([Token(OPERATOR, value, start)], end, end,
+                   expect_operand, after_open, parens)
+            continue
+
+        if kind == "paren":
+            if value == "(":
+                lexeme = [Token(PAREN, value, start)]
+                if not expect_operand:
+                    lexeme.insert(0, Token(OPERATOR, "*", start))
+                parens = (start, parens)
+                expect_operand = after_open = True
+            else:
+                if not parens:
+                    raise ParseError("Unmatched ')'", start)
+                if expect_operand:
+                    raise ParseError("Missing operand before ')'", start)
+                parens = parens[1]
+                lexeme = [Token(PAREN, value, start)]
+                after_open = False
+            yield lexeme, end, end, expect_operand, after_open, parens
+            continue
+
+        after_open = False
+        if kind == "name" and value not in OPS and value not in CONSTANTS:
+            value = _CANONICAL_NAMES[value.lower()]
+        if value == "1/x":
+            follows = _OPERATOR_FOLLOWS.match(expr, end)
+            if follows:
+                # "1/x" bez argumentu to dzielenie przez zmienną x
+                lexeme = [Token(NUMBER, "1", start), Token(OPERATOR, "/", start + 1),
+                          Token(VARIABLE, "x", start + 2)]
+                if not expect_operand:
+                    lexeme.insert(0, Token(OPERATOR, "*", start))
+                expect_operand = False
+                yield lexeme, end, follows.end(), expect_operand, after_open, parens
+                continue
+
+        if kind == "name" and value in OPS:
+            if value in POSTFIX_OPS:
+                # Za argumentem działa jak operator postfiksowy, przed nim jak funkcja
+                lexeme = [Token(FUNCTION if expect_operand else OPERATOR, value, start)]
+            else:
+                lexeme = [Token(FUNCTION, value, start)]
+                if not expect_operand:
+                    lexeme.insert(0, Token(OPERATOR, "*", start))
+                expect_operand = True
+            yield lexeme, end, end, expect_operand, after_open, parens
+            continue
+
+        # Liczba, stała albo zmienna – wstawiamy niejawne mnożenie ("2π", "3(4)", "2x")
+        lexeme = [Token(_OPERAND_KINDS[kind], value, start)]
+        if not expect_operand:
+            lexeme.insert(0, Token(OPERATOR, "*", start))
+        expect_operand = False
+        yield lexeme, end, end, expect_operand, after_open, parens
+
+
+def tokenize(expr: str) -> list[Token]:
+    tokens: list[Token] = []
+    # Stan po ostatnim leksemie: (leksem, pos, seen, expect_operand, after_open, parens)
+    state = ((), 0, 0, True, True, None)
+    for state in _scan(expr):
+        tokens += state[0]
+    expect_operand, parens = state[3], state[5]
+
+    if parens:
+        raise ParseError("Unclosed '('", parens[0])
+    if expect_operand and tokens:
+        raise ParseError("Unexpected end of expression", len(expr))
+    return tokens
+
+
+def add_spaces(expr: str) -> str:
+    return " ".join("-" if t.value == UNARY_MINUS else t.value for t in tokenize(expr))
+
+
+def _shunt(kind: str, token: str, stack: tuple | None, emit) -> tuple | None:
+    # Jeden krok algorytmu stacji rozrządowej. Stos operatorów to lista
+    # jednokierunkowa (wierzchołek, reszta), więc zapamiętanie stanu nic nie kosztuje.
+    if kind == FUNCTION or token == UNARY_MINUS:
+        # Operatory prefiksowe czekają na swój argument
+        return token, stack
+    if kind == OPERATOR:
+        p1, assoc = PRECEDENCE[token]
+        while stack and stack[0] != "(":
+            p2 = PRECEDENCE[stack[0]][0]
+            if p1 < p2 or (assoc == "L" and p1 == p2):
+                emit(stack[0])
+                stack = stack[1]
+            else:
+                break
+        return token, stack
+    if token == "(":
+        return token, stack
+    if token == ")":
+        while stack[0] != "(":
+            emit(stack[0])
+            stack = stack[1]
+        return stack[1]
+    emit(token)
+    return stack
+
+
+def tokens_to_rpn(tokens: list[Token]) -> list[str]:
+    output: list[str] = []
+    emit = output.append
+    stack = None
+    for kind, token, _ in tokens:
+        stack = _shunt(kind, token, stack, emit)
 
+    while stack:
+        output.append(stack[0])
+        stack = stack[1]
     return output
 
 
-def evaluate_rpn(tokens: list[str]) -> float:
+def shunting_yard(expr: str) -> list[str]:
+    return tokens_to_rpn(tokenize(expr))
+
+
+def _is_variable(token: str) -> bool:
+    return token.isidentifier() and token not in OPS and token not in CONSTANTS
+
+
+def evaluate_rpn(tokens: list[str], variables: dict | None = None,
+                 ops: dict | None = None, constants: dict | None = None,
+                 number=float) -> float:
+    ops = OPS if ops is None else ops
+    constants = CONSTANTS if constants is None else constants
     stack = []
     for token in tokens:
-        if token in OPS:
-            func = OPS[token]
-            if token in {"+", "-", "*", "/", "^"}:
+        if token in ops:
+            func = ops[token]
+            if token in BINARY_OPS:
                 b, a = stack.pop(), stack.pop()
                 stack.append(func(a, b))
-            elif token == "!":
-                a = stack.pop()
-                if not (isinstance(a, (int, float)) and a == int(a) and a >= 0):
-                    raise ValueError("Factorial tylko dla nieujemnych liczb całkowitych")
-                stack.append(func(int(a)))
             else:
                 stack.append(func(stack.pop()))
-        elif token in CONSTANTS:
-            stack.append(CONSTANTS[token])
+        elif token in constants:
+            stack.append(constants[token])
+        elif token.isidentifier():
+            if not variables or token not in variables:
+                raise ValueError(f"Unknown variable {token!r}")
+            stack.append(variables[token])
         else:
-            stack.append(float(token))
+            stack.append(number(token))
 
+    if len(stack) != 1:
+        raise ValueError("Malformed expression")
     return stack[0]
 
 
-def evaluate_expression(expression: str) -> str:
-    if not expression.strip():
-        return ""
+# ────────────────────────────────────────────────
+# OPTYMALIZATOR: SKŁADANIE STAŁYCH + WSPÓLNE PODWYRAŻENIA
+# ────────────────────────────────────────────────
+
+# Wynik zależy od trybu kątów, który program współdzieli między trybami
+ANGLE_DEPENDENT = frozenset({"sin", "cos", "tan", "asin", "acos", "atan"})
+# Stałe, które wolno wstawić w czasie kompilacji ("Ans" się zmienia)
+FOLDABLE_CONSTANTS = {"π": math.pi, "e": math.e}
+# W trybie DECIMAL wynik zależy od precyzji w chwili obliczenia – nie składamy
+FOLDING_MODES = frozenset({"FLOAT", "EXACT"})
+# Działania przemienne – argumenty porządkujemy, żeby a+b i b+a były jednym węzłem.
+# Nie gdy oba zależą od zmiennych: jednostka sumy Quantity to jednostka lewego
+# składnika, więc dla "2 m + km" kolejność ma znaczenie
+COMMUTATIVE_OPS = frozenset({"+", "*"})
+
+
+class Node(NamedTuple):
+    kind: str                   # NUMBER, CONSTANT, VARIABLE albo OPERATOR
+    value: object               # liczba, nazwa stałej/zmiennej lub operatora
+    args: tuple[int, ...] = ()  # indeksy argumentów w ExpressionTree.nodes
+
+
+class ExpressionTree:
+    """Optimized form of an RPN program: a DAG in evaluation order.
+
+    Constant subtrees are folded to numbers and identical subexpressions
+    share one node, so each is computed once. ``nodes`` lists only reachable
+    nodes, children before parents; the last one is the result.
+    """
+
+    def __init__(self, nodes: tuple[Node, ...]):
+        self.nodes = nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __str__(self):
+        def ref(i: int) -> str:
+            node = self.nodes[i]
+            if node.kind is OPERATOR:
+                return f"t{i}"
+            return repr(node.value) if node.kind is NUMBER else node.value
+
+        lines = []
+        for i, node in enumerate(self.nodes):
+            if node.kind is not OPERATOR:
+                continue
+            args = [ref(a) for a in node.args]
+            if len(args) == 2:
+                code = f"{args[0]} {node.value} {args[1]}"
+            else:
+                code = f"{node.value}({args[0]})"
+            lines.append(f"t{i} = {code}")
+        return "\n".join(lines) or ref(len(self.nodes) - 1)
+
+    def __repr__(self):
+        return f"ExpressionTree({len(self.nodes)} nodes)"
+
 
+def _fold(func, args: list):
     try:
-        rpn = shunting_yard(expression)
-        result = evaluate_rpn(rpn)
-        CONSTANTS["Ans"] = result
+        value = func(*args)
+    except (ArithmeticError, ValueError, TypeError):
+        # Błąd zostawiamy na czas obliczenia – komunikat ma być taki sam
+        return None
+    return value if isinstance(value, (float, int, Fraction)) else None
+
+
+def _node_key(node: Node):
+    # 1 == 1.0 == Fraction(1) i 0.0 == -0.0, ale to różne literały
+    if node.kind is NUMBER:
+        value = node.value
+        sign = math.copysign(1.0, value) if isinstance(value, float) else 0
+        return node, type(value), sign
+    return node
+
+
+def optimize(rpn: list[str], number_mode: str = "FLOAT") -> ExpressionTree:
+    ops = NUMBER_OPS[number_mode]["RAD"]
+    number = NUMBER_LITERALS[number_mode]
+    fold = number_mode in FOLDING_MODES
+    nodes: list[Node] = []
+    index: dict = {}
+    stack: list[int] = []
+    varying: set[int] = set()       # węzły zależne od zmiennych
+
+    def intern(node: Node) -> int:
+        key = _node_key(node)
+        i = index.get(key)
+        if i is None:
+            i = index[key] = len(nodes)
+            nodes.append(node)
+        return i
+
+    for token in rpn:
+        if token in OPS:
+            arity = 2 if token in BINARY_OPS else 1
+            if len(stack) < arity:
+                raise ValueError("Malformed expression")
+            args = stack[-arity:]
+            del stack[-arity:]
+            operands = [nodes[a] for a in args]
+            if (fold and token not in ANGLE_DEPENDENT
+                    and all(n.kind is NUMBER for n in operands)):
+                value = _fold(ops[token], [n.value for n in operands])
+                if value is not None:
+                    stack.append(intern(Node(NUMBER, value)))
+                    continue
+            n_varying = sum(a in varying for a in args)
+            if token in COMMUTATIVE_OPS and n_varying < 2:
+                args.sort()
+            i = intern(Node(OPERATOR, token, tuple(args)))
+            if n_varying:
+                varying.add(i)
+            stack.append(i)
+        elif fold and token in FOLDABLE_CONSTANTS:
+            stack.append(intern(Node(NUMBER, FOLDABLE_CONSTANTS[token])))
+        elif token in CONSTANTS:
+            stack.append(intern(Node(CONSTANT, token)))
+        elif token.isidentifier():
+            i = intern(Node(VARIABLE, token))
+            varying.add(i)
+            stack.append(i)
+        else:
+            stack.append(intern(Node(NUMBER, number(token))))
+
+    if len(stack) != 1:
+        raise ValueError("Malformed expression")
+
+    # Po złożeniu stałych część węzłów jest martwa – zostawiamy osiągalne
+    live = {stack[0]}
+    for i in range(stack[0], -1, -1):
+        if i in live:
+            live.update(nodes[i].args)
+    renumber = {old: new for new, old in enumerate(sorted(live))}
+    return ExpressionTree(tuple(
+        nodes[i]._replace(args=tuple(renumber[a] for a in nodes[i].args))
+        for i in sorted(live)
+    ))
+
+
+def evaluate_tree(tree: ExpressionTree, variables: dict | None = None,
+                  ops: dict | None = None, constants: dict | None = None):
+    ops = OPS if ops is None else ops
+    constants = CONSTANTS if constants is None else constants
+    values = []
+    for kind, value, args in tree.nodes:
+        if kind is OPERATOR:
+            values.append(ops[value](*[values[a] for a in args]))
+        elif kind is NUMBER:
+            values.append(value)
+        elif kind is CONSTANT:
+            values.append(constants[value])
+        else:
+            if not variables or value not in variables:
+                raise ValueError(f"Unknown variable {value!r}")
+            values.append(variables[value])
+    return values[-1]
+
+
+def explain(expr: str) -> str:
+    """Optimized program for ``expr``, one computed node per line."""
+    return str(compile_expression(expr).tree)
+
+
+# ────────────────────────────────────────────────
+# KOMPILATOR RPN -> FUNKCJA PYTHONA
+# ────────────────────────────────────────────────
+
+# W trybie dokładnym działania idą przez tablicę – natywne "/" dałoby float,
+# a wyniki typu Fraction(1, 1) trzeba sprowadzać do int
+_NATIVE_BINARY = {
+    "FLOAT": {"+": "+", "-": "-", "*": "*", "/": "/", "^": "**"},
+    "EXACT": {},
+    "DECIMAL": {"+": "+", "-": "-", "*": "*", "/": "/", "^": "**"},
+}
+
+# Ile wywołań interpretujemy, zanim opłaca się kompilacja do kodu Pythona.
+# Jednorazowe wyrażenia (np. tryb wsadowy) nie płacą za compile().
+COMPILE_THRESHOLD = 2
+
 
+class CompiledExpression:
+    def __init__(self, expression: str, rpn: list[str], number_mode: str = "FLOAT"):
+        self.expression = expression
+        self.rpn = tuple(rpn)
+        self.number_mode = _check_number_mode(number_mode)
+        self._tree: ExpressionTree | None = None
+        self.variables = tuple(dict.fromkeys(t for t in self.rpn if _is_variable(t)))
+        self.calls = 0
+        self.source: str | None = None
+        self._func = None
+        # Liczby dokładne (także int z silni we FLOAT) pilnuje cost(); DECIMAL
+        # ma stałą precyzję
+        self.costly = number_mode != "DECIMAL"
+        # Bez tych działań, Ans i zmiennych wynik nie urośnie ponad literały
+        self._grows = bool(self.variables) or not _GROWS.isdisjoint(self.rpn)
+        self._cost: tuple | None = None
 
-        return str(result)
+    @property
+    def tree(self) -> ExpressionTree:
+        # Optymalizujemy dopiero przy kompilacji – wyrażenia liczone raz nie płacą
+        if self._tree is None:
+            self._tree = optimize(self.rpn, self.number_mode)
+        return self._tree
+
+    @property
+    def compiled(self) -> bool:
+        return self._func is not None
+
+    def compile(self) -> "CompiledExpression":
+        if self._func is None:
+            with METRICS.measure("compile"):
+                self.source, self._func = _generate_function(self.tree, self.expression,
+                                                             self.number_mode)
+        return self
+
+    def cost(self, ops: dict, constants: dict, variables: dict | None = None) -> float:
+        """estimate_bits() for this program, remembered for the last value of Ans.
+
+        Programs using variables are estimated on every call.
+        """
+        if not self._grows:
+            return 0.0
+        if variables or self.variables:
+            return estimate_bits(self.rpn, self.number_mode, ops, constants, variables)
+        # Wynik zależy tylko od Ans (1 i 1.0 to co innego: int ** int rośnie)
+        ans = constants.get("Ans")
+        if type(ans) is float and GROWING_OPS.isdisjoint(self.rpn):
+            return 0.0                  # float Ans mnożony dalej zostaje floatem
+        key = (type(ans), ans) if "Ans" in self.rpn else None
+        if self._cost is None or self._cost[0] != key:
+            bits = estimate_bits(self.rpn, self.number_mode, ops, constants)
+            self._cost = (key, bits)
+        return self._cost[1]
+
+    def __call__(self, variables: dict | None = None,
+                 ops: dict | None = None, constants: dict | None = None):
+        func = self._func
+        if ops is None:
+            ops = DEFAULT_OPS[self.number_mode]
+        if func is None:
+            self.calls += 1
+            if self.calls < COMPILE_THRESHOLD:
+                return evaluate_rpn(self.rpn, variables, ops, constants,
+                                    NUMBER_LITERALS[self.number_mode])
+            func = self.compile()._func
+        try:
+            return func(ops,
+                        CONSTANTS if constants is None else constants,
+                        variables or {})
+        except KeyError as e:
+            if e.args and e.args[0] in self.variables:
+                raise ValueError(f"Unknown variable {e.args[0]!r}") from None
+            raise
+
+    def __repr__(self):
+        return f"CompiledExpression({self.expression!r})"
+
+
+def _generate_function(tree: ExpressionTree, expression: str,
+                       number_mode: str = "FLOAT"):
+    # Generujemy kod liniowy (bez zagnieżdżeń), więc głębokość nawiasów
+    # nie jest ograniczona przez parser Pythona. Każdy węzeł DAG-u to jedna
+    # zmienna – wspólne podwyrażenia liczymy raz.
+    header: list[str] = []
+    body: list[str] = []
+    namespace: dict = {}
+    bound: dict[str, str] = {}
+    refs: list[str] = []
+    native = _NATIVE_BINARY[number_mode]
+
+    def bind(name: str, table: str) -> str:
+        key = f"{table}:{name}"
+        if key not in bound:
+            bound[key] = f"{table[1]}{len(bound)}"
+            header.append(f"    {bound[key]} = {table}[{name!r}]")
+        return bound[key]
+
+    for i, (kind, value, args) in enumerate(tree.nodes):
+        if kind is OPERATOR:
+            if value in native:
+                a, b = (refs[j] for j in args)
+                code = f"{a} {native[value]} {b}"
+            elif value in BINARY_OPS:
+                a, b = (refs[j] for j in args)
+                code = f"{bind(value, '_o')}({a}, {b})"
+            else:
+                code = f"{bind(value, '_o')}({refs[args[0]]})"
+            body.append(f"    t{i} = {code}")
+            refs.append(f"t{i}")
+        elif kind is CONSTANT:
+            # Stałe czytamy przy każdym wywołaniu – "Ans" się zmienia
+            refs.append(bind(value, "_c"))
+        elif kind is VARIABLE:
+            refs.append(bind(value, "_v"))
+        elif (type(value) is float and math.isfinite(value)
+              or type(value) is int and value.bit_length() <= 64):
+            # -2.0 ** c0 to -(2.0 ** c0) – ujemne literały w nawiasie
+            text = repr(value)
+            refs.append(f"({text})" if text.startswith("-") else text)
+        else:
+            name = f"_lit{len(namespace)}"
+            namespace[name] = value
+            refs.append(name)
+
+    source = "\n".join(
+        ["def _compiled(_o, _c, _v):", *header, *body, f"    return {refs[-1]}"]
+    )
+    exec(compile(source, f"<calc {expression!r}>", "exec"), namespace)
+    return source, namespace["_compiled"]
+
+
+def compile_rpn(rpn: list[str], expression: str = "",
+                number_mode: str = "FLOAT") -> CompiledExpression:
+    return CompiledExpression(expression, rpn, number_mode).compile()
+
+
+# ────────────────────────────────────────────────
+# CACHE SKOMPILOWANYCH PROGRAMÓW
+# ────────────────────────────────────────────────
+
+def normalize_expression(expr: str) -> str:
+    return " ".join(expr.split())
+
+
+class ProgramCache:
+    """Bounded LRU cache of compiled programs keyed on the normalized expression
+    and the number mode.
+
+    Only the program is cached, never the value, so expressions using ``Ans``
+    or angle-dependent functions are still evaluated against current state.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[tuple[str, str], CompiledExpression] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, expr: str, number_mode: str = "FLOAT") -> CompiledExpression:
+        text = normalize_expression(expr)
+        key = (number_mode, text)
+        with self._lock:
+            program = self._data.get(key)
+            if program is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return program
+            self.misses += 1
+
+        if METRICS.enabled:
+            program = _parse_measured(text, number_mode)
+        else:
+            program = CompiledExpression(text, shunting_yard(text), number_mode)
+
+        with self._lock:
+            if self.maxsize:
+                self._data[key] = program
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        return program
+
+    def resize(self, maxsize: int):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _parse_measured(text: str, number_mode: str) -> CompiledExpression:
+    start = time.perf_counter()
+    tokens = tokenize(text)
+    lexed = time.perf_counter()
+    rpn = tokens_to_rpn(tokens)
+    METRICS.observe("tokenize", lexed - start)
+    METRICS.observe("shunting_yard", time.perf_counter() - lexed)
+    return CompiledExpression(text, rpn, number_mode)
+
+
+PROGRAM_CACHE = ProgramCache()
+
+
+def compile_expression(expr: str, number_mode: str = "FLOAT") -> CompiledExpression:
+    return PROGRAM_CACHE.get(expr, number_mode)
+
+
+def set_cache_size(maxsize: int):
+    PROGRAM_CACHE.resize(maxsize)
+
+
+def cache_info() -> dict:
+    return PROGRAM_CACHE.info()
+
+
+def clear_cache():
+    PROGRAM_CACHE.clear()
+
+
+# ────────────────────────────────────────────────
+# LIMITY KOSZTU
+# ────────────────────────────────────────────────
+# Zanim policzymy wyrażenie, przechodzimy po RPN "na sucho": małe wartości
+# liczymy naprawdę, a wyniki dokładne (int, Fraction) większe niż
+# SHADOW_BITS zastępujemy oszacowaniem rozmiaru i wielkości. Dzięki temu
+# 20!^20! albo (10^6)! odrzucamy od razu, zamiast liczyć je minutami.
 
-    except ZeroDivisionError:
+class CostLimitError(OverflowError):
+    pass
+
+
+# Wyniki dokładne do tej wielkości przebieg szacujący liczy naprawdę
+SHADOW_BITS = 4096
+_POWERS = {"*": 1, "x²": 2, "x³": 3}
+# Tylko te działania potrafią z małych liczb zrobić ogromną – wyrażenia bez
+# nich (i bez dużego Ans) nie potrzebują szacowania
+GROWING_OPS = frozenset({"^", "!", "x²", "x³"})
+# Wyrażenia bez tych tokenów (i bez zmiennych) nie wymagają szacowania
+_GROWS = GROWING_OPS | {"*", "Ans"}
+
+
+class _Big(NamedTuple):
+    # Liczba dokładna, której nie liczymy: górne oszacowanie rozmiaru
+    # (w bitach licznika/mianownika) i log2 wartości bezwzględnej
+    bits: float
+    log2: float
+
+
+def _exact_bits(value) -> float:
+    # type() zamiast isinstance – Fraction to ABC i isinstance jest wolne
+    kind = type(value)
+    if kind is float:
+        return 0
+    if kind is int:
+        return value.bit_length()
+    if kind is _Big:
+        return value.bits
+    if kind is Fraction:
+        return max(value.numerator.bit_length(), value.denominator.bit_length())
+    return 0
+
+
+def _log2(value) -> float:
+    if isinstance(value, _Big):
+        return value.log2
+    if not value:
+        return -math.inf
+    if isinstance(value, Fraction):
+        return math.log2(abs(value.numerator)) - math.log2(value.denominator)
+    return math.log2(abs(value))
+
+
+def _as_float(value) -> float:
+    # Float tej wielkości albo OverflowError – jak przy prawdziwej konwersji
+    if not isinstance(value, _Big):
+        return value
+    if value.log2 > 1024:
+        raise OverflowError("int too large to convert to float")
+    return 2.0 ** value.log2
+
+
+def _shadow_pow(a, b, exact_mode: bool):
+    if not isinstance(a, _Big) and a in (0, 1, -1):
+        return abs(a) if isinstance(b, _Big) else None
+    if not exact_mode and not isinstance(b, _Big) and b < 0:
+        return None                         # int ** -n to float
+    exponent = math.inf if isinstance(b, _Big) else float(abs(b))
+    if isinstance(a, _Big):
+        size = a.bits * exponent
+    else:
+        # Z logarytmu, nie z bit_length – 3^9000 ma 14 265 bitów, a nie 18 000
+        size = math.log2(max(abs(a.numerator), a.denominator)) * exponent + 1
+    log2 = _log2(a) * exponent
+    if exact_mode and size > MAX_EXACT_BITS:
+        return _as_float(_Big(size, log2))      # exact_pow liczy to już na floatach
+    if size <= SHADOW_BITS and not isinstance(a, _Big) and not isinstance(b, _Big):
+        return None
+    return _Big(size, log2)
+
+
+_SHADOW_EXACT = frozenset({int, Fraction, _Big})
+
+
+def _shadow_op(token: str, args: list, ops: dict, exact_mode: bool, big: bool):
+    """One RPN step of the dry run; None means "compute it for real"."""
+    exact = all(type(a) in _SHADOW_EXACT for a in args)
+    if token == "!":
+        x = args[0]
+        if big:
+            return _Big(math.inf, math.inf)
+        if x == int(x) and x > 2:
+            bits = math.lgamma(float(x) + 1) / math.log(2)
+            if bits > SHADOW_BITS:
+                return _Big(bits, bits)
+        return None
+    if exact and token == "^":
+        return _shadow_pow(args[0], args[1], exact_mode)
+    if exact and token in _POWERS:
+        # x² i x³ to mnożenie argumentu przez siebie
+        size = sum(map(_exact_bits, args)) * _POWERS[token]
+        if big or size > SHADOW_BITS:
+            return _Big(size, sum(map(_log2, args)) * _POWERS[token])
+        return None
+    if not big:
+        return None
+    if exact and token in ("+", "-", "neg"):
+        return _Big(sum(map(_exact_bits, args)) + 1, max(map(_log2, args)) + 1)
+    if exact and exact_mode and token in ("/", "1/x", "%", "√", "³√"):
+        # Ułamek rośnie najwyżej jak przy mnożeniu licznika przez mianownik
+        return _Big(sum(map(_exact_bits, args)) + 7, max(abs(_log2(a)) for a in args))
+    if token in ("ln", "log"):
+        return _log2(args[0]) * (math.log(2) if token == "ln" else math.log10(2))
+    # Pozostałe działania zamieniają dużą liczbę na float
+    return ops[token](*map(_as_float, args))
+
+
+def estimate_bits(rpn, number_mode: str = "FLOAT", ops: dict | None = None,
+                  constants: dict | None = None,
+                  variables: dict | None = None) -> float:
+    """Upper bound on the size in bits of the largest int or Fraction that
+    evaluating ``rpn`` would build; floats and Decimals do not count.
+
+    Small values are computed for real, so the bound is tight. When the dry
+    run hits an error (1/0, unknown variable...) it stops there – the real
+    evaluation raises the same error before doing any big work.
+    """
+    if number_mode == "DECIMAL":
+        return 0.0          # stała precyzja; silnię pilnuje _decimal_factorial
+    ops = DEFAULT_OPS[number_mode] if ops is None else ops
+    constants = CONSTANTS if constants is None else constants
+    number = NUMBER_LITERALS[number_mode]
+    exact_mode = number_mode == "EXACT"
+    worst = 0.0
+    stack = []
+    try:
+        for token in rpn:
+            if token in ops:
+                arity = 2 if token in BINARY_OPS else 1
+                if len(stack) < arity:
+                    break
+                args = stack[-arity:]
+                del stack[-arity:]
+                big = _Big in map(type, args)
+                value = None
+                if big or token in GROWING_OPS or token == "*":
+                    value = _shadow_op(token, args, ops, exact_mode, big)
+                if value is None:
+                    value = ops[token](*args)
+            elif token in constants:
+                value = constants[token]
+            elif token.isidentifier():
+                value = variables[token]
+            else:
+                value = number(token)
+            worst = max(worst, _exact_bits(value))
+            stack.append(value)
+    except Exception:
+        pass
+    return worst
+
+
+def display_bits() -> float:
+    """Size in bits of the largest int that str() can still display
+    (``sys.set_int_max_str_digits``); the default Evaluator.max_bits."""
+    digits = getattr(sys, "get_int_max_str_digits", lambda: 0)()
+    return digits / math.log10(2) if digits else MAX_EXACT_BITS
+
+
+def result_text(value) -> str:
+    """str() of a result; an int too long for str() is a CostLimitError."""
+    try:
+        return str(value)
+    except ValueError:
+        raise CostLimitError(_too_large(_exact_bits(value))) from None
+
+
+def _too_large(bits: float) -> str:
+    digits = bits * math.log10(2)
+    if digits < 1e12:
+        return f"Result too large (about {digits:,.0f} digits)"
+    return "Result too large"
+
+
+# ────────────────────────────────────────────────
+# OBLICZENIA WEKTOROWE
+# ────────────────────────────────────────────────
+
+class VectorResult(NamedTuple):
+    values: object
+    errors: object
+
+
+_numpy_cache: list = []
+
+
+def _numpy():
+    # NumPy jest opcjonalny i ładowany dopiero przy pierwszym użyciu
+    if not _numpy_cache:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy_cache.append(numpy)
+    return _numpy_cache[0]
+
+
+def _numpy_ops(np, angle_mode: str) -> dict:
+    def to_rad(x):
+        return np.radians(x) if angle_mode == "DEG" else x
+
+    def from_rad(x):
+        return np.degrees(x) if angle_mode == "DEG" else x
+
+    def factorial(x):
+        x = np.asarray(x, dtype=float)
+        out = np.full(x.shape, np.nan)
+        ok = (x >= 0) & (x == np.floor(x)) & (x <= 170)
+        out[ok] = [float(math.factorial(int(v))) for v in x[ok]]
+        return out
+
+    return {
+        "+": np.add, "-": np.subtract, "*": np.multiply, "/": np.divide, "^": np.power,
+        "x²": np.square, "x³": lambda x: np.power(x, 3),
+        "√": np.sqrt, "³√": lambda x: np.power(x, 1 / 3), "1/x": np.reciprocal,
+        "%": lambda x: np.divide(x, 100), "!": factorial,
+        "sin": lambda x: np.sin(to_rad(x)), "cos": lambda x: np.cos(to_rad(x)),
+        "tan": lambda x: np.tan(to_rad(x)),
+        "asin": lambda x: from_rad(np.arcsin(x)),
+        "acos": lambda x: from_rad(np.arccos(x)),
+        "atan": lambda x: from_rad(np.arctan(x)),
+        "ln": np.log, "log": np.log10, "exp": np.exp,
+        "neg": np.negative,
+    }
+
+
+def _evaluate_numpy(np, program: CompiledExpression, arrays: dict,
+                    angle_mode: str, constants: dict) -> VectorResult:
+    columns = {name: np.asarray(value, dtype=float) for name, value in arrays.items()}
+    shape = np.broadcast_shapes(*(c.shape for c in columns.values())) if columns else ()
+    with np.errstate(all="ignore"):
+        try:
+            values = program(columns, _numpy_ops(np, angle_mode), constants)
+        except (ArithmeticError, ValueError):
+            # Błąd w części stałej wyrażenia dotyczy wszystkich wierszy
+            values = np.nan
+        values = np.broadcast_to(np.asarray(values, dtype=float), shape).copy()
+    errors = ~np.isfinite(values)
+    values[errors] = np.nan
+    return VectorResult(values, errors)
+
+
+def _evaluate_rows(program: CompiledExpression, arrays: dict,
+                   ops: dict, constants: dict) -> VectorResult:
+    lengths = {len(v) for v in arrays.values() if not isinstance(v, (int, float))}
+    if len(lengths) > 1:
+        raise ValueError("All arrays must have the same length")
+    n = lengths.pop() if lengths else 1
+    columns = {
+        name: [value] * n if isinstance(value, (int, float)) else value
+        for name, value in arrays.items()
+    }
+
+    values = array("d", bytes(8 * n))
+    errors = array("b", bytes(n))
+    row: dict = {}
+    for i in range(n):
+        for name, column in columns.items():
+            row[name] = column[i]
+        try:
+            value = float(program(row, ops, constants))
+        except (ArithmeticError, ValueError, TypeError):
+            value = math.nan
+        if not math.isfinite(value):
+            value = math.nan
+            errors[i] = 1
+        values[i] = value
+    return VectorResult(values, errors)
+
+
+# ────────────────────────────────────────────────
+# RÓWNANIA I CAŁKI
+# ────────────────────────────────────────────────
+# Wyrażenie kompilujemy raz do funkcji jednej zmiennej (domyślnie x), a
+# potem wołamy ją setki razy bez parsowania. Obie metody liczą na floatach.
+
+class SolveResult(NamedTuple):
+    value: float            # znalezione miejsce zerowe
+    residual: float         # f(value)
+    evaluations: int
+    bracketed: bool         # czy zero było otoczone zmianą znaku
+
+
+class IntegralResult(NamedTuple):
+    value: float
+    error: float            # oszacowanie błędu bezwzględnego
+    evaluations: int
+    converged: bool
+
+
+class _Exhausted(Exception):
+    pass
+
+
+def compile_function(expr: str, var: str = "x", angle_mode: str = "DEG",
+                     constants: dict | None = None):
+    """``expr`` as a Python callable of ``var`` returning float, parsed and
+    compiled once."""
+    program = compile_expression(expr)
+    unknown = [name for name in program.variables if name != var]
+    if unknown:
+        raise ValueError(f"Unknown variable {unknown[0]!r}")
+    ops = NUMBER_OPS["FLOAT"][_check_angle_mode(angle_mode)]
+    constants = CONSTANTS if constants is None else constants
+    # Ten sam limit kosztu co w Evaluator._run: 10^10^8 nie zależy od x
+    bits = program.cost(ops, constants, {var: 1.0})
+    if bits > display_bits():
+        raise CostLimitError(_too_large(bits))
+    func = program.compile()._func
+    env = {}
+
+    def f(x: float) -> float:
+        env[var] = x
+        return float(func(ops, constants, env))
+
+    return f
+
+
+class _Counted:
+    # Liczy wywołania; błędy dziedziny (ln x dla x < 0...) zamienia na NaN
+    __slots__ = ("func", "calls", "limit", "first")
+
+    def __init__(self, func, limit: int):
+        self.func = func
+        self.calls = 0
+        self.limit = limit
+        self.first = math.nan       # f(x0)
+
+    def __call__(self, x: float) -> float:
+        if self.calls >= self.limit:
+            raise _Exhausted
+        self.calls += 1
+        try:
+            y = self.func(x)
+        except (ArithmeticError, ValueError):
+            y = math.nan
+        if self.calls == 1:
+            self.first = y
+        return y
+
+
+_EPS = 2.0 ** -52
+
+
+def _brent(f, a: float, b: float, fa: float, fb: float,
+           tol: float) -> tuple[float, float]:
+    # Metoda Brenta: przedział [b, c] ze zmianą znaku zawsze się kurczy, a
+    # krok to interpolacja odwrotna kwadratowa, sieczna albo bisekcja
+    c, fc = a, fa
+    d = e = b - a
+    while True:
+        if fb == 0:
+            return b, fb
+        if (fb > 0) == (fc > 0):
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        xtol = 2 * _EPS * abs(b) + tol * max(1.0, abs(b)) / 2
+        m = (c - b) / 2
+        if abs(m) <= xtol:
+            return b, fb
+        if abs(e) >= xtol and abs(fa) > abs(fb):
+            s = fb / fa
+            if a == c:
+                p, q = 2 * m * s, 1 - s                                  # sieczna
+            else:
+                q, r = fa / fc, fb / fc                                  # IQI
+                p = s * (2 * m * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * m * q - abs(xtol * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                e = d = m                                                # bisekcja
+        else:
+            e = d = m
+        a, fa = b, fb
+        b += d if abs(d) > xtol else math.copysign(xtol, m)
+        fb = f(b)
+        if math.isnan(fb):
+            raise ValueError("Function is undefined inside the bracket")
+
+
+def _find_root(f: _Counted, x0: float, tol: float) -> tuple[float, float, bool]:
+    f0 = f(x0)
+    if f0 == 0:
+        return x0, f0, False
+    # 1. Sieczna z x0 (Newton bez pochodnej) – zwykle zbiega w kilku krokach;
+    #    gdy po drodze pojawi się zmiana znaku, dokańcza metoda Brenta
+    h = 1e-4 * max(1.0, abs(x0))
+    # Krok sieczną ograniczamy (limit rośnie, gdy się przydaje), żeby nie
+    # przeskoczyć zera najbliższego x0 – np. dla sin x przy płaskim zboczu
+    limit = max(1.0, abs(x0))
+    a, fa, b, fb = x0, f0, x0 + h, f(x0 + h)
+    for _ in range(100):
+        if math.isnan(fa) or math.isnan(fb) or math.isinf(fb):
+            break
+        if fb == 0:
+            return b, fb, False
+        if (fa > 0) != (fb > 0):
+            return (*_brent(f, a, b, fa, fb, tol), True)
+        if fb == fa:
+            break
+        step = fb * (b - a) / (fb - fa)
+        if abs(step) <= tol * max(1.0, abs(b)):
+            # Zbieżność bez zmiany znaku – pierwiastek podwójny, np. x^2
+            if abs(fb) <= math.sqrt(_EPS) * max(1.0, abs(f0)):
+                return b, fb, False
+            break
+        if abs(step) > limit:
+            step = math.copysign(limit, step)
+            limit *= 2
+        a, fa, b = b, fb, b - step
+        fb = f(b)
+    # 2. Szukamy zmiany znaku coraz dalej od x0, na przemian w obie strony
+    sides = [[x0, f0], [x0, f0]]
+    for k in range(100):
+        side = sides[k % 2]
+        x = x0 + (h if k % 2 == 0 else -h) * 2.0 ** (k // 2)
+        fx = f(x)
+        prev, fprev = side
+        if fx == 0:
+            return x, fx, True
+        if not math.isnan(fx) and not math.isnan(fprev) and (fx > 0) != (fprev > 0):
+            return (*_brent(f, prev, x, fprev, fx, tol), True)
+        side[:] = [x, fx]
+    raise ValueError("No root found near the starting point")
+
+
+def solve(expr: str, x0: float, var: str = "x", tol: float = 1e-12,
+          max_evaluations: int = 1000, angle_mode: str = "DEG",
+          constants: dict | None = None) -> SolveResult:
+    """Root of ``expr`` = 0 near ``x0``: secant steps from x0, and Brent's
+    method (bisection with secant/inverse quadratic steps) once a sign
+    change brackets the root. ``tol`` is relative to max(1, |root|).
+    """
+    f = _Counted(compile_function(expr, var, angle_mode, constants), max_evaluations)
+    x0 = float(x0)
+    try:
+        root, residual, bracketed = _find_root(f, x0, tol)
+    except _Exhausted:
+        raise ValueError(f"No root found in {max_evaluations} evaluations") from None
+    if abs(residual) > 1 and abs(residual) > abs(f.first):
+        # Zmiana znaku na biegunie (1/x przy 0), a nie miejsce zerowe
+        raise ValueError(f"No root: {expr} changes sign at a discontinuity "
+                         f"near {var} = {root:g}")
+    return SolveResult(root, residual, f.calls, bracketed)
+
+
+# Węzły i wagi Gaussa–Kronroda G7-K15 (QUADPACK): xgk[1::2] to węzły Gaussa
+_XGK = (0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+        0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+        0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+        0.207784955007898467600689403773245, 0.0)
+_WGK = (0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+        0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+        0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+        0.204432940075298892414161999234649, 0.209482141084727828012999174891714)
+_WG = (0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+       0.381830050505118944950369775488975, 0.417959183673469387755102040816327)
+
+
+def _kronrod(f, a: float, b: float) -> tuple[float, float]:
+    # Całka na [a, b] regułą K15 i oszacowanie błędu |K15 - G7|
+    center, half = (a + b) / 2, (b - a) / 2
+    fc = f(center)
+    kronrod, gauss = fc * _WGK[7], fc * _WG[3]
+    for j in range(7):
+        dx = half * _XGK[j]
+        pair = f(center - dx) + f(center + dx)
+        kronrod += _WGK[j] * pair
+        if j % 2:
+            gauss += _WG[j // 2] * pair
+    return kronrod * half, abs((kronrod - gauss) * half)
+
+
+def _finite_interval(f, a: float, b: float):
+    # Granice nieskończone: podstawienie x = t / (1 - t²) itp. na przedział
+    # skończony; K15 nie liczy w końcach przedziału, więc nie dzielimy przez 0
+    if math.isinf(a) and math.isinf(b):
+        return (lambda t: f(t / (1 - t * t)) * (1 + t * t)
+                / (1 - t * t) ** 2), -1.0, 1.0
+    if math.isinf(b):
+        return (lambda t: f(a + t / (1 - t)) / (1 - t) ** 2), 0.0, 1.0
+    if math.isinf(a):
+        return (lambda t: f(b - t / (1 - t)) / (1 - t) ** 2), 0.0, 1.0
+    return f, a, b
+
+
+def integrate(expr: str, a: float, b: float, var: str = "x", tol: float = 1e-10,
+              max_evaluations: int = 15 * 2000, angle_mode: str = "DEG",
+              constants: dict | None = None) -> IntegralResult:
+    """Definite integral of ``expr`` over [a, b] (bounds may be infinite)
+    by globally adaptive Gauss–Kronrod G7-K15 quadrature: the subinterval
+    with the largest error estimate is halved until the total estimate is
+    within ``tol`` (absolute, or relative to the result).
+    """
+    a, b = float(a), float(b)
+    if a == b:
+        return IntegralResult(0.0, 0.0, 0, True)
+    if a > b:
+        value, error, evaluations, converged = integrate(
+            expr, b, a, var, tol, max_evaluations, angle_mode, constants)
+        return IntegralResult(-value, error, evaluations, converged)
+    compiled = compile_function(expr, var, angle_mode, constants)
+    calls = 0
+
+    def f(x: float) -> float:
+        nonlocal calls
+        calls += 1
+        y = compiled(x)
+        if not math.isfinite(y):
+            raise ValueError(f"Integrand is not finite at {var} = {x:g}")
+        return y
+
+    g, lo, hi = _finite_interval(f, a, b)
+    value, error = _kronrod(g, lo, hi)
+    heap = [(-error, lo, hi, value)]           # najgorszy przedział na wierzchu
+    while error > max(tol, tol * abs(value)):
+        if calls + 30 > max_evaluations:
+            return IntegralResult(value, error, calls, False)
+        _, x1, x2, part = heapq.heappop(heap)
+        mid = (x1 + x2) / 2
+        if not x1 < mid < x2:
+            # koniec precyzji floatów
+            return IntegralResult(value, error, calls, False)
+        left, left_err = _kronrod(g, x1, mid)
+        right, right_err = _kronrod(g, mid, x2)
+        heapq.heappush(heap, (-left_err, x1, mid, left))
+        heapq.heappush(heap, (-right_err, mid, x2, right))
+        # Sumujemy od nowa zamiast odejmować – błędy zaokrągleń się nie kumulują
+        value = math.fsum(item[3] for item in heap)
+        error = math.fsum(-item[0] for item in heap)
+    return IntegralResult(value, error, calls, True)
+
+
+# ─── Składnia w polu wyrażenia ──────────────────
+# solve(x^2 - 2, 1)   integrate(sin x, 0, π)   ∫(sin x, 0, π)
+COMMAND_ARITY = {"solve": 2, "integrate": 3}
+_COMMAND_START = re.compile(r"\s*(solve|integrate|∫)\s*\(")
+_COMMAND = re.compile(r"\s*(solve|integrate|∫)\s*\((.*)\)\s*$", re.S)
+
+
+def is_command(text: str) -> bool:
+    """True for text starting like a command, complete or not (no preview)."""
+    return _COMMAND_START.match(text) is not None
+
+
+def _split_arguments(text: str) -> list[str]:
+    args, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(text[start:i])
+            start = i + 1
+    args.append(text[start:])
+    return [arg.strip() for arg in args]
+
+
+def _command_bound(arg: str, ops, constants) -> float:
+    # ∞ / -∞ (albo inf) tylko jako cała granica całkowania
+    sign, magnitude = (-1.0, arg[1:].strip()) if arg.startswith("-") else (1.0, arg)
+    if magnitude in ("∞", "inf"):
+        return sign * math.inf
+    return float(compile_expression(arg)(None, ops, constants))
+
+
+def parse_command(text: str) -> tuple[str, list[str]] | None:
+    """``("solve", [expr, x0])`` or ``("integrate", [expr, a, b])`` for
+    command syntax, None for a plain expression."""
+    match = _COMMAND.match(text)
+    if match is None:
+        return None
+    name = "integrate" if match.group(1) == "∫" else match.group(1)
+    args = _split_arguments(match.group(2))
+    if len(args) != COMMAND_ARITY[name] or not all(args):
+        raise ParseError(f"{name} takes {COMMAND_ARITY[name]} arguments",
+                         match.start(2))
+    return name, args
+
+
+# ────────────────────────────────────────────────
+# PODGLĄD NA ŻYWO: PARSER PRZYROSTOWY
+# ────────────────────────────────────────────────
+
+# Ile znaków za końcem leksemu może zmienić jego podział ("e" -> "exp", "2e" -> "2e+5")
+_RESCAN_MARGIN = max(len(name) for name in [*OPS, *CONSTANTS]) + 1
+
+
+class Preview(NamedTuple):
+    value: object = None                 # None – wyrażenie jeszcze niekompletne
+    error: Exception | None = None
+
+
+class _ParseState(NamedTuple):
+    pos: int                # gdzie wznowić skanowanie
+    seen: int               # do którego znaku zaglądał lekser
+    expect_operand: bool
+    after_open: bool
+    parens: tuple | None
+    ops: tuple | None       # stos operatorów (lista jednokierunkowa)
+    values: tuple | None    # stos wartości dla wyemitowanego RPN
+    error: Exception | None
+    n_tokens: int
+
+
+_START = _ParseState(0, 0, True, True, None, None, None, None, 0)
+
+
+class IncrementalParser:
+    """Parses and evaluates an expression as it is being typed.
+
+    After every lexeme it keeps a snapshot of the lexer, shunting-yard and
+    evaluation state; all stacks are immutable linked tuples, so a snapshot
+    costs O(1). On the next edit only the text after the unchanged prefix is
+    scanned, so appending a character costs O(1) amortized, whatever the
+    length of the expression. Missing closing parentheses are implied.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.tokens: list[Token] = []
+        self._states = [_START]
+        self._context = None
+        self._parse_error: ParseError | None = None
+
+    def _common_prefix(self, text: str) -> int:
+        old = self.text
+        if text.startswith(old):
+            return len(old)
+        lo, hi = 0, min(len(old), len(text))
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if old[:mid] == text[:mid]:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def update(self, text: str, ops: dict | None = None, constants: dict | None = None,
+               number=float, max_bits: float | None = None) -> Preview:
+        """Preview of ``text``. With ``max_bits`` a step that would build an
+        int or Fraction larger than that fails with CostLimitError instead of
+        being computed."""
+        ops = OPS if ops is None else ops
+        constants = CONSTANTS if constants is None else constants
+        context = (ops, number, constants, max_bits)
+        if self._context is None or not (
+            ops is self._context[0] and number is self._context[1]
+            and max_bits == self._context[3] and constants == self._context[2]
+        ):
+            # Zmiana trybu albo Ans – wartości pośrednie są nieaktualne
+            self._context = (ops, number, dict(constants), max_bits)
+            del self._states[1:]
+            self.text = ""
+
+        keep = self._common_prefix(text) - _RESCAN_MARGIN
+        states = self._states
+        while len(states) > 1 and states[-1].seen > keep:
+            states.pop()
+        state = states[-1]
+        del self.tokens[state.n_tokens:]
+        self.text = text
+        self._parse_error = None
+
+        try:
+            self._advance(text, state, context[0], context[2], number, max_bits)
+        except ParseError as e:
+            self._parse_error = e
+            return Preview()
+        return self._finish()
+
+    def _advance(self, text: str, state: _ParseState, ops: dict, constants: dict,
+                 number, max_bits: float | None):
+        tokens, states = self.tokens, self._states
+        op_stack, values, error = state.ops, state.values, state.error
+        emitted: list[str] = []
+        emit = emitted.append
+
+        for lexeme, pos, seen, expect_operand, after_open, parens in _scan(
+            text, state.pos, state.expect_operand, state.after_open, state.parens
+        ):
+            for kind, token, _ in lexeme:
+                op_stack = _shunt(kind, token, op_stack, emit)
+            tokens += lexeme
+            if emitted and error is None:
+                try:
+                    for token in emitted:
+                        values = _eval_step(token, values, ops, constants, number,
+                                            max_bits)
+                except Exception as e:
+                    error = e
+            emitted.clear()
+            states.append(_ParseState(pos, seen, expect_operand, after_open, parens,
+                                      op_stack, values, error, len(tokens)))
+
+    def _finish(self) -> Preview:
+        state = self._states[-1]
+        if state.error is not None:
+            return Preview(error=state.error)
+        if state.expect_operand:
+            return Preview()
+        ops, number, constants, max_bits = self._context
+        op_stack, values = state.ops, state.values
+        try:
+            while op_stack:
+                if op_stack[0] != "(":
+                    values = _eval_step(op_stack[0], values, ops, constants, number,
+                                        max_bits)
+                op_stack = op_stack[1]
+        except Exception as e:
+            return Preview(error=e)
+        if values is None or values[1] is not None:
+            return Preview(error=ValueError("Malformed expression"))
+        return Preview(values[0])
+
+    @property
+    def depth(self) -> int:
+        parens, depth = self._states[-1].parens, 0
+        while parens:
+            depth += 1
+            parens = parens[1]
+        return depth
+
+
+def _eval_step(token: str, values: tuple | None, ops: dict, constants: dict, number,
+               max_bits: float | None = None) -> tuple:
+    # evaluate_rpn dla jednego tokenu na niemutowalnym stosie wartości
+    if token in ops:
+        if token in BINARY_OPS:
+            b, (a, rest) = values[0], values[1]
+            args = (a, b)
+        else:
+            args, rest = (values[0],), values[1]
+        if max_bits is not None and (token in GROWING_OPS or token == "*"):
+            _check_step(token, args, ops, number is exact_number, max_bits)
+        return ops[token](*args), rest
+    if token in constants:
+        return constants[token], values
+    if token.isidentifier():
+        raise ValueError(f"Unknown variable {token!r}")
+    return number(token), values
+
+
+def _check_step(token: str, args: tuple, ops: dict, exact_mode: bool, max_bits: float):
+    # Szacowanie jednego kroku jak w estimate_bits – tu wartości są już policzone
+    try:
+        estimate = _shadow_op(token, list(args), ops, exact_mode, False)
+    except Exception:
+        return                              # błąd zgłosi prawdziwe działanie
+    if type(estimate) is _Big and estimate.bits > max_bits:
+        raise CostLimitError(_too_large(estimate.bits))
+
+
+# ────────────────────────────────────────────────
+# FORMATOWANIE WYNIKU
+# ────────────────────────────────────────────────
+
+def format_number(value, precision_mode: str = "FLOAT", fixed_decimals: int = 4,
+                  decimal_digits: int = DECIMAL_DIGITS) -> str:
+    """Display text for a result: ``FLOAT`` (%g), ``FIXED`` or ``DEC``."""
+    if type(value) is Quantity:
+        number = format_number(value.value, precision_mode, fixed_decimals,
+                               decimal_digits)
+        return f"{number} {value.unit.name}"
+    if precision_mode == "DEC":
+        return _format_decimal(value, decimal_digits)
+    try:
+        v = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    except OverflowError:
+        # int albo Fraction poza zakresem float (np. 171! w trybie FLOAT)
+        return _format_large(value)
+
+    if precision_mode == "FIXED":
+        s = f"{v:.{fixed_decimals}f}"
+        return s.rstrip("0").rstrip(".") if "." in s else s
+
+    if v == 0:
+        return "0"
+
+    if abs(v) >= 1e12 or (0 < abs(v) < 1e-8):
+        return f"{v:.8e}"
+
+    return f"{v:g}"
+
+
+# Do tej wielkości liczby dokładne formatujemy przez Decimal (dokładne
+# zaokrąglenie); konwersja jest kwadratowa, więc większe idą przez logarytm
+_DECIMAL_FORMAT_BITS = 1 << 16
+
+
+def _format_large(value) -> str:
+    """``%.8e`` for an int or Fraction too large for a float, without str()
+    (which has a digit limit)."""
+    if _exact_bits(value) <= _DECIMAL_FORMAT_BITS:
+        with localcontext() as ctx:
+            ctx.prec = 20
+            ctx.Emax = MAX_EMAX
+            if type(value) is Fraction:
+                return format(Decimal(value.numerator) / value.denominator, ".8e")
+            return format(Decimal(value), ".8e")
+    log10 = _log2(value) * math.log10(2)
+    exponent = math.floor(log10)
+    # log10 ma ~16 cyfr znaczących; ile zostaje na mantysę, tyle pokazujemy
+    digits = max(1, min(8, 15 - len(str(exponent))))
+    mantissa = f"{10 ** (log10 - exponent):.{digits}f}"
+    if mantissa.startswith("10"):
+        mantissa, exponent = f"{1:.{digits}f}", exponent + 1
+    return f"{'-' if value < 0 else ''}{mantissa}e+{exponent}"
+
+
+def _format_decimal(value, digits: int) -> str:
+    if _exact_bits(value) > _DECIMAL_FORMAT_BITS:
+        return _format_large(value)
+    try:
+        d = Decimal(value)
+    except (TypeError, ValueError, ArithmeticError):
+        return str(value)
+    if d.is_zero():
+        return "0"
+    if not d.is_finite():
+        return str(d)
+    d = d.normalize()
+    if -8 <= d.adjusted() < digits:
+        return format(d, "f")
+    return str(d)
+
+
+# ────────────────────────────────────────────────
+# EVALUATOR
+# ────────────────────────────────────────────────
+
+def describe_error(exc: Exception) -> str:
+    if isinstance(exc, ZeroDivisionError):
         return "Division by zero"
-    except ValueError as e:
-        return f"Error: {str(e)}"
-    except Exception():
-        return "Error"
\ No newline at end of file
+    if isinstance(exc, (ValueError, CostLimitError, TimeoutError)):
+        return f"Error: {str(exc)}"
+    if isinstance(exc, (OverflowError, DecimalOverflow)):
+        return "Error: Result too large"
+    if isinstance(exc, MemoryError):
+        return "Error: Out of memory"
+    return "Error"
+
+
+def error_kind(exc: Exception) -> str:
+    """Category used for error counters: syntax, division_by_zero, domain,
+    overflow..."""
+    if isinstance(exc, ZeroDivisionError):
+        return "division_by_zero"
+    if isinstance(exc, ParseError):
+        return "syntax"
+    if isinstance(exc, CostLimitError):
+        return "cost_limit"
+    if isinstance(exc, (OverflowError, DecimalOverflow)):
+        return "overflow"
+    if isinstance(exc, TimeoutError):
+        return "timeout"
+    if isinstance(exc, MemoryError):
+        return "memory"
+    if isinstance(exc, ValueError):
+        message = str(exc)
+        if message.startswith(("Malformed", "Unknown variable")):
+            return "syntax"
+        return "domain"
+    if isinstance(exc, ArithmeticError):
+        # decimal.InvalidOperation, np. 0/0 albo √-1 w trybie DECIMAL
+        return "domain"
+    return type(exc).__name__
+
+
+class Evaluator:
+    """Calculator state (angle and number mode, Ans, memory, constants) for one user.
+
+    In the EXACT number mode integers and fractions stay exact
+    (``1/3 * 3 == 1``, ``50!`` as an int); only transcendental functions
+    fall back to float. The DECIMAL mode evaluates everything with
+    ``decimal.Decimal`` at ``decimal_digits`` significant digits.
+
+    Before evaluating, expressions that would build an int or Fraction
+    larger than ``max_bits`` are rejected with CostLimitError (see
+    estimate_bits); by default that is the largest int str() can display
+    (display_bits). Wall-clock and memory limits live in calculator.guard.
+
+    Every evaluation picks the OPS table for the current modes once and
+    only writes back ``Ans``, so one instance can be shared between threads
+    and separate instances never see each other's state.
+    """
+
+    def __init__(self, angle_mode: str = "DEG", constants: dict | None = None,
+                 number_mode: str = "FLOAT", decimal_digits: int = DECIMAL_DIGITS,
+                 max_bits: float | None = None):
+        self.angle_mode = _check_angle_mode(angle_mode)
+        self.number_mode = _check_number_mode(number_mode)
+        self.decimal_digits = _check_decimal_digits(decimal_digits)
+        self.max_bits = max_bits
+        # Własna tablica stałych z Ans = 0 – nie kopia stanu domyślnej instancji
+        self.constants = {**CONSTANTS, "Ans": 0.0} if constants is None else constants
+        self.memory = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ans(self):
+        return self.constants["Ans"]
+
+    @ans.setter
+    def ans(self, value):
+        self.constants["Ans"] = value
+
+    @property
+    def ops(self) -> dict:
+        return NUMBER_OPS[self.number_mode][self.angle_mode]
+
+    def set_angle_mode(self, mode: str):
+        self.angle_mode = _check_angle_mode(mode)
+
+    def set_number_mode(self, mode: str):
+        self.number_mode = _check_number_mode(mode)
+
+    def set_decimal_digits(self, digits: int):
+        self.decimal_digits = _check_decimal_digits(digits)
+
+    def compute(self, expression: str, variables: dict | None = None):
+        if "," in expression or is_command(expression):
+            # Przecinek występuje tylko w solve(...) / integrate(...)
+            return self.compute_command(expression).value
+        if METRICS.enabled:
+            return self._compute_measured(expression, variables)
+        program = compile_expression(expression, self.number_mode)
+        if program.variables and variables is None:
+            # Nazwy bez wartości to jednostki: "5 km + 300 m in mi"
+            return self.compute_units(expression)
+        result = self._run(program, variables)
+        self.constants["Ans"] = result
+        return result
+
+    def _run(self, program: CompiledExpression, variables: dict | None):
+        ops = NUMBER_OPS[program.number_mode][self.angle_mode]
+        if program.number_mode == "DECIMAL":
+            with localcontext() as ctx:
+                ctx.prec = self.decimal_digits
+                if variables:
+                    variables = {k: decimal_math.to_decimal(v)
+                                 for k, v in variables.items()}
+                return program(variables, ops, _decimal_constants(self.constants))
+        if program.costly:
+            bits = program.cost(ops, self.constants, variables)
+            if bits > (display_bits() if self.max_bits is None else self.max_bits):
+                raise CostLimitError(_too_large(bits))
+        return program(variables, ops, self.constants)
+
+    def _compute_measured(self, expression: str, variables: dict | None):
+        start = time.perf_counter()
+        error = None
+        try:
+            program = compile_expression(expression, self.number_mode)
+            found = time.perf_counter()
+            METRICS.observe("lookup", found - start)
+            if program.variables and variables is None:
+                return self.compute_units(expression)
+            result = self._run(program, variables)
+            METRICS.observe("evaluate", time.perf_counter() - found)
+        except Exception as e:
+            error = error_kind(e)
+            METRICS.error(error)
+            raise
+        finally:
+            METRICS.finished(expression, time.perf_counter() - start, error)
+        self.constants["Ans"] = result
+        return result
+
+    def compute_units(self, expression: str):
+        """``expression`` with unit names (``5 km + 300 m in mi``, ``60 km/h to m/s``)
+        as a Quantity, always in floats; Ans becomes its plain value."""
+        result = self._unit_value(expression)
+        self.constants["Ans"] = result.value if type(result) is Quantity else result
+        return result
+
+    def _unit_value(self, expression: str):
+        source, target = split_conversion(expression)
+        result = self._unit_expression(source)
+        if target is None:
+            return result
+        unit = self._unit_expression(target)
+        if type(unit) is not Quantity or unit.value != 1:
+            raise ValueError(f"Expected a unit after 'in', got {target!r}")
+        if type(result) is not Quantity:
+            raise ValueError(f"Cannot convert a plain number to {unit.unit.name}")
+        return result.to(unit.unit)
+
+    def _unit_expression(self, text: str):
+        program = compile_expression(text, "FLOAT")
+        variables = {}
+        for name in program.variables:
+            unit = UNITS.get(name)
+            if unit is None:
+                raise ValueError(f"Unknown variable {name!r}")
+            variables[name] = Quantity(1.0, unit)
+        constants = self.constants
+        # Ans zamieniamy na float tylko, gdy wyrażenie go używa – 1000! w Ans
+        # nie psuje "5 km + 300 m in mi"
+        if "Ans" in program.rpn and type(constants["Ans"]) is not float:
+            try:
+                constants = {**constants, "Ans": float(constants["Ans"])}
+            except OverflowError:
+                raise ValueError("Ans is too large for a unit expression") from None
+        try:
+            return program(variables, NUMBER_OPS["FLOAT"][self.angle_mode], constants)
+        except TypeError:
+            # sin(5 m), √(2 kg) – funkcje liczą tylko na zwykłych liczbach
+            raise ValueError("Functions take plain numbers, not units") from None
+
+    def preview(self, parser: IncrementalParser, expression: str) -> Preview:
+        """Value of ``expression`` as typed so far; does not touch Ans."""
+        number_mode = self.number_mode
+        ops = NUMBER_OPS[number_mode][self.angle_mode]
+        if number_mode == "DECIMAL":
+            with localcontext() as ctx:
+                ctx.prec = self.decimal_digits
+                constants = _decimal_constants(self.constants)
+                preview = parser.update(expression, ops, constants, Decimal)
+        else:
+            preview = parser.update(expression, ops, self.constants,
+                                    NUMBER_LITERALS[number_mode], PREVIEW_MAX_BITS)
+        error = preview.error
+        if isinstance(error, ValueError) and str(error).startswith("Unknown variable"):
+            try:
+                return Preview(self._unit_value(expression))
+            except ParseError:
+                return Preview()                # "5 km +" – jeszcze niekompletne
+            except Exception as e:
+                return Preview(error=e)
+        return preview
+
+    def evaluate(self, expression: str) -> str:
+        if not expression.strip():
+            return ""
+
+        ans = self.constants["Ans"]
+        try:
+            return result_text(self.compute(expression))
+        except Exception as e:
+            # Ans zmienia się tylko razem z pokazanym wynikiem
+            self.constants["Ans"] = ans
+            return describe_error(e)
+
+    def solve(self, expr: str, x0: float, **options) -> SolveResult:
+        return solve(expr, x0, angle_mode=self.angle_mode, constants=self.constants,
+                     **options)
+
+    def integrate(self, expr: str, a: float, b: float, **options) -> IntegralResult:
+        return integrate(expr, a, b, angle_mode=self.angle_mode,
+                         constants=self.constants, **options)
+
+    def compute_command(self, text: str) -> SolveResult | IntegralResult:
+        """Run ``solve(expr, x0)`` or ``integrate(expr, a, b)`` typed as an
+        expression (always in floats); Ans becomes the root or the integral."""
+        command = parse_command(text)
+        if command is None:
+            raise ParseError("Expected solve(expr, x0) or integrate(expr, a, b)", 0)
+        name, (expr, *bounds) = command
+        ops = NUMBER_OPS["FLOAT"][self.angle_mode]
+        numbers = [_command_bound(arg, ops, self.constants) for arg in bounds]
+        if name == "solve":
+            result = self.solve(expr, *numbers)
+        else:
+            result = self.integrate(expr, *numbers)
+            if not result.converged:
+                raise ValueError("Integral did not converge "
+                                 f"(error about {result.error:.3g})")
+        self.constants["Ans"] = result.value
+        return result
+
+    def evaluate_vectorized(self, expr: str, **arrays) -> VectorResult:
+        program = compile_expression(expr)
+        missing = [name for name in program.variables if name not in arrays]
+        if missing:
+            raise ValueError(f"Missing values for variables: {', '.join(missing)}")
+
+        np = _numpy()
+        if np is not None:
+            return _evaluate_numpy(np, program, arrays, self.angle_mode, self.constants)
+        return _evaluate_rows(program, arrays, self.ops, self.constants)
+
+    # Pamięć M+ / M- / MR
+    def memory_add(self, value: float):
+        with self._lock:
+            self.memory += value
+
+    def memory_subtract(self, value: float):
+        with self._lock:
+            self.memory -= value
+
+    def memory_recall(self) -> float:
+        return self.memory
+
+    def memory_clear(self):
+        with self._lock:
+            self.memory = 0.0
+
+
+# Domyślna instancja – funkcje modułu to cienkie opakowania na nią
+DEFAULT_EVALUATOR = Evaluator(constants=CONSTANTS)
+
+
+def evaluate_expression(expression: str) -> str:
+    return DEFAULT_EVALUATOR.evaluate(expression)
+
+
+def evaluate_vectorized(expr: str, **arrays) -> VectorResult:
+    return DEFAULT_EVALUATOR.evaluate_vectorized(expr, **arrays)
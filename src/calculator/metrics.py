@@ -0,0 +1,254 @@
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+from typing import NamedTuple
+
+# ────────────────────────────────────────────────
+# Pomiary etapów obliczeń – domyślnie wyłączone
+# ────────────────────────────────────────────────
+# Mierzony kod sprawdza tylko METRICS.enabled. Gdy pomiary są wyłączone,
+# nie woła perf_counter() ani niczego z tego modułu.
+
+# Kubełek i zbiera czasy < 2^i µs (kubełek 0: poniżej 1 µs); ostatni – resztę
+N_BUCKETS = 32
+
+
+class Histogram:
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = [0] * N_BUCKETS
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        # frexp(x)[1] = e, gdzie x < 2^e
+        i = math.frexp(seconds * 1e6)[1] if seconds > 0 else 0
+        self.buckets[min(max(i, 0), N_BUCKETS - 1)] += 1
+
+    def merge(self, other: "Histogram"):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets, strict=True)]
+
+    def percentile(self, q: float) -> float:
+        """Upper bound (seconds) of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(2.0 ** i / 1e6, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_s": self.total / self.count if self.count else 0.0,
+            "min_s": self.min if self.count else 0.0,
+            "max_s": self.max,
+            "p50_s": self.percentile(0.5),
+            "p90_s": self.percentile(0.9),
+            "p99_s": self.percentile(0.99),
+            "buckets_us": {f"<{2 ** i}": n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class SlowCall(NamedTuple):
+    expression: str
+    seconds: float
+    error: str | None
+    when: float
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+_NO_TIMER = nullcontext()
+
+
+class Metrics:
+    """Per-stage latency histograms, error counts and a log of slow expressions.
+
+    Stages recorded by the calculator: ``tokenize`` and ``shunting_yard``
+    (only on a program cache miss), ``compile``, ``lookup`` (cache lookup
+    including parsing), ``evaluate``, ``total``, and in the window ``guard``
+    (the round trip to the worker process), ``format``, ``history`` and
+    ``history.write`` (the background disk write). The worker process records
+    its own stages; drain() and merge() carry them over to the window.
+    """
+
+    def __init__(self, slow_threshold: float = 0.05, slow_log_size: int = 100):
+        self.enabled = False
+        self.slow_threshold = slow_threshold
+        self.stages: dict[str, Histogram] = {}
+        self.errors: Counter = Counter()
+        self.slow: deque[SlowCall] = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.add(seconds)
+
+    def measure(self, stage: str):
+        """Context manager timing one stage; a no-op while disabled."""
+        return _Timer(self, stage) if self.enabled else _NO_TIMER
+
+    def error(self, kind: str):
+        with self._lock:
+            self.errors[kind] += 1
+
+    def finished(self, expression: str, seconds: float, error: str | None = None):
+        self.observe("total", seconds)
+        if seconds >= self.slow_threshold:
+            with self._lock:
+                self.slow.append(SlowCall(expression, seconds, error, time.time()))
+
+    def drain(self) -> tuple:
+        """Take everything recorded so far (stages, errors, slow calls) and
+        start afresh; the result is picklable and goes to merge()."""
+        with self._lock:
+            state = (self.stages, self.errors, list(self.slow))
+            self.stages, self.errors = {}, Counter()
+            self.slow.clear()
+        return state
+
+    def merge(self, state: tuple):
+        stages, errors, slow = state
+        with self._lock:
+            for name, other in stages.items():
+                hist = self.stages.get(name)
+                if hist is None:
+                    hist = self.stages[name] = Histogram()
+                hist.merge(other)
+            self.errors.update(errors)
+            self.slow.extend(slow)
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.errors.clear()
+            self.slow.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "slow_threshold_s": self.slow_threshold,
+                "stages": {name: h.to_dict() for name, h in self.stages.items()},
+                "errors": dict(self.errors),
+                "slow": [call._asdict() for call in self.slow],
+            }
+
+
+METRICS = Metrics()
+
+
+def enable(slow_threshold: float | None = None):
+    if slow_threshold is not None:
+        METRICS.slow_threshold = slow_threshold
+    METRICS.enabled = True
+
+
+def disable():
+    METRICS.enabled = False
+
+
+def reset():
+    METRICS.reset()
+
+
+def snapshot() -> dict:
+    return METRICS.snapshot()
+
+
+def dump(path):
+    import json
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2, ensure_ascii=False)
+
+
+# ─── Raport tekstowy ────────────────────────────
+def _us(seconds: float) -> str:
+    return f"{seconds * 1e6:,.1f}"
+
+
+def format_report(data: dict) -> str:
+    lines = [f"{'stage':<16} {'calls':>9} {'mean µs':>11} {'p50 µs':>11} "
+             f"{'p90 µs':>11} {'p99 µs':>11} {'max µs':>11} {'total ms':>10}"]
+    for name, s in sorted(data["stages"].items(), key=lambda kv: -kv[1]["total_s"]):
+        lines.append(f"{name:<16} {s['count']:>9} {_us(s['mean_s']):>11} "
+                     f"{_us(s['p50_s']):>11} {_us(s['p90_s']):>11} "
+                     f"{_us(s['p99_s']):>11} {_us(s['max_s']):>11} "
+                     f"{s['total_s'] * 1e3:>10.2f}")
+    if data["errors"]:
+        lines.append("")
+        lines.append("errors: " + ", ".join(f"{kind}={n}" for kind, n in
+                                            sorted(data["errors"].items())))
+    if data["slow"]:
+        lines.append("")
+        lines.append(f"slow expressions (>= {data['slow_threshold_s'] * 1e3:g} ms):")
+        for call in data["slow"]:
+            note = f"  [{call['error']}]" if call["error"] else ""
+            seconds = call["seconds"]
+            lines.append(f"  {seconds * 1e3:>9.2f} ms  {call['expression']}{note}")
+    return "\n".join(lines)
+
+
+def report() -> str:
+    return format_report(snapshot())
+
+
+# ─── Polecenie "metrics" ────────────────────────
+def main_metrics(args) -> int:
+    import json
+
+    with open(args.dump, encoding="utf-8") as f:
+        data = json.load(f)
+    if args.json:
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+    else:
+        print(format_report(data))
+    return 0
+
+
+def add_metrics_parser(subparsers):
+    parser = subparsers.add_parser(
+        "metrics",
+        help="show a metrics dump (batch --metrics-json or CALCULATOR_METRICS=PATH)",
+    )
+    parser.add_argument("dump", help="JSON file written by metrics.dump()")
+    parser.add_argument("--json", action="store_true", help="print the raw JSON")
+    parser.set_defaults(func=main_metrics)
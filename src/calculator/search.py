@@ -0,0 +1,198 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Iterable, Iterator
+from heapq import merge
+
+from .history import HistoryRecord, HistoryStore
+
+# ────────────────────────────────────────────────
+# Wyszukiwanie w historii
+# ────────────────────────────────────────────────
+
+# Liczby, słowa i symbole matematyczne; nawiasy i operatory arytmetyczne
+# występują niemal w każdym wpisie, więc ich nie indeksujemy
+_TERM = re.compile(r"\d+(?:\.\d+)?(?:e[+-]?\d+)?|[^\W\d]+|[^\w\s()+\-*/^.,=]")
+_FILTER = re.compile(r"\b(from|to):(\S+)")
+
+
+def terms(text: str) -> list[str]:
+    return _TERM.findall(text.lower())
+
+
+class HistoryIndex:
+    """Incremental search index over history records.
+
+    Every record gets an id (its position). Each term from the expression and
+    the result is indexed under all of its prefixes up to ``PREFIX_LEN``
+    characters, so short prefix queries are a single posting-list lookup.
+    Longer prefixes are resolved through a sorted list of the longer terms,
+    kept sorted as records are added so queries never sort.
+    A sorted (timestamp, id) list answers date ranges. Results come back
+    newest first.
+    """
+
+    PREFIX_LEN = 4
+    # Od tylu nowych długich terminów add_many scala listy zamiast wstawiać po jednym
+    MERGE_AFTER = 1024
+
+    def __init__(self):
+        self.records: list[HistoryRecord] = []
+        self._terms: list[frozenset[str]] = []
+        self._postings: dict[str, array] = {}
+        self._long_terms: list[str] = []
+        self._new_long_terms: list[str] = []
+        self._by_time: list[tuple[str, int]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, record: HistoryRecord) -> int:
+        with self._lock:
+            return self._add(record)
+
+    def add_many(self, records: Iterable[HistoryRecord]):
+        with self._lock:
+            for record in records:
+                self._add(record, keep_sorted=False)
+            self._by_time.sort()
+            self._merge_long_terms()
+
+    def _add(self, record: HistoryRecord, keep_sorted: bool = True) -> int:
+        doc = len(self.records)
+        self.records.append(record)
+        words = frozenset(terms(record.expression) + terms(record.result))
+        self._terms.append(words)
+
+        n = self.PREFIX_LEN
+        # word[:i] dla i > len(word) to całe słowo – zbiór usuwa powtórzenia
+        keys = {word[:i] for word in words for i in range(1, n + 1)}
+        keys.update(word for word in words if len(word) > n)
+        postings = self._postings
+        for key in keys:
+            docs = postings.get(key)
+            if docs is None:
+                postings[key] = array("I", (doc,))
+                if len(key) > n:
+                    if keep_sorted:
+                        insort(self._long_terms, key)
+                    else:
+                        self._new_long_terms.append(key)
+            else:
+                docs.append(doc)
+
+        entry = (record.timestamp, doc)
+        if not keep_sorted or not self._by_time or entry >= self._by_time[-1]:
+            self._by_time.append(entry)
+        else:
+            insort(self._by_time, entry)
+        return doc
+
+    def clear(self):
+        with self._lock:
+            self.__init__()
+
+    def _merge_long_terms(self):
+        # Przy budowie indeksu (w tle) – zapytania dostają już posortowaną listę
+        new = self._new_long_terms
+        if len(new) > self.MERGE_AFTER:
+            self._long_terms = list(merge(self._long_terms, sorted(new)))
+        else:
+            for term in new:
+                insort(self._long_terms, term)
+        new.clear()
+
+    # ─── Zapytania ───────────────────────────────────
+    def _long_prefix_terms(self, prefix: str) -> list[str]:
+        lo = bisect_left(self._long_terms, prefix)
+        hi = bisect_left(self._long_terms, prefix + "\U0010ffff", lo)
+        return self._long_terms[lo:hi]
+
+    def _candidates(self, prefix: str) -> tuple[int, Iterator[int]]:
+        # Identyfikatory pasujące do prefiksu, malejąco, bez duplikatów
+        if len(prefix) <= self.PREFIX_LEN:
+            docs = self._postings.get(prefix, ())
+            return len(docs), reversed(docs)
+
+        lists = [self._postings[t] for t in self._long_prefix_terms(prefix)]
+        size = sum(map(len, lists))
+        if len(lists) <= 1:
+            return size, reversed(lists[0] if lists else ())
+
+        def unique():
+            last = None
+            for doc in merge(*(reversed(p) for p in lists), reverse=True):
+                if doc != last:
+                    yield doc
+                    last = doc
+        return size, unique()
+
+    def search(self, query: str, start: str | None = None, end: str | None = None,
+               limit: int = 100) -> list[tuple[int, HistoryRecord]]:
+        """Records matching every term (as a prefix) of ``query``, newest first.
+
+        ``start``/``end`` (or ``from:``/``to:`` inside the query) bound the
+        timestamp; a date like ``2026-01-31`` includes that whole day.
+        """
+        for name, value in _FILTER.findall(query):
+            if name == "from":
+                start = value
+            else:
+                end = value
+        words = terms(_FILTER.sub(" ", query))
+
+        with self._lock:
+            if not words:
+                docs = self._time_range(start, end)
+            else:
+                # Najbardziej selektywny termin wyznacza kandydatów, resztę sprawdzamy
+                ranked = sorted((self._candidates(w) + (w,) for w in set(words)),
+                                key=lambda c: c[0])
+                _, docs, _ = ranked[0]
+                checks = [self._matcher(w) for _, _, w in ranked[1:]]
+                docs = (d for d in docs if all(check(d) for check in checks))
+                if start is not None or end is not None:
+                    records = self.records
+                    docs = (d for d in docs
+                            if self._in_range(records[d].timestamp, start, end))
+
+            results = []
+            for doc in docs:
+                results.append((doc, self.records[doc]))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def _matcher(self, prefix: str):
+        if len(prefix) <= self.PREFIX_LEN:
+            # Listy postingów są rosnące – przynależność sprawdzamy bisekcją
+            docs = self._postings.get(prefix, ())
+
+            def contains(doc: int) -> bool:
+                i = bisect_left(docs, doc)
+                return i < len(docs) and docs[i] == doc
+            return contains
+        return lambda doc: any(word.startswith(prefix) for word in self._terms[doc])
+
+    @staticmethod
+    def _in_range(timestamp: str, start: str | None, end: str | None) -> bool:
+        if start is not None and timestamp < start:
+            return False
+        return end is None or timestamp[:len(end)] <= end
+
+    def _time_range(self, start: str | None, end: str | None) -> Iterator[int]:
+        lo = 0 if start is None else bisect_left(self._by_time, (start, -1))
+        if end is None:
+            hi = len(self._by_time)
+        else:
+            hi = bisect_right(self._by_time, (end + "\U0010ffff",))
+        for i in range(hi - 1, lo - 1, -1):
+            yield self._by_time[i][1]
+
+
+def build_index(store: HistoryStore, end: int | None = None) -> HistoryIndex:
+    index = HistoryIndex()
+    index.add_many(store.read_all(end))
+    return index
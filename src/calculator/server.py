@@ -0,0 +1,353 @@
+import asyncio
+import json
+import time
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import NamedTuple
+
+from .logic import Evaluator, cache_info, describe_error, error_kind
+from .metrics import Histogram
+
+# ────────────────────────────────────────────────
+# Serwer obliczeń: JSON lines przez TCP (localhost) albo gniazdo Unix
+# ────────────────────────────────────────────────
+# Jedna linia = jedno żądanie, jedna linia = jedna odpowiedź (z tym samym "id").
+#
+#   {"id": 1, "expr": "2 * Ans"}                  -> {"id": 1, "result": "4"}
+#   {"id": 2, "op": "set", "angle": "RAD"}        -> {"id": 2, "ok": true}
+#   {"id": 3, "op": "stats"}                      -> {"id": 3, "stats": {...}}
+#
+# Każde połączenie ma własną sesję (tryb kątów, tryb liczb, Ans); pole
+# "session" wybiera sesję nazwaną, współdzieloną między połączeniami.
+#
+# Obliczenia i zmiany ustawień sesji ze wszystkich połączeń trafiają do
+# jednej kolejki. Wątek obliczeniowy bierze je paczkami – pod obciążeniem
+# jedno przełączenie wątku obsługuje wiele żądań – i wykonuje w kolejności
+# nadejścia, więc Ans i tryby w sesji zależą tylko od kolejności żądań.
+
+DEFAULT_PORT = 8765
+MAX_LINE = 64 * 1024
+# Ile żądań jednego połączenia może czekać na odpowiedź, zanim przestaniemy czytać
+MAX_IN_FLIGHT = 1024
+
+
+class Session:
+    __slots__ = ("evaluator", "name")
+
+    def __init__(self, name: str | None = None):
+        self.name = name
+        self.evaluator = Evaluator()
+
+    def configure(self, request: dict):
+        ev = self.evaluator
+        if "angle" in request:
+            ev.set_angle_mode(request["angle"])
+        if "number_mode" in request:
+            ev.set_number_mode(request["number_mode"])
+        if "decimal_digits" in request:
+            ev.set_decimal_digits(request["decimal_digits"])
+        if "ans" in request:
+            ev.ans = float(request["ans"])
+
+    def state(self) -> dict:
+        ev = self.evaluator
+        return {"angle": ev.angle_mode, "number_mode": ev.number_mode,
+                "decimal_digits": ev.decimal_digits, "ans": str(ev.ans)}
+
+
+def _compute(session: Session, expression: str) -> dict:
+    try:
+        return {"result": str(session.evaluator.compute(expression))}
+    except Exception as e:
+        return {"error": describe_error(e), "kind": error_kind(e)}
+
+
+def _compute_guarded(guard, session: Session, expression: str) -> dict:
+    try:
+        return {"result": str(guard.compute(expression, session.evaluator))}
+    except Exception as e:
+        return {"error": describe_error(e), "kind": error_kind(e)}
+
+
+def _configure(session: Session, request: dict) -> dict:
+    try:
+        session.configure(request)
+    except (TypeError, ValueError) as e:
+        return {"error": str(e), "kind": "protocol"}
+    return {"ok": True, "session": session.state()}
+
+
+class _Job(NamedTuple):
+    call: Callable[[], dict]
+    deadline: float
+    future: asyncio.Future
+
+
+def _run_batch(jobs: list[_Job]) -> list[dict | None]:
+    # Wątek obliczeniowy. Zadania, którym minął termin, pomijamy – klient
+    # dostał już odpowiedź "Timeout".
+    return [job.call() if time.monotonic() <= job.deadline else None for job in jobs]
+
+
+class EvalServer:
+    """JSON-lines evaluation server keeping the calculator engine warm.
+
+    ``batch_window`` is how long the batcher waits for more requests after
+    the first one arrives (0 = take only what is already queued);
+    ``timeout`` is the per-request deadline in seconds. A request that
+    misses it is answered with ``{"error": "Timeout"}`` and skipped if it
+    has not started yet; one that is already running cannot be interrupted
+    from here and only delays the requests queued behind it – unless a
+    ``guard`` (calculator.guard.GuardedEvaluator) is given: then evaluations
+    run in its worker process and are killed at the guard's time and
+    memory limits.
+    """
+
+    def __init__(self, timeout: float = 1.0, batch_window: float = 0.0005,
+                 max_batch: int = 256, guard=None):
+        if timeout <= 0:
+            raise ValueError("timeout must be > 0")
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self.timeout = timeout
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.guard = guard
+        self.sessions: dict[str, Session] = {}
+        self.started = time.monotonic()
+        self.counters: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.latency = Histogram()
+        self.max_batch_seen = 0
+        self.connections = 0
+        self._queue: asyncio.Queue[_Job] | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._batcher: asyncio.Task | None = None
+        self._servers: list[asyncio.AbstractServer] = []
+        self._clients: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    # ─── Uruchamianie ────────────────────────────
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        self._start_batcher()
+        server = await asyncio.start_server(self._handle, host, port, limit=MAX_LINE)
+        self._servers.append(server)
+        return server
+
+    async def start_unix(self, path: str):
+        self._start_batcher()
+        server = await asyncio.start_unix_server(self._handle, path, limit=MAX_LINE)
+        self._servers.append(server)
+        return server
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers.clear()
+        # Zamykamy otwarte połączenia i czekamy, aż ich obsługa się zakończy
+        for writer in self._clients.values():
+            writer.close()
+        if self._clients:
+            await asyncio.gather(*self._clients, return_exceptions=True)
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.guard is not None:
+            # Czeka, aż wątek obliczeniowy odda proces roboczy (najwyżej limit czasu)
+            await asyncio.get_running_loop().run_in_executor(None, self.guard.close)
+
+    def _start_batcher(self):
+        if self._batcher is None:
+            self._queue = asyncio.Queue()
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="calc-eval")
+            self._batcher = asyncio.get_running_loop().create_task(self._batch_loop())
+
+    # ─── Paczkowanie ─────────────────────────────
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            jobs = [await queue.get()]
+            if self.batch_window > 0 and queue.empty():
+                await asyncio.sleep(self.batch_window)
+            while len(jobs) < self.max_batch and not queue.empty():
+                jobs.append(queue.get_nowait())
+            self.counters["batches"] += 1
+            self.counters["batched"] += len(jobs)
+            self.max_batch_seen = max(self.max_batch_seen, len(jobs))
+            replies = await loop.run_in_executor(self._executor, _run_batch, jobs)
+            for job, reply in zip(jobs, replies, strict=True):
+                if reply is not None and not job.future.done():
+                    job.future.set_result(reply)
+
+    async def submit(self, call: Callable[[], dict]) -> dict:
+        """Run ``call`` on the evaluation thread, in queue order, within the timeout."""
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Job(call, start + self.timeout, future))
+        try:
+            reply = await asyncio.wait_for(future, self.timeout)
+        except TimeoutError:
+            self.counters["timeouts"] += 1
+            reply = {"error": "Timeout", "kind": "timeout"}
+        self.latency.add(time.monotonic() - start)
+        if "kind" in reply:
+            self.errors[reply["kind"]] += 1
+        return reply
+
+    async def evaluate(self, session: Session, expression: str) -> dict:
+        if self.guard is not None:
+            call = partial(_compute_guarded, self.guard, session, expression)
+            return await self.submit(call)
+        return await self.submit(partial(_compute, session, expression))
+
+    # ─── Połączenia ──────────────────────────────
+    def _session(self, request: dict, own: Session) -> Session:
+        name = request.get("session")
+        if name is None:
+            return own
+        session = self.sessions.get(name)
+        if session is None:
+            session = self.sessions[name] = Session(name)
+        return session
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self.counters["connections"] += 1
+        own = Session()
+        pending: set[asyncio.Task] = set()
+        handler = asyncio.current_task()
+        self._clients[handler] = writer
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(b'{"error": "Request too long", "kind": "protocol"}\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                # Odpowiedzi mogą wyjść w innej kolejności niż żądania – wiąże je "id"
+                task = asyncio.ensure_future(self._respond(line, own, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                if len(pending) >= MAX_IN_FLIGHT:
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                await writer.drain()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            del self._clients[handler]
+            for task in pending:
+                task.cancel()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, line: bytes, own: Session, writer: asyncio.StreamWriter):
+        self.counters["requests"] += 1
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError
+        except ValueError:
+            self.errors["protocol"] += 1
+            reply = {"error": "Invalid JSON request", "kind": "protocol"}
+        else:
+            reply = await self._dispatch(request, own)
+            if "id" in request:
+                reply = {"id": request["id"], **reply}
+        if not writer.is_closing():
+            writer.write(json.dumps(reply, ensure_ascii=False).encode() + b"\n")
+
+    async def _dispatch(self, request: dict, own: Session) -> dict:
+        op = request.get("op", "eval")
+        try:
+            session = self._session(request, own)
+            if op == "eval":
+                expression = request.get("expr")
+                if not isinstance(expression, str):
+                    raise ValueError("'expr' must be a string")
+                return await self.evaluate(session, expression)
+            if op == "set":
+                return await self.submit(partial(_configure, session, request))
+            if op == "session":
+                return {"session": session.state()}
+            if op == "stats":
+                return {"stats": self.stats()}
+            if op == "ping":
+                return {"ok": True}
+            raise ValueError(f"Unknown op {op!r}")
+        except (TypeError, ValueError) as e:
+            self.errors["protocol"] += 1
+            return {"error": str(e), "kind": "protocol"}
+
+    # ─── Statystyki ──────────────────────────────
+    def stats(self) -> dict:
+        latency = self.latency.to_dict()
+        batches = self.counters["batches"]
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "connections": self.connections,
+            "connections_total": self.counters["connections"],
+            "sessions": len(self.sessions),
+            "requests": self.counters["requests"],
+            "completed": latency["count"],
+            "timeouts": self.counters["timeouts"],
+            "errors": dict(self.errors),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": batches,
+            "batch_size_mean": self.counters["batched"] / batches if batches else 0.0,
+            "batch_size_max": self.max_batch_seen,
+            "latency_ms": {k: latency[f"{k}_s"] * 1e3
+                           for k in ("mean", "p50", "p90", "p99", "max")},
+            "program_cache": cache_info(),
+        }
+
+
+# ─── Polecenie "serve" ──────────────────────────
+async def serve(args) -> None:
+    guard = None
+    if args.isolate:
+        from .guard import GuardedEvaluator
+
+        guard = GuardedEvaluator(timeout=args.timeout,
+                                 max_memory=args.max_memory_mb << 20)
+    server = EvalServer(timeout=args.timeout, batch_window=args.batch_window_ms / 1000,
+                        max_batch=args.max_batch, guard=guard)
+    if args.unix:
+        listener = await server.start_unix(args.unix)
+    else:
+        listener = await server.start_tcp(args.host, args.port)
+    names = ", ".join(str(s.getsockname()) for s in listener.sockets)
+    print(f"calculator server listening on {names}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main_serve(args) -> int:
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
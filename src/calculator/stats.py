@@ -0,0 +1,419 @@
+import heapq
+import math
+import re
+import sys
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from itertools import repeat
+from typing import TextIO
+
+# ────────────────────────────────────────────────
+# Statystyki strumieniowe – stała pamięć, wyniki dają się łączyć
+# ────────────────────────────────────────────────
+# Liczby przychodzą paczkami (blok tekstu z pliku, schowka albo stdin).
+# RunningStats trzyma tylko liczniki: średnią i M2 (Welford / Chan), sumę
+# z kompensacją (Neumaier), min/max i t-digest dla kwantyli. Dwa obiekty
+# z różnych kawałków danych albo procesów łączy merge().
+
+DEFAULT_COMPRESSION = 100
+DEFAULT_QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+
+
+class TDigest:
+    """Merging t-digest (Dunning): approximate quantiles in O(compression) memory.
+
+    Values are buffered and merged into at most about ``compression``
+    centroids; centroids near the tails stay small, so extreme quantiles
+    are the most accurate. Digests built separately can be merged.
+    """
+
+    __slots__ = ("compression", "means", "weights", "_buffer", "min", "max")
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        if compression < 10:
+            raise ValueError("compression must be >= 10")
+        self.compression = compression
+        self.means: list[float] = []
+        self.weights: list[float] = []
+        self._buffer: list[float] = []
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> float:
+        return math.fsum(self.weights) + len(self._buffer)
+
+    def add(self, x: float):
+        self._buffer.append(x)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def update(self, values: list[float]):
+        self._buffer.extend(values)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest"):
+        other._compress()
+        self._compress(zip(other.means, other.weights, strict=True))
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    # Funkcja skali k2 (logistyczna): k(q) = δ/Z·ln(q / (1 − q)), Z zależy od n.
+    # Centroidy przy końcach rosną od pojedynczych punktów.
+    def _k(self, q: float, norm: float) -> float:
+        if q <= 0:
+            return -math.inf
+        if q >= 1:
+            return math.inf
+        return self.compression / norm * math.log(q / (1 - q))
+
+    def _k_inverse(self, k: float, norm: float) -> float:
+        if k == -math.inf:
+            return 0.0
+        z = k * norm / self.compression
+        return 1 / (1 + math.exp(-z)) if z > -700 else 0.0
+
+    def _compress(self, extra: Iterable[tuple[float, float]] = ()):
+        extra = sorted(extra)
+        if not self._buffer and not extra:
+            return
+        buffer = sorted(self._buffer)
+        self._buffer = []
+        if buffer:
+            self.min = min(self.min, buffer[0])
+            self.max = max(self.max, buffer[-1])
+        points = heapq.merge(zip(self.means, self.weights, strict=True),
+                             zip(buffer, repeat(1.0), strict=False), extra)
+        total = self.count + len(buffer) + math.fsum(w for _, w in extra)
+
+        norm = 4 * math.log(max(total / self.compression, 1.0)) + 24
+        means, weights = [], []
+        mean, weight = next(points)
+        done = 0.0
+        limit = 0.0
+        for x, w in points:
+            if done + weight + w <= limit:
+                weight += w
+                mean += (x - mean) * w / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                done += weight
+                limit = total * self._k_inverse(self._k(done / total, norm) + 1, norm)
+                mean, weight = x, w
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float) -> float:
+        if not 0 <= q <= 1:
+            raise ValueError("quantile must be between 0 and 1")
+        self._compress()
+        if not self.means:
+            raise ValueError("No data")
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+        means, weights = self.means, self.weights
+        target = q * math.fsum(weights)
+        # Pierwszy i ostatni centroid interpolujemy do min / max
+        if target < weights[0] / 2:
+            return self.min + (means[0] - self.min) * target / (weights[0] / 2)
+        seen = weights[0] / 2               # waga do środka bieżącego centroidu
+        for i in range(len(means) - 1):
+            step = (weights[i] + weights[i + 1]) / 2
+            if seen + step > target:
+                return means[i] + (means[i + 1] - means[i]) * (target - seen) / step
+            seen += step
+        rest = weights[-1] / 2
+        return means[-1] + (self.max - means[-1]) * min(1.0, (target - seen) / rest)
+
+    def to_dict(self) -> dict:
+        self._compress()
+        return {"compression": self.compression, "means": self.means,
+                "weights": self.weights, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TDigest":
+        digest = cls(data["compression"])
+        digest.means = [float(m) for m in data["means"]]
+        digest.weights = [float(w) for w in data["weights"]]
+        digest.min, digest.max = float(data["min"]), float(data["max"])
+        return digest
+
+
+class RunningStats:
+    """Count, mean, variance, sum, min/max and quantiles of a stream of numbers.
+
+    ``add`` updates with Welford's recurrence; ``update`` takes a whole
+    chunk (two passes over the chunk, then Chan's merge). The sum is
+    compensated (Neumaier), so it does not drift on long streams.
+    ``merge`` combines results computed separately; ``to_dict`` /
+    ``from_dict`` carry them between processes as JSON.
+    """
+
+    __slots__ = ("count", "mean", "m2", "_sum", "_compensation", "min", "max", "digest",
+                 "skipped")
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._sum = 0.0
+        self._compensation = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.digest = TDigest(compression)
+        self.skipped = 0            # tokeny, które nie są liczbami
+
+    def _add_to_sum(self, x: float):
+        # Neumaier: gubiona część trafia do kompensacji
+        total = self._sum + x
+        if abs(self._sum) >= abs(x):
+            self._compensation += (self._sum - total) + x
+        else:
+            self._compensation += (x - total) + self._sum
+        self._sum = total
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self._add_to_sum(x)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self.digest.add(x)
+
+    def update(self, values: list[float]):
+        n = len(values)
+        if not n:
+            return
+        total = math.fsum(values)
+        mean = total / n
+        m2 = math.fsum((x - mean) ** 2 for x in values)
+        self._combine(n, mean, m2, min(values), max(values))
+        self._add_to_sum(total)
+        self.digest.update(values)
+
+    def _combine(self, n: int, mean: float, m2: float, low: float, high: float):
+        # Chan i in.: łączenie (n, średnia, M2) dwóch niezależnych części
+        count = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / count
+        self.m2 += m2 + delta * delta * self.count * n / count
+        self.count = count
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+            self._add_to_sum(other._sum)
+            self._add_to_sum(other._compensation)
+            self.digest.merge(other.digest)
+        self.skipped += other.skipped
+        return self
+
+    @property
+    def sum(self) -> float:
+        return self._sum + self._compensation
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (n − 1), like statistics.variance."""
+        if self.count < 2:
+            raise ValueError("Variance needs at least two values")
+        return self.m2 / (self.count - 1)
+
+    @property
+    def pvariance(self) -> float:
+        if not self.count:
+            raise ValueError("No data")
+        return self.m2 / self.count
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def quantile(self, q: float) -> float:
+        return self.digest.quantile(q)
+
+    def summary(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> dict:
+        if not self.count:
+            raise ValueError("No data")
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.mean,
+            "stdev": self.stdev if self.count > 1 else 0.0,
+            "variance": self.variance if self.count > 1 else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "quantiles": {f"{q:g}": self.quantile(q) for q in quantiles},
+            "skipped": self.skipped,
+        }
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "sum": self._sum,
+                "compensation": self._compensation, "min": self.min, "max": self.max,
+                "skipped": self.skipped, "digest": self.digest.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunningStats":
+        stats = cls(data["digest"]["compression"])
+        stats.count, stats.mean, stats.m2 = int(data["count"]), data["mean"], data["m2"]
+        stats._sum, stats._compensation = data["sum"], data["compensation"]
+        stats.min, stats.max = float(data["min"]), float(data["max"])
+        stats.skipped = int(data.get("skipped", 0))
+        stats.digest = TDigest.from_dict(data["digest"])
+        return stats
+
+
+# ─── Wczytywanie liczb ──────────────────────────
+# Separatory: białe znaki, przecinek i średnik (CSV, kolumna z arkusza, wklejka)
+_SEPARATOR = re.compile(r"[\s,;]+")
+
+
+def read_blocks(stream: TextIO, block_size: int = 1 << 16) -> Iterator[str]:
+    """Text blocks of about ``block_size`` characters, cut after a separator
+    so that no number is split between two blocks."""
+    rest = ""
+    while block := stream.read(block_size):
+        block = rest + block
+        end = max(block.rfind(c) for c in " \t\n\r,;") + 1
+        if end == 0:
+            rest = block            # jeszcze bez separatora – czytamy dalej
+            continue
+        rest = block[end:]
+        yield block[:end]
+    if rest:
+        yield rest
+
+
+def parse_numbers(text: str) -> tuple[list[float], int]:
+    """Finite numbers in ``text`` and the count of tokens that are not."""
+    values, skipped = [], 0
+    for token in _SEPARATOR.split(text):
+        if not token:
+            continue
+        try:
+            x = float(token)
+        except ValueError:
+            skipped += 1
+            continue
+        if math.isfinite(x):
+            values.append(x)
+        else:
+            skipped += 1
+    return values, skipped
+
+
+def stats_of_text(text: str, compression: int = DEFAULT_COMPRESSION) -> RunningStats:
+    stats = RunningStats(compression)
+    values, stats.skipped = parse_numbers(text)
+    stats.update(values)
+    return stats
+
+
+def stats_of_stream(
+    stream: TextIO,
+    workers: int = 0,
+    block_size: int = 1 << 16,
+    compression: int = DEFAULT_COMPRESSION,
+    max_in_flight: int | None = None,
+) -> RunningStats:
+    """Statistics of all numbers in ``stream``, read block by block.
+
+    With ``workers > 0`` blocks are parsed and summarized in a process pool
+    and the partial results merged, at most ``max_in_flight`` (default
+    ``2 * workers``) pending at once.
+    """
+    total = RunningStats(compression)
+    if workers <= 0:
+        for block in read_blocks(stream, block_size):
+            total.merge(stats_of_text(block, compression))
+        return total
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    limit = max_in_flight or 2 * workers
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for block in read_blocks(stream, block_size):
+            pending.append(pool.submit(stats_of_text, block, compression))
+            if len(pending) >= limit:
+                total.merge(pending.popleft().result())
+        while pending:
+            total.merge(pending.popleft().result())
+    return total
+
+
+# ─── Raport tekstowy ────────────────────────────
+def format_summary(summary: dict) -> str:
+    lines = [f"{'count':<10} {summary['count']}"]
+    for name in ("sum", "mean", "stdev", "variance", "min", "max"):
+        lines.append(f"{name:<10} {summary[name]:.15g}")
+    for q, value in summary["quantiles"].items():
+        lines.append(f"{'q' + q:<10} {value:.15g}")
+    return "\n".join(lines)
+
+
+# ─── Polecenie "stats" ──────────────────────────
+def main_stats(args) -> int:
+    import json
+
+    start = time.perf_counter()
+    total = RunningStats(args.compression)
+    if args.merge:
+        for path in args.input:
+            with open(path, encoding="utf-8") as f:
+                total.merge(RunningStats.from_dict(json.load(f)))
+    else:
+        for path in args.input or ["-"]:
+            stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+            try:
+                total.merge(stats_of_stream(stream, args.workers,
+                                            compression=args.compression))
+            finally:
+                if stream is not sys.stdin:
+                    stream.close()
+    elapsed = time.perf_counter() - start
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(total.to_dict(), f)
+    if not total.count:
+        print("No numbers in the input", file=sys.stderr)
+        return 1
+    summary = total.summary(args.quantile or DEFAULT_QUANTILES)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
+    note = f", skipped {total.skipped} non-numeric" if total.skipped else ""
+    print(f"{total.count} numbers in {elapsed:.3f}s{note}", file=sys.stderr)
+    return 0
+
+
+def add_stats_parser(subparsers):
+    parser = subparsers.add_parser(
+        "stats", help="summary statistics of numbers in files or stdin")
+    parser.add_argument("input", nargs="*",
+                        help="files with numbers separated by spaces, commas, "
+                             "semicolons or newlines (default: stdin)")
+    parser.add_argument("-q", "--quantile", type=float, action="append",
+                        help="quantile to report, e.g. -q 0.5 -q 0.99 "
+                             "(default: 1/25/50/75/99%%)")
+    parser.add_argument("-j", "--workers", type=int, default=0,
+                        help="worker processes (0 = read in this process)")
+    parser.add_argument("--compression", type=int, default=DEFAULT_COMPRESSION,
+                        help="t-digest size; higher is more accurate")
+    parser.add_argument("--save", metavar="PATH",
+                        help="write the mergeable state as JSON")
+    parser.add_argument("--merge", action="store_true",
+                        help="inputs are states written by --save; combine them")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.set_defaults(func=main_stats)
@@ -1,12 +1,46 @@
+import io
+import random
+import threading
 import tkinter as tk
-from tkinter import ttk
-import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime
-import random
-import math
-import re
-from .logic import evaluate_expression, set_angle_mode
+from tkinter import ttk
+
+from .editor import EditorBuffer
+from .guard import EvaluationCancelled, GuardedEvaluator
+from .history import (
+    HistoryPager,
+    HistoryRecord,
+    HistoryStore,
+    HistoryWriter,
+    migrate_legacy,
+)
+from .logic import (
+    CostLimitError,
+    Evaluator,
+    IncrementalParser,
+    describe_error,
+    format_number,
+    is_command,
+    result_text,
+)
+from .metrics import METRICS
+from .search import HistoryIndex, build_index
+from .stats import RunningStats, read_blocks, stats_of_text
+from .units import Quantity
+
+# Przyciski działające od razu na zawartości pola – liczone przez evaluator
+UNARY_TEMPLATES = {
+    "1/x": "1/x({})", "√": "√({})", "√x": "√({})", "³√x": "³√({})",
+    "x²": "({})x²", "x³": "({})x³", "%": "({})%", "!": "({})!", "n!": "({})!",
+    "ln": "ln({})", "log": "log({})", "eˣ": "exp({})", "10ˣ": "10^({})",
+    "sin": "sin({})", "cos": "cos({})", "tan": "tan({})",
+    "sin⁻¹": "asin({})", "cos⁻¹": "acos({})", "tan⁻¹": "atan({})",
+}
+# Po tylu ms obliczenia pokazujemy wskaźnik zajętości
+BUSY_DELAY_MS = 150
+# Co tyle sprawdzamy, czy inne okna i procesy dopisały coś do historii
+HISTORY_SYNC_MS = 1000
 
 
 class CalculatorGUI:
@@ -29,11 +63,45 @@ class CalculatorGUI:
         self.angle_mode = "DEG"
         self.precision_mode = "FLOAT"
         self.fixed_decimals = 4
-        self.memory = 0
+        self.decimal_digits = 50
+        self.evaluator = Evaluator(angle_mode=self.angle_mode,
+                                   decimal_digits=self.decimal_digits)
+
+        # Obliczenia idą do procesu roboczego (da się go zabić), obsługiwanego
+        # z jednego wątku – okno nie zamarza nawet przy bardzo dużych silniach
+        self.guard = GuardedEvaluator(timeout=None)
+        self._eval_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="calc-eval")
+        self._eval_executor.submit(self.guard.start)
+        self._request = 0
+        self._busy = False
+        self._busy_job = None
 
         # Historia
-        self.history_file = Path("history.json")
-        self.history_entries = self.load_history()
+        self.history_file = Path("history.jsonl")
+        self.history_store = HistoryStore(self.history_file)
+        migrate_legacy(Path("history.json"), self.history_store)
+        self.history_writer = HistoryWriter(self.history_store)
+        self.history_pager = HistoryPager(
+            self.history_store, flush=lambda: self.history_writer.flush(timeout=1)
+        )
+        self._history_loading = False
+        self._history_sync_job = None
+
+        # Indeks wyszukiwania budujemy w tle z migawki pliku; wpisy z bieżącej
+        # sesji czekają w _unindexed, aż indeks będzie gotowy
+        self.history_index: HistoryIndex | None = None
+        self._unindexed: list[HistoryRecord] = []
+        self._built_index: HistoryIndex | None = None
+        self._index_thread = threading.Thread(
+            target=self._build_history_index, args=(self.history_store.size(),),
+            daemon=True,
+        )
+        self._index_thread.start()
+        self.search_var = tk.StringVar()
+        self.search_results: list[HistoryRecord] | None = None
+        self._search_job = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Display
         self.entry = tk.Entry(
@@ -48,6 +116,7 @@ class CalculatorGUI:
             relief="flat"
         )
         self.entry.pack(fill="x", padx=16, pady=(16, 8))
+        self.entry.bind("<Escape>", lambda e: self.cancel_evaluation())
 
         self.paren_label = tk.Label(
             root,
@@ -59,6 +128,52 @@ class CalculatorGUI:
         )
         self.paren_label.pack(fill="x", padx=16)
 
+        # Podgląd wyniku w trakcie pisania – parser pamięta stan niezmienionego prefiksu
+        self.preview_label = tk.Label(
+            root,
+            text="",
+            bg=self.BG,
+            fg="#88c0d0",
+            anchor="e",
+            font=("Arial", 12)
+        )
+        self.preview_label.pack(fill="x", padx=16)
+        self.preview_parser = IncrementalParser()
+
+        status = tk.Frame(root, bg=self.BG)
+        status.pack(fill="x", padx=16)
+        self.status_label = tk.Label(
+            status,
+            text="",
+            bg=self.BG,
+            fg="#ebcb8b",
+            anchor="w",
+            font=("Arial", 10)
+        )
+        self.status_label.pack(side="left", fill="x", expand=True)
+        self.cancel_btn = tk.Button(
+            status,
+            text="Cancel",
+            font=("Arial", 10, "bold"),
+            bg=self.BTN_ALT,
+            fg=self.TEXT,
+            bd=0,
+            padx=10,
+            pady=2,
+            relief="flat",
+            activebackground="#bf616a",
+            activeforeground=self.TEXT,
+            command=self.cancel_evaluation
+        )
+        self._preview_job = None
+        self.entry_var.trace_add("write", self._on_entry_write)
+
+        # Przyciski edytują bufor; pole odświeżamy raz na cykl bezczynności
+        self.editor = EditorBuffer()
+        self._entry_changed = False
+        self._redrawing = False
+        self._redraw_job = None
+
         # Main container
         main = tk.Frame(root, bg=self.BG)
         main.pack(fill="both", expand=True, padx=12, pady=8)
@@ -99,6 +214,20 @@ class CalculatorGUI:
         )
         clear_btn.pack(side="right")
 
+        search_entry = tk.Entry(
+            hist_frame,
+            textvariable=self.search_var,
+            font=("Arial", 11),
+            bg=self.ENTRY_BG,
+            fg=self.TEXT,
+            insertbackground=self.TEXT,
+            bd=0,
+            relief="flat"
+        )
+        search_entry.pack(fill="x", pady=(0, 4))
+        search_entry.bind("<KeyRelease>", lambda e: self.schedule_search())
+        search_entry.bind("<Escape>", lambda e: self.clear_search())
+
         list_container = tk.Frame(hist_frame, bg=self.BG)
         list_container.pack(fill="both", expand=True)
 
@@ -116,15 +245,16 @@ class CalculatorGUI:
         )
         self.history_box.pack(side="left", fill="both", expand=True)
 
-        scrollbar = ttk.Scrollbar(list_container, orient="vertical", command=self.history_box.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.history_box.config(yscrollcommand=scrollbar.set)
+        self.history_scrollbar = ttk.Scrollbar(list_container, orient="vertical",
+                                               command=self.history_box.yview)
+        self.history_scrollbar.pack(side="right", fill="y")
+        self.history_box.config(yscrollcommand=self.on_history_scroll)
+        self.history_box.bind("<Double-Button-1>", self.use_history_entry)
+        self.history_box.bind("<Return>", self.use_history_entry)
 
-        # Wczytujemy i wypełniamy historię
-        for entry in self.history_entries:
-            self.history_box.insert(tk.END, entry)
-        if self.history_entries:
-            self.history_box.see(tk.END)
+        # Wczytujemy tylko ostatnią stronę historii – starsze dochodzą przy przewijaniu
+        self.show_latest_history()
+        self._history_sync_job = self.root.after(HISTORY_SYNC_MS, self.sync_history)
 
         # ────────────────────────────────────────────────
         # Buttons layout
@@ -139,7 +269,8 @@ class CalculatorGUI:
             ['4',     '5',      '6',      '-',      'Ans'],
             ['1',     '2',      '3',      '*',      'M+'],
             ['0',     '.',      'EXP',    '/',      'M-'],
-            ['±',     'RND',    'AC',     '=',      'MR']
+            ['±',     'RND',    'AC',     '=',      'MR'],
+            ['x',     ',',      'solve',  '∫',      'STAT']
         ]
 
         unary_immediate = {
@@ -175,7 +306,7 @@ class CalculatorGUI:
 
                 if char in ('DEG', 'RAD'):
                     self.angle_btn = btn
-                if char in ('FLOAT', 'FIXED'):
+                if char in ('FLOAT', 'FIXED', 'DEC'):
                     self.precision_btn = btn
 
         btn_frame.columnconfigure(tuple(range(5)), weight=1)
@@ -185,103 +316,358 @@ class CalculatorGUI:
     # ────────────────────────────────────────────────
 
     def load_history(self):
-        if not self.history_file.exists():
-            return []
         try:
-            with self.history_file.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                return data.get("entries", [])[-200:]
-        except:
+            return [record.format() for record in self.history_pager.load_latest()]
+        except OSError:
             return []
 
-    def save_history(self):
+    def show_latest_history(self):
+        self.history_box.delete(0, tk.END)
+        entries = self.load_history()
+        if entries:
+            self.history_box.insert(tk.END, *entries)
+            self.history_box.see(tk.END)
+
+    def on_history_scroll(self, first, last):
+        self.history_scrollbar.set(first, last)
+        if self._history_loading or self.search_results is not None:
+            return
+        if float(first) <= 0.0 and self.history_pager.has_older:
+            self._history_loading = True
+            self.root.after_idle(self.load_older_history)
+        elif float(last) >= 1.0 and self.history_pager.has_newer:
+            self._history_loading = True
+            self.root.after_idle(self.load_newer_history)
+
+    def load_older_history(self):
         try:
-            data = {
-                "entries": self.history_entries,
-                "last_updated": datetime.now().isoformat()
-            }
-            with self.history_file.open("w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except:
+            added, dropped = self.history_pager.load_older()
+            if dropped:
+                self.history_box.delete(self.history_box.size() - dropped, tk.END)
+            if added:
+                self.history_box.insert(0, *[r.format() for r in added])
+                # Zostajemy przy tym samym wierszu, który był na górze
+                self.history_box.yview(len(added))
+        except OSError:
             pass
+        finally:
+            self._history_loading = False
+
+    def load_newer_history(self):
+        try:
+            top = self.history_box.nearest(0)
+            added, dropped = self.history_pager.load_newer()
+            if dropped:
+                self.history_box.delete(0, dropped - 1)
+            if added:
+                self.history_box.insert(tk.END, *[r.format() for r in added])
+            self.history_box.yview(max(0, top - dropped))
+        except OSError:
+            pass
+        finally:
+            self._history_loading = False
 
     def add_to_history(self, left: str, right: str):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        entry = f"[{timestamp}] {left} = {right}"
-        self.history_entries.append(entry)
-        self.history_box.insert(tk.END, entry)
+        record = HistoryRecord.now(left, right)
+        if self.history_index is not None:
+            self.history_index.add(record)
+        else:
+            self._unindexed.append(record)
+        if self.search_results is not None:
+            # Lista pokazuje wyniki wyszukiwania – odświeżamy je zamiast dopisywać
+            self.history_pager.append(record)
+            self.history_writer.append(record)
+            self.schedule_search()
+            return
+        if self.history_pager.has_newer:
+            self.show_latest_history()
+        dropped = self.history_pager.append(record)
+        if dropped:
+            self.history_box.delete(0, dropped - 1)
+        self.history_box.insert(tk.END, record.format())
         self.history_box.see(tk.END)
-        self.save_history()
+        self.history_writer.append(record)
+
+    def sync_history(self):
+        """Show records other windows and processes appended to the history file."""
+        self._history_sync_job = self.root.after(HISTORY_SYNC_MS, self.sync_history)
+        try:
+            changes, dropped = self.history_pager.follow()
+        except OSError:
+            return
+        if changes.cleared:
+            self._unindexed.clear()
+            self.history_index = HistoryIndex()
+        records = [row.record for row in changes.rows]
+        if records and self.history_index is not None:
+            self.history_index.add_many(records)
+        else:
+            self._unindexed.extend(records)
+        if self.search_results is not None:
+            if records or changes.cleared:
+                self.schedule_search()
+            return
+        if changes.cleared or changes.reset:
+            self.show_latest_history()
+            return
+        if dropped:
+            self.history_box.delete(0, dropped - 1)
+        if records and not self.history_pager.has_newer:
+            at_bottom = self.history_box.yview()[1] >= 1.0
+            self.history_box.insert(tk.END, *[r.format() for r in records])
+            if at_bottom:
+                self.history_box.see(tk.END)
 
     def clear_history(self):
-            self.history_entries.clear()
+        self.history_pager.clear()
+        self.history_box.delete(0, tk.END)
+        self.history_writer.clear()
+        self._unindexed.clear()
+        # Indeks budowany w tle też zostanie wyczyszczony po przejęciu
+        self.history_index = HistoryIndex()
+        self.search_var.set("")
+        self.search_results = None
+
+    # ─── Wyszukiwanie ───────────────────────────────
+    def _build_history_index(self, end: int):
+        try:
+            self._built_index = build_index(self.history_store, end)
+        except OSError:
+            self._built_index = HistoryIndex()
+
+    def _ensure_history_index(self) -> bool:
+        if self.history_index is None:
+            if self._index_thread.is_alive():
+                return False
+            self.history_index = self._built_index or HistoryIndex()
+        if self._unindexed:
+            self.history_index.add_many(self._unindexed)
+            self._unindexed.clear()
+        return True
+
+    def schedule_search(self):
+        # Debounce: szukamy dopiero po krótkiej przerwie w pisaniu
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(150, self.run_search)
+
+    def run_search(self):
+        self._search_job = None
+        query = self.search_var.get().strip()
+        if not query:
+            if self.search_results is not None:
+                self.search_results = None
+                self.show_latest_history()
+            return
+        if not self._ensure_history_index():
             self.history_box.delete(0, tk.END)
-            with self.history_file.open("w", encoding="utf-8") as f:
-                json.dump({}, f, indent=2)
+            self.history_box.insert(tk.END, "Indexing history…")
+            self.search_results = []
+            self._search_job = self.root.after(200, self.run_search)
+            return
+        found = self.history_index.search(query, limit=500)
+        self.search_results = [record for _, record in found]
+        self.history_box.delete(0, tk.END)
+        if self.search_results:
+            self.history_box.insert(tk.END, *[r.format() for r in self.search_results])
+        self.history_box.yview(0)
+
+    def clear_search(self):
+        self.search_var.set("")
+        self.schedule_search()
+
+    def use_history_entry(self, event=None):
+        selection = self.history_box.curselection()
+        if not selection:
+            return
+        i = selection[0]
+        if self.search_results is not None:
+            if i >= len(self.search_results):
+                return
+            record = self.search_results[i]
+        elif i < len(self.history_pager.rows):
+            record = self.history_pager.rows[i].record
+        else:
+            return
+        self.entry_var.set(record.expression)
+        self.entry.icursor(tk.END)
+        self.update_paren()
+
+    def on_close(self):
+        # Zapisujemy zaległe wpisy przed zamknięciem okna
+        if self._history_sync_job is not None:
+            self.root.after_cancel(self._history_sync_job)
+        self.history_writer.close(timeout=5)
+        self.guard.cancel()
+        self._eval_executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+        self.guard.close()
 
     # ────────────────────────────────────────────────
-    # Unary operations
+    # Obliczenia w tle
     # ────────────────────────────────────────────────
 
-    def apply_unary(self, op):
-        current = self.entry_var.get().strip()
-        if not current or current == "Error":
+    def run_in_background(self, expression: str, done, method: str = "compute"):
+        """Evaluate ``expression`` off the Tk thread; ``done(value, error)``
+        runs on the Tk thread unless a newer request or cancel() came first.
+        Ans changes after it, unless it returns False (the result could not
+        be shown). ``method`` is the GuardedEvaluator method
+        (``compute_command`` for solve/integrate)."""
+        if self._busy:
+            # Nowe żądanie zastępuje poprzednie – nie czekamy, aż się doliczy
+            self.guard.cancel()
+        self._request += 1
+        ev = self.evaluator
+        # Migawka trybów i Ans – zmiany w trakcie liczenia jej nie dotyczą
+        snapshot = Evaluator(ev.angle_mode, dict(ev.constants), ev.number_mode,
+                             ev.decimal_digits, ev.max_bits)
+        self.set_busy(True)
+        self._eval_executor.submit(self._evaluate_job, self._request, method,
+                                   expression, snapshot, done)
+
+    def _evaluate_job(self, request: int, method: str, expression: str,
+                      snapshot: Evaluator, done):
+        # Wątek roboczy – Tk dotykamy tylko przez root.after. Etapy obliczenia
+        # mierzy proces roboczy strażnika; tu tylko cała droga do niego
+        try:
+            with METRICS.measure("guard"):
+                value, error = getattr(self.guard, method)(expression, snapshot), None
+        except Exception as e:
+            value, error = None, e
+        try:
+            self.root.after(0, self._evaluation_done, request, value, error,
+                            snapshot.ans, done)
+        except (RuntimeError, tk.TclError):
+            pass        # okno już zamknięte
+
+    def _evaluation_done(self, request: int, value, error, ans, done):
+        if request != self._request:
+            return      # wynik zastąpionego albo anulowanego żądania
+        self.set_busy(False)
+        if isinstance(error, EvaluationCancelled):
             return
+        if done(value, error) is not False and error is None:
+            self.evaluator.ans = ans
 
+    def cancel_evaluation(self):
+        if not self._busy:
+            return
+        self._request += 1
+        self.guard.cancel()
+        self.set_busy(False)
+        self.status_label.config(text="Cancelled")
+
+    def set_busy(self, busy: bool):
+        self._busy = busy
+        if self._busy_job is not None:
+            self.root.after_cancel(self._busy_job)
+            self._busy_job = None
+        if busy:
+            # Krótkich obliczeń nie sygnalizujemy – wskaźnik by tylko mrugał
+            self._busy_job = self.root.after(BUSY_DELAY_MS, self._show_busy)
+        else:
+            self.status_label.config(text="")
+            self.cancel_btn.pack_forget()
+            self.entry.config(cursor="xterm")
+
+    def _show_busy(self):
+        self._busy_job = None
+        self.status_label.config(text="Calculating…")
+        self.cancel_btn.pack(side="right")
+        self.entry.config(cursor="watch")
+
+    def show_result(self, hist_text: str, value, error):
+        if error is not None:
+            self.entry_var.set("Error")
+            return False
         try:
-            value = float(current)
-
-            # ─── Simple operations ───────────────────────────────────────────
-            simple_ops = {
-                "1/x": (lambda x: 1 / x, lambda c: f"1/x({c})"),
-                "√": (math.sqrt, lambda c: f"√({c})"),
-                "√x": (math.sqrt, lambda c: f"√({c})"),
-                "³√x": (lambda x: x ** (1 / 3), lambda c: f"³√({c})"),
-                "x²": (lambda x: x ** 2, lambda c: f"({c})²"),
-                "x³": (lambda x: x ** 3, lambda c: f"({c})³"),
-                "%": (lambda x: x / 100, lambda c: f"{c}%"),
-                "ln": (math.log, lambda c: f"ln({c})"),
-                "log": (math.log10, lambda c: f"log({c})"),
-                "eˣ": (math.exp, lambda c: f"e^({c})"),
-                "10ˣ": (lambda x: 10 ** x, lambda c: f"10^({c})"),
-            }
-
-            if op in simple_ops:
-                func, hist_fmt = simple_ops[op]
-                result = func(value)
-                hist_text = hist_fmt(current)
-
-            # ─── Factorial ──────────────────────────────────────────────────
-            elif op in ("!", "n!"):
-                if not value.is_integer() or value < 0:
-                    raise ValueError("Factorial only for non-negative integers")
-                result = math.factorial(int(value))
-                hist_text = f"{int(value)}!"
-
-            # ─── Trigonometric functions ────────────────────────────────────
-            elif op in ("sin", "cos", "tan"):
-                func = {"sin": math.sin, "cos": math.cos, "tan": math.tan}[op]
-                rad = math.radians(value) if self.angle_mode == "DEG" else value
-                result = func(rad)
-                hist_text = f"{op}({current})"
-
-            elif op in ("sin⁻¹", "cos⁻¹", "tan⁻¹"):
-                func = {"sin⁻¹": math.asin, "cos⁻¹": math.acos, "tan⁻¹": math.atan}[op]
-                val = func(value)
-                result = math.degrees(val) if self.angle_mode == "DEG" else val
-                # nicer history names: asin / acos / atan
-                clean_op = {"sin⁻¹": "asin", "cos⁻¹": "acos", "tan⁻¹": "atan"}[op]
-                hist_text = f"{clean_op}({current})"
-
-            else:
-                return
-
-            formatted = self.format_number(result)
-            self.entry_var.set(formatted)
+            with METRICS.measure("format"):
+                # Wielkość z jednostką formatujemy sama; reszta jak dotąd przez str
+                formatted = self.format_number(
+                    value if type(value) is Quantity else result_text(value))
+        except (ValueError, OverflowError) as e:
+            # Np. int dłuższy niż limit cyfr str() – jak każdy inny błąd
+            return self.show_result(hist_text, None, e)
+        self.entry_var.set(formatted)
+        with METRICS.measure("history"):
             self.add_to_history(hist_text, formatted)
 
-        except Exception:
+    # ────────────────────────────────────────────────
+    # Statystyki – liczby ze schowka albo z pliku
+    # ────────────────────────────────────────────────
+
+    def statistics(self):
+        try:
+            text = self.root.clipboard_get()
+        except tk.TclError:
+            text = ""
+        if any(ch.isdigit() for ch in text):
+            label, open_source = "clipboard", lambda: io.StringIO(text)
+        else:
+            from tkinter import filedialog
+
+            path = filedialog.askopenfilename(parent=self.root,
+                                              title="Statistics of a file")
+            if not path:
+                return
+            label, open_source = Path(path).name, lambda: open(path, encoding="utf-8")
+        if self._busy:
+            self.guard.cancel()
+        self._request += 1
+        self.set_busy(True)
+        self._eval_executor.submit(self._statistics_job, self._request, label,
+                                   open_source)
+
+    def _statistics_job(self, request: int, label: str, open_source):
+        # Wątek roboczy; plik czytamy blokami, więc pamięć nie rośnie z rozmiarem
+        stats, summary, error = RunningStats(), None, None
+        try:
+            with open_source() as stream:
+                for block in read_blocks(stream):
+                    if request != self._request:
+                        return      # anulowane albo zastąpione
+                    stats.merge(stats_of_text(block))
+            summary = stats.summary((0.5,))
+        except Exception as e:
+            error = e
+        mean = summary["mean"] if summary else None
+        try:
+            self.root.after(
+                0, self._evaluation_done, request, summary, error, mean,
+                lambda summary, error: self.show_statistics(label, summary, error))
+        except (RuntimeError, tk.TclError):
+            pass
+
+    def show_statistics(self, label: str, summary, error):
+        if error is not None:
             self.entry_var.set("Error")
+            self.status_label.config(text=describe_error(error))
+            return
+        # Średnia trafia do pola i Ans, reszta do paska stanu
+        mean = self.format_number(summary["mean"])
+        self.entry_var.set(mean)
+        self.add_to_history(f"mean of {summary['count']} ({label})", mean)
+        self.status_label.config(
+            text=f"n={summary['count']}  sd={summary['stdev']:.6g}  "
+                 f"min={summary['min']:.6g}  max={summary['max']:.6g}  "
+                 f"median={summary['quantiles']['0.5']:.6g}"
+        )
+        self.update_paren()
+
+    # ────────────────────────────────────────────────
+    # Unary operations
+    # ────────────────────────────────────────────────
+
+    def apply_unary(self, op):
+        current = self._editor().text.strip()
+        if not current or current == "Error" or op not in UNARY_TEMPLATES:
+            return
+        # Liczymy przez evaluator – tryb DEC nie traci cyfr na float, a silnia
+        # czy potęga nie blokują okna
+        hist_text = UNARY_TEMPLATES[op].format(current)
+        self.run_in_background(
+            hist_text, lambda value, error: self.show_result(hist_text, value, error)
+        )
 
     # ────────────────────────────────────────────────
     # Pozostałe metody
@@ -298,10 +684,12 @@ class CalculatorGUI:
             'RAD':    self.toggle_angle,
             'FLOAT':  self.toggle_precision,
             'FIXED':  self.toggle_precision,
+            'DEC':    self.toggle_precision,
             'M+':     lambda: self.memory_op('M+'),
             'M-':     lambda: self.memory_op('M-'),
             'MR':     lambda: self.memory_op('MR'),
             'Ans':    lambda: self.append('Ans'),
+            'STAT':   self.statistics,
         }
         return commands.get(char, lambda ch=char: self.append(ch))
 
@@ -310,105 +698,167 @@ class CalculatorGUI:
             'xʸ': '^', 'x²': 'x²', 'x³': 'x³', '√': '√', '³√x': '³√',
             '1/x': '1/x', '!': '!', 'sin⁻¹': 'asin', 'cos⁻¹': 'acos',
             'tan⁻¹': 'atan', 'eˣ': 'exp', '10ˣ': '10^x', 'EXP': '*10^',
+            'solve': 'solve(', '∫': '∫(', ',': ', ',
         }.get(ch, ch)
 
-        current = self.entry_var.get()
-        if current == "Error":
-            self.entry_var.set(mapped)
+        editor = self._editor()
+        if self._shows_error(editor):
+            editor.set(mapped)
         else:
-            self.entry_var.set(current + mapped)
-        self.update_paren()
+            editor.append(mapped)
+        self.schedule_redraw()
 
     def backspace(self):
-        current = self.entry_var.get()
-        if current == "Error":
-            self.clear()
+        editor = self._editor()
+        if self._shows_error(editor):
+            editor.clear()
         else:
-            self.entry_var.set(current[:-1])
-        self.update_paren()
+            editor.backspace()
+        self.schedule_redraw()
 
     def clear(self):
-        self.entry_var.set("")
-        self.update_paren()
+        self._editor().clear()
+        self.schedule_redraw()
 
     def toggle_sign(self):
-        expr = self.entry_var.get()
-        if expr == "Error":
+        editor = self._editor()
+        if self._shows_error(editor):
             return
-        m = re.search(r'(-?\d*\.?\d*)$', expr)
-        if m:
-            num = m.group(1)
-            start = m.start(1)
-            new_num = num[1:] if num.startswith('-') else '-' + num
-            self.entry_var.set(expr[:start] + new_num)
+        editor.toggle_sign()
+        self.schedule_redraw()
+
+    @staticmethod
+    def _shows_error(editor: EditorBuffer) -> bool:
+        return len(editor) == 5 and editor.text == "Error"
+
+    def _editor(self) -> EditorBuffer:
+        # Tekst zmieniony poza buforem (klawiatura, wynik, historia) wczytujemy
+        # dopiero przy następnej edycji przyciskiem
+        if self._entry_changed:
+            self._entry_changed = False
+            self.editor.load(self.entry_var.get())
+        return self.editor
+
+    def _on_entry_write(self, *_):
+        if not self._redrawing:
+            self._entry_changed = True
+        self.schedule_preview()
+
+    def schedule_redraw(self):
+        if self._redraw_job is None:
+            self._redraw_job = self.root.after_idle(self.redraw)
+
+    def redraw(self):
+        # Seria kliknięć (albo autorepetycja) to jedno odświeżenie pola –
+        # i tylko zmienionego końca tekstu
+        self._redraw_job = None
+        changes = self._editor().take_changes()
+        if changes is not None:
+            index, tail = changes
+            self._redrawing = True
+            try:
+                self.entry.delete(index, tk.END)
+                self.entry.insert(index, tail)
+            finally:
+                self._redrawing = False
         self.update_paren()
 
     def calculate(self):
-        expr = self.entry_var.get().strip()
+        expr = self._editor().text.strip()
         if not expr:
             return
-
-        raw_result = evaluate_expression(expr)
-        if "Error" in str(raw_result) or raw_result in ("Division by zero",):
-            self.entry_var.set("Error")
+        if is_command(expr):
+            self.run_in_background(expr, lambda result, error: self.show_command_result(
+                expr, result, error), method="compute_command")
             return
+        self.run_in_background(
+            expr, lambda value, error: self.show_result(expr, value, error))
 
-        formatted = self.format_number(raw_result)
-        self.entry_var.set(formatted)
-        self.add_to_history(expr, formatted)
+    def show_command_result(self, expr: str, result, error):
+        if self.show_result(expr, None if error else result.value, error) is False:
+            return False
+        # Koszt w liczbie wywołań funkcji – tyle co czas, ale powtarzalny
+        self.status_label.config(text=f"{result.evaluations} evaluations")
 
     def toggle_precision(self):
-        self.precision_mode = "FIXED" if self.precision_mode == "FLOAT" else "FLOAT"
+        # FLOAT -> FIXED (zaokrąglenie wyświetlania) -> DEC (obliczenia na Decimal)
+        modes = ("FLOAT", "FIXED", "DEC")
+        self.precision_mode = modes[(modes.index(self.precision_mode) + 1) % len(modes)]
+        number_mode = "DECIMAL" if self.precision_mode == "DEC" else "FLOAT"
+        self.evaluator.set_number_mode(number_mode)
         self.precision_btn.config(text=self.precision_mode)
+        self.schedule_preview()
 
     def toggle_angle(self):
         self.angle_mode = "RAD" if self.angle_mode == "DEG" else "DEG"
         self.angle_btn.config(text=self.angle_mode)
-        set_angle_mode(self.angle_mode)
+        self.evaluator.set_angle_mode(self.angle_mode)
+        self.schedule_preview()
 
     def random_number(self):
-        self.entry_var.set(self.entry_var.get() + f"{random.random():.6f}")
+        self._editor().append(f"{random.random():.6f}")
+        self.schedule_redraw()
 
     def memory_op(self, op):
         try:
-            current = self.entry_var.get().strip()
+            current = self._editor().text.strip()
             if not current or current == "Error":
                 return
 
             if op == "MR":
-                self.entry_var.set(str(self.memory))
+                self.entry_var.set(str(self.evaluator.memory_recall()))
                 return
 
             # M+ / M-
-            val = float(evaluate_expression(current))
-            if op == "M+":
-                self.memory += val
-            else:  # M-
-                self.memory -= val
+            self.run_in_background(
+                current, lambda value, error: self.memory_store(op, value, error)
+            )
 
         except:
             self.entry_var.set("Error")
 
-    def update_paren(self):
-        expr = self.entry_var.get()
-        depth = expr.count("(") - expr.count(")")
-        color = "#bf616a" if depth < 0 else "#a3be8c" if depth > 0 else "#81a1c1"
-        self.paren_label.config(text=f"() depth: {depth}", fg=color)
-
-    def format_number(self, value):
+    def memory_store(self, op, value, error):
         try:
-            v = float(value)
-        except (TypeError, ValueError):
-            return str(value)
+            if error is not None:
+                raise error
+            if op == "M+":
+                self.evaluator.memory_add(float(value))
+            else:  # M-
+                self.evaluator.memory_subtract(float(value))
+        except Exception:
+            self.entry_var.set("Error")
 
-        if self.precision_mode == "FIXED":
-            s = f"{v:.{self.fixed_decimals}f}"
-            return s.rstrip("0").rstrip(".") if "." in s else s
+    def schedule_preview(self):
+        # Debounce: przy szybkim pisaniu liczymy tylko ostatnią wersję tekstu
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+        self._preview_job = self.root.after(40, self.update_preview)
 
-        if v == 0:
-            return "0"
+    def update_preview(self):
+        self._preview_job = None
+        expr = self.entry_var.get()
+        if not expr.strip() or expr == "Error" or is_command(expr):
+            self.preview_label.config(text="")
+            return
+        preview = self.evaluator.preview(self.preview_parser, expr)
+        if isinstance(preview.error, CostLimitError):
+            # Za drogie na podgląd – policzy je dopiero "="
+            self.preview_label.config(text="")
+        elif preview.error is not None:
+            self.preview_label.config(text=describe_error(preview.error), fg="#bf616a")
+        elif preview.value is None:
+            self.preview_label.config(text="")
+        else:
+            formatted = self.format_number(preview.value)
+            # Sama liczba nie potrzebuje podglądu
+            text = "" if formatted == expr.strip() else f"= {formatted}"
+            self.preview_label.config(text=text, fg="#88c0d0")
 
-        if abs(v) >= 1e12 or (0 < abs(v) < 1e-8):
-            return f"{v:.8e}"
+    def update_paren(self):
+        depth = self._editor().depth
+        color = "#bf616a" if depth < 0 else "#a3be8c" if depth > 0 else "#81a1c1"
+        self.paren_label.config(text=f"() depth: {depth}", fg=color)
 
-        return f"{v:g}"
\ No newline at end of file
+    def format_number(self, value):
+        return format_number(value, self.precision_mode, self.fixed_decimals,
+                             self.decimal_digits)
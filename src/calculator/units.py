@@ -0,0 +1,354 @@
+import re
+import threading
+from collections.abc import Callable, Iterable
+from fractions import Fraction
+from typing import NamedTuple
+
+# ────────────────────────────────────────────────
+# Jednostki – wymiary, graf przeliczeń, wielkości z jednostką
+# ────────────────────────────────────────────────
+# Wymiar to wektor wykładników jednostek podstawowych spakowany w jedną
+# liczbę całkowitą (16 bitów na wykładnik, z przesunięciem), więc mnożenie
+# jednostek to dodawanie liczb, a porównanie wymiarów – jedno ==.
+# Definicje jednostek tworzą graf (jednostka -> jednostki, przez które jest
+# zdefiniowana). Tabele czytamy dopiero przy pierwszym użyciu; wtedy też
+# liczymy współczynniki dla każdej pary jednostek o tym samym wymiarze,
+# więc przeliczenie w trakcie obliczeń to jedno mnożenie.
+
+BASE_UNITS = ("m", "kg", "s", "A", "K", "mol", "cd", "bit")
+
+_FIELD = 16
+_OFFSET = 1 << (_FIELD - 1)
+_MASK = (1 << _FIELD) - 1
+MAX_EXPONENT = 1000
+
+
+def pack_dimensions(exponents: Iterable[int]) -> int:
+    exponents = tuple(exponents)
+    if (len(exponents) > len(BASE_UNITS)
+            or any(abs(e) > MAX_EXPONENT for e in exponents)):
+        raise ValueError("Unit exponent too large")
+    exponents += (0,) * (len(BASE_UNITS) - len(exponents))
+    return sum((e + _OFFSET) << (_FIELD * i) for i, e in enumerate(exponents))
+
+
+def unpack_dimensions(dims: int) -> tuple[int, ...]:
+    return tuple(((dims >> (_FIELD * i)) & _MASK) - _OFFSET
+                 for i in range(len(BASE_UNITS)))
+
+
+DIMENSIONLESS = pack_dimensions(())
+
+
+class Unit(NamedTuple):
+    name: str
+    factor: float                       # ile jednostek podstawowych (SI) to 1 name
+    dims: int                           # spakowane wykładniki BASE_UNITS
+    parts: tuple[tuple[str, int], ...]  # nazwane jednostki składowe z potęgami
+
+
+def _unit_name(parts: tuple[tuple[str, int], ...]) -> str:
+    # ("kg", 1), ("m", 2), ("s", -2) -> "kg*m^2/s^2"
+    top = [name if p == 1 else f"{name}^{p}" for name, p in parts if p > 0]
+    bottom = [name if p == -1 else f"{name}^{-p}" for name, p in parts if p < 0]
+    return ("*".join(top) or "1") + "".join("/" + name for name in bottom)
+
+
+def multiply_units(a: Unit, b: Unit, sign: int = 1) -> Unit:
+    """``a * b`` (or ``a / b`` with ``sign=-1``)."""
+    powers = dict(a.parts)
+    for name, p in b.parts:
+        powers[name] = powers.get(name, 0) + sign * p
+    parts = tuple((name, p) for name, p in powers.items() if p)
+    factor = a.factor * b.factor if sign > 0 else a.factor / b.factor
+    if sign > 0:
+        dims = a.dims + b.dims - DIMENSIONLESS
+    else:
+        dims = a.dims - b.dims + DIMENSIONLESS
+    return Unit(_unit_name(parts), factor, dims, parts)
+
+
+def power_unit(a: Unit, n: int) -> Unit:
+    if max(map(abs, unpack_dimensions(a.dims))) * abs(n) > MAX_EXPONENT:
+        raise ValueError("Unit exponent too large")
+    parts = tuple((name, p * n) for name, p in a.parts) if n else ()
+    dims = (a.dims - DIMENSIONLESS) * n + DIMENSIONLESS
+    return Unit(_unit_name(parts), a.factor ** n, dims, parts)
+
+
+# ─── Rejestr ────────────────────────────────────
+_DEFINITION = re.compile(
+    r"\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)"
+    r"|(?P<name>[A-Za-z_]\w*)(?:\^(?P<power>-?\d+))?"
+    r"|(?P<op>[*/]))"
+)
+
+
+class UnitRegistry:
+    """Named units; tables are read and conversion factors computed on first use.
+
+    A definition is a number and a product of known units, e.g.
+    ``"0.0254 m"``, ``"12 in"`` or ``"kg*m^2/s^2"``. Factors are resolved
+    exactly (as fractions) along the definitions, and every pair of units
+    of one dimension gets its correctly rounded float factor, so ``ft`` to
+    ``in`` is exactly 12 and not 0.3048 / 0.0254.
+
+    Names must be read by the expression lexer as a single word, so they
+    cannot start with a function or constant name (``e``, ``ln``, ``sin``…).
+    """
+
+    def __init__(self):
+        self._units: dict[str, Unit] = {}
+        self._pairs: dict[tuple[str, str], float] = {}
+        self._exact: dict[str, Fraction] = {}       # dokładny współczynnik do SI
+        self._groups: dict[int, list[str]] = {}
+        self._pending: list[Callable[[], Iterable[tuple[str, str]]]] = []
+        self._lock = threading.Lock()
+        for i, name in enumerate(BASE_UNITS):
+            exponents = [0] * len(BASE_UNITS)
+            exponents[i] = 1
+            unit = Unit(name, 1.0, pack_dimensions(exponents), ((name, 1),))
+            self._add(unit, Fraction(1))
+
+    def add_table(self, loader: Callable[[], Iterable[tuple[str, str]]]):
+        """Register ``loader() -> [(name, definition), ...]``, called on first use."""
+        with self._lock:
+            self._pending.append(loader)
+
+    def define(self, name: str, definition: str):
+        self.add_table(lambda: [(name, definition)])
+
+    def _load(self):
+        with self._lock:
+            while self._pending:
+                for name, definition in self._pending.pop(0)():
+                    self._define(name, definition)
+
+    def _define(self, name: str, definition: str):
+        if not name.isidentifier():
+            raise ValueError(f"Invalid unit name {name!r}")
+        if name in self._units:
+            raise ValueError(f"Unit {name!r} is already defined")
+        factor, terms, sign, pos = Fraction(1), [], 1, 0
+        while pos < len(definition):
+            m = _DEFINITION.match(definition, pos)
+            if m is None or m.end() == pos:
+                raise ValueError(f"Bad definition of {name!r}: {definition!r}")
+            pos = m.end()
+            if m["number"]:
+                factor *= Fraction(m["number"])
+            elif m["op"]:
+                sign = -1 if m["op"] == "/" else 1
+                continue
+            else:
+                terms.append((m["name"], sign * int(m["power"] or 1)))
+            sign = 1
+        dims = DIMENSIONLESS
+        for term, power in terms:
+            base = self._units.get(term)
+            if base is None:
+                raise ValueError(f"Unknown unit {term!r} in the definition of {name!r}")
+            factor *= self._exact[term] ** power
+            dims = multiply_units(Unit("", 1.0, dims, ()), power_unit(base, power)).dims
+        self._add(Unit(name, float(factor), dims, ((name, 1),)), factor)
+
+    def _add(self, unit: Unit, exact: Fraction):
+        name = unit.name
+        self._units[name] = unit
+        self._exact[name] = exact
+        group = self._groups.setdefault(unit.dims, [])
+        group.append(name)
+        # Nowa jednostka łączy się ze wszystkimi o tym samym wymiarze
+        for other in group:
+            ratio = exact / self._exact[other]
+            self._pairs[name, other] = float(ratio)
+            self._pairs[other, name] = float(1 / ratio)
+
+    def get(self, name: str) -> Unit | None:
+        if self._pending:
+            self._load()
+        return self._units.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def names(self) -> list[str]:
+        if self._pending:
+            self._load()
+        return list(self._units)
+
+    def factor(self, source: Unit, target: Unit) -> float:
+        """Multiply a value in ``source`` by this to get it in ``target``."""
+        try:
+            return self._pairs[source.name, target.name]
+        except KeyError:
+            pass
+        if source.dims != target.dims:
+            raise ValueError(f"Cannot convert {source.name} to {target.name}")
+        # Jednostki złożone (km/h) – liczymy raz i pamiętamy
+        factor = source.factor / target.factor
+        self._pairs[source.name, target.name] = factor
+        return factor
+
+
+_PREFIXES = {"k": "1e3", "M": "1e6", "G": "1e9", "c": "1e-2", "m": "1e-3", "u": "1e-6",
+             "n": "1e-9"}
+
+
+def _prefixed(unit: str, prefixes: str) -> list[tuple[str, str]]:
+    return [(p + unit, f"{_PREFIXES[p]} {unit}") for p in prefixes]
+
+
+def _builtin_units() -> list[tuple[str, str]]:
+    return [
+        # Długość, powierzchnia, objętość
+        *_prefixed("m", "kcmun"),
+        ("in", "0.0254 m"), ("ft", "12 in"), ("yd", "3 ft"), ("mi", "1760 yd"),
+        ("nmi", "1852 m"),
+        ("ha", "10000 m^2"), ("L", "0.001 m^3"), ("mL", "0.001 L"),
+        ("gal", "3.785411784 L"),
+        # Masa
+        ("g", "0.001 kg"), ("mg", "0.001 g"), ("t", "1000 kg"),
+        ("lb", "0.45359237 kg"), ("oz", "0.0625 lb"),
+        # Czas i prędkość
+        *_prefixed("s", "mun"),
+        ("min", "60 s"), ("h", "60 min"), ("d", "24 h"), ("wk", "7 d"),
+        ("yr", "365.25 d"),
+        ("mph", "mi/h"), ("kn", "nmi/h"),
+        # Siła, energia, moc, ciśnienie
+        ("N", "kg*m/s^2"), ("lbf", "4.4482216152605 N"),
+        ("J", "N*m"), *_prefixed("J", "kM"), ("cal", "4.184 J"), ("kcal", "1000 cal"),
+        ("Wh", "3600 J"), ("kWh", "1000 Wh"), ("MWh", "1000 kWh"),
+        ("BTU", "1055.05585262 J"),
+        ("W", "J/s"), *_prefixed("W", "kM"), ("hp", "745.69987158227022 W"),
+        ("Pa", "N/m^2"), *_prefixed("Pa", "kM"), ("bar", "100000 Pa"),
+        ("atm", "101325 Pa"),
+        ("psi", "lbf/in^2"),
+        # Elektryczność
+        ("mA", "0.001 A"), ("C", "A*s"), ("V", "W/A"), ("Ah", "3600 C"),
+        ("mAh", "0.001 Ah"),
+        # Dane
+        *_prefixed("bit", "kMG"), ("B", "8 bit"),
+        ("kB", "1000 B"), ("MB", "1000 kB"), ("GB", "1000 MB"), ("TB", "1000 GB"),
+        ("PB", "1000 TB"),
+        ("KiB", "1024 B"), ("MiB", "1024 KiB"), ("GiB", "1024 MiB"),
+        ("TiB", "1024 GiB"),
+    ]
+
+
+UNITS = UnitRegistry()
+UNITS.add_table(_builtin_units)
+
+
+# ─── Wielkość z jednostką ───────────────────────
+class Quantity:
+    """A float with a unit. Arithmetic checks dimensions; adding converts the
+    right operand to the left one's unit with one precomputed factor."""
+
+    __slots__ = ("value", "unit")
+
+    def __init__(self, value: float, unit: Unit):
+        self.value = value
+        self.unit = unit
+
+    @classmethod
+    def of(cls, name: str, value: float = 1.0,
+           registry: UnitRegistry = UNITS) -> "Quantity":
+        unit = registry.get(name)
+        if unit is None:
+            raise ValueError(f"Unknown unit {name!r}")
+        return cls(value, unit)
+
+    def to(self, target: Unit, registry: UnitRegistry = UNITS) -> "Quantity":
+        return Quantity(self.value * registry.factor(self.unit, target), target)
+
+    def _plain(self, other, verb: str):
+        raise ValueError(f"Cannot {verb} {self.unit.name} and a plain number")
+
+    def __add__(self, other):
+        if type(other) is Quantity:
+            factor = UNITS.factor(other.unit, self.unit)
+            return Quantity(self.value + other.value * factor, self.unit)
+        return self._plain(other, "add")
+
+    def __sub__(self, other):
+        if type(other) is Quantity:
+            factor = UNITS.factor(other.unit, self.unit)
+            return Quantity(self.value - other.value * factor, self.unit)
+        return self._plain(other, "subtract")
+
+    def __radd__(self, other):
+        return self._plain(other, "add")
+
+    def __rsub__(self, other):
+        return self._plain(other, "subtract")
+
+    def _product(self, other: "Quantity", sign: int):
+        unit = multiply_units(self.unit, other.unit, sign)
+        value = self.value * other.value if sign > 0 else self.value / other.value
+        if unit.dims == DIMENSIONLESS:
+            # km/m to już zwykła liczba
+            return value * unit.factor
+        return Quantity(value, unit)
+
+    def __mul__(self, other):
+        if type(other) is Quantity:
+            return self._product(other, 1)
+        return Quantity(self.value * other, self.unit)
+
+    def __rmul__(self, other):
+        return Quantity(other * self.value, self.unit)
+
+    def __truediv__(self, other):
+        if type(other) is Quantity:
+            return self._product(other, -1)
+        return Quantity(self.value / other, self.unit)
+
+    def __rtruediv__(self, other):
+        return Quantity(other / self.value, power_unit(self.unit, -1))
+
+    def __pow__(self, other):
+        if type(other) is Quantity or other != int(other):
+            raise ValueError(f"{self.unit.name} can only be raised to a whole number")
+        n = int(other)
+        if n == 0:
+            return 1.0
+        return Quantity(self.value ** n, power_unit(self.unit, n))
+
+    def __rpow__(self, other):
+        raise ValueError("An exponent cannot have a unit")
+
+    def __neg__(self):
+        return Quantity(-self.value, self.unit)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return Quantity(abs(self.value), self.unit)
+
+    def __eq__(self, other):
+        if type(other) is not Quantity:
+            return NotImplemented
+        return self.value == other.value and self.unit.name == other.unit.name
+
+    __hash__ = None
+
+    def __str__(self):
+        return f"{self.value} {self.unit.name}"
+
+    def __repr__(self):
+        return f"Quantity({self.value!r}, {self.unit.name!r})"
+
+
+# ─── Składnia przeliczenia ──────────────────────
+# "5 km + 300 m in mi", "60 km/h to m/s" – ostatnie " in " / " to ", za którym coś jest
+_CONVERSION = re.compile(r"(.*\S)\s+(?:in|to)\s+(\S.*?)\s*$", re.S)
+
+
+def split_conversion(text: str) -> tuple[str, str | None]:
+    """``(expression, target unit)``; target None without ``in`` / ``to``."""
+    m = _CONVERSION.match(text)
+    if m is None:
+        return text, None
+    return m.group(1), m.group(2)
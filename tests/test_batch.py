@@ -0,0 +1,62 @@
+import io
+import json
+import sys
+
+import pytest
+
+from src.calculator.__main__ import main
+from src.calculator.batch import chunked, evaluate_chunk, run_batch
+
+# ────────────────────────────────────────────────
+# Batch evaluation
+# ────────────────────────────────────────────────
+
+def test_chunked_splits_lazily():
+    assert list(chunked(iter("abcde"), 2)) == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_evaluate_chunk_lines_are_independent():
+    results = evaluate_chunk(["2 + 3", "Ans + 1", "", "1 / 0", "sin 90"])
+    assert results == [
+        ("5.0", None),
+        ("1.0", None),
+        ("", None),
+        ("", "Division by zero"),
+        ("1.0", None),
+    ]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_run_batch_keeps_input_order(workers):
+    lines = [f"{i} * 2" for i in range(250)]
+    results = list(run_batch(lines, workers=workers, chunk_size=7, max_in_flight=3))
+    assert [r for r, _ in results] == [str(i * 2.0) for i in range(250)]
+
+
+def test_run_batch_rejects_bad_chunk_size():
+    with pytest.raises(ValueError):
+        list(run_batch(["1"], chunk_size=0))
+
+
+def test_batch_command_plain(monkeypatch, capsys):
+    stdin = io.StringIO("1 + 1\nsin 1.5707963267948966\n2 +\n")
+    monkeypatch.setattr(sys, "stdin", stdin)
+    assert main(["batch", "--angle", "RAD"]) == 0
+    out, err = capsys.readouterr()
+    assert out.splitlines() == [
+        "2.0", "1.0", "Error: Unexpected end of expression at position 3",
+    ]
+    assert "3 expressions in" in err
+    assert "expr/s" in err
+
+
+def test_batch_command_jsonl_from_file(tmp_path, capsys):
+    source = tmp_path / "input.txt"
+    source.write_text("6 * 7\n5 / 0\n", encoding="utf-8")
+    argv = ["batch", str(source), "--format", "jsonl", "-j", "2", "--chunk-size", "1"]
+    assert main(argv) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert records == [
+        {"expr": "6 * 7", "result": "42.0"},
+        {"expr": "5 / 0", "error": "Division by zero"},
+    ]
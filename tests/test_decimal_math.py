@@ -0,0 +1,86 @@
+import math
+from decimal import Decimal, localcontext
+
+import pytest
+
+from src.calculator import decimal_math as dm
+
+PI_100 = (
+    "3.14159265358979323846264338327950288419716939937510"
+    "58209749445923078164062862089986280348253421170679"
+)
+
+
+def at(digits: int, func, *args, **kwargs):
+    with localcontext() as ctx:
+        ctx.prec = digits
+        return func(*args, **kwargs)
+
+
+# ────────────────────────────────────────────────
+# Stałe
+# ────────────────────────────────────────────────
+
+@pytest.mark.parametrize("digits", [15, 50, 100])
+def test_pi_matches_known_digits(digits):
+    assert at(digits, dm.pi) == at(digits, lambda: +Decimal(PI_100))
+
+
+def test_constants_are_cached_per_precision():
+    first = at(200, dm.pi)
+    assert at(200, dm.pi) is first
+    assert at(201, dm.pi) is not first
+    assert at(60, dm.e) == at(60, Decimal(1).exp)
+
+
+# ────────────────────────────────────────────────
+# Funkcje
+# ────────────────────────────────────────────────
+
+@pytest.mark.parametrize("x", ["0.5", "1", "-2.75", "10", "1e6"])
+def test_trig_agrees_with_float(x):
+    d, f = Decimal(x), float(x)
+    assert float(at(30, dm.sin, d)) == pytest.approx(math.sin(f), abs=1e-12)
+    assert float(at(30, dm.cos, d)) == pytest.approx(math.cos(f), abs=1e-12)
+    assert float(at(30, dm.atan, d)) == pytest.approx(math.atan(f), abs=1e-15)
+
+
+def test_high_precision_identities():
+    with localcontext() as ctx:
+        ctx.prec = 200
+        x = Decimal("0.7")
+        s, c = dm.sin_cos(x)
+        assert abs(s * s + c * c - 1) < Decimal("1e-195")
+        assert abs(dm.atan(Decimal(1)) * 4 - dm.pi()) < Decimal("1e-195")
+        assert abs(dm.asin(s) - x) < Decimal("1e-195")
+
+
+def test_degree_reduction_is_exact():
+    assert at(50, dm.sin, Decimal(30), degrees=True) == Decimal("0.5")
+    assert at(50, dm.cos, Decimal(90), degrees=True) == 0
+    assert at(50, dm.sin, Decimal(180), degrees=True) == 0
+    assert at(50, dm.tan, Decimal(45), degrees=True) == 1
+    assert at(50, dm.acos, Decimal("0.5"), degrees=True) == 60
+
+
+def test_cube_root_is_exact_for_cubes():
+    assert at(50, dm.cbrt, Decimal(27)) == 3
+    assert at(50, dm.cbrt, Decimal(-8)) == -2
+
+
+@pytest.mark.parametrize("func, x", [
+    (dm.sqrt, "-1"),
+    (dm.ln, "0"),
+    (dm.log10, "-5"),
+    (dm.asin, "1.5"),
+    (dm.acos, "-2"),
+])
+def test_domain_errors(func, x):
+    with pytest.raises(ValueError):
+        at(30, func, Decimal(x))
+
+
+@pytest.mark.parametrize("n", [10, 170, 1000, 12345])
+def test_stirling_factorial_matches_exact(n):
+    exact = Decimal(math.factorial(n))
+    assert at(40, dm.factorial, n) == at(40, lambda: +exact)
@@ -0,0 +1,110 @@
+import random
+import re
+
+import pytest
+
+from src.calculator.editor import EditorBuffer
+
+# ────────────────────────────────────────────────
+# Editor buffer
+# ────────────────────────────────────────────────
+
+def old_toggle_sign(expr: str) -> str:
+    # Dotychczasowa wersja z okna – wzorzec zachowania
+    m = re.search(r'(-?\d*\.?\d*)$', expr)
+    num, start = m.group(1), m.start(1)
+    return expr[:start] + (num[1:] if num.startswith('-') else '-' + num)
+
+
+def test_append_backspace_and_depth():
+    editor = EditorBuffer()
+    editor.append("sin(")
+    editor.append("30")
+    assert editor.text == "sin(30"
+    assert editor.depth == 1
+    editor.append("))")
+    assert editor.depth == -1
+    editor.backspace()
+    editor.backspace()
+    editor.backspace()
+    assert editor.text == "sin(3"
+    assert editor.depth == 1
+    editor.clear()
+    editor.backspace()
+    assert editor.text == "" and editor.depth == 0
+
+
+@pytest.mark.parametrize("text, token", [
+    ("2+31.5", "31.5"),
+    ("sin", "sin"),
+    ("2*Ans", "Ans"),
+    ("3x", "x"),
+    ("(", "("),
+    ("x²", "²"),
+    ("", ""),
+])
+def test_last_token(text, token):
+    assert EditorBuffer(text).last_token() == token
+
+
+@pytest.mark.parametrize("text, toggled", [
+    ("42", "-42"),
+    ("-42", "42"),
+    ("2+3.5", "2+-3.5"),
+    ("5-3", "53"),
+    ("1.2.3", "1.-2.3"),
+    ("2*(", "2*(-"),
+    ("", "-"),
+])
+def test_toggle_sign(text, toggled):
+    editor = EditorBuffer(text)
+    editor.toggle_sign()
+    assert editor.text == toggled == old_toggle_sign(text)
+    assert editor.last_token() == EditorBuffer(toggled).last_token()
+
+
+def test_take_changes_returns_only_the_edited_tail():
+    editor = EditorBuffer("12*(3")
+    assert editor.take_changes() is None          # load(): widok już to pokazuje
+    editor.append("4")
+    editor.append("+5")
+    assert editor.take_changes() == (5, "4+5")
+    editor.backspace()
+    editor.backspace()
+    editor.toggle_sign()
+    assert editor.take_changes() == (4, "-34")
+    assert editor.take_changes() is None
+    editor.set("7")
+    assert editor.take_changes() == (0, "7")
+
+
+def test_random_edits_match_recomputing_everything():
+    rng = random.Random(3)
+    pieces = ["1", "2", ".", "(", ")", "+", "-", "sin(", "Ans", "x²", "*10^", " "]
+    editor, expected, shown = EditorBuffer(), "", ""
+    for _ in range(3000):
+        op = rng.random()
+        if op < 0.6:
+            piece = rng.choice(pieces)
+            editor.append(piece)
+            expected += piece
+        elif op < 0.85:
+            editor.backspace()
+            expected = expected[:-1]
+        elif op < 0.98:
+            editor.toggle_sign()
+            expected = old_toggle_sign(expected)
+        else:
+            editor.clear()
+            expected = ""
+        if rng.random() < 0.3:
+            changes = editor.take_changes()
+            if changes is not None:
+                shown = shown[:changes[0]] + changes[1]
+        assert editor.depth == expected.count("(") - expected.count(")")
+        assert editor.last_token() == EditorBuffer(expected).last_token()
+    assert editor.text == expected
+    changes = editor.take_changes()
+    if changes is not None:
+        shown = shown[:changes[0]] + changes[1]
+    assert shown == expected
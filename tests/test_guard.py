@@ -0,0 +1,126 @@
+import sys
+import threading
+
+import pytest
+
+from src.calculator import metrics
+from src.calculator.guard import (
+    EvaluationCancelled,
+    EvaluationTimeout,
+    GuardedEvaluator,
+)
+from src.calculator.logic import MAX_EXACT_BITS, Evaluator, ParseError
+
+
+@pytest.fixture(scope="module")
+def guard():
+    with GuardedEvaluator(timeout=0.5, max_memory=64 * 1024 * 1024) as g:
+        yield g
+
+
+def test_results_and_ans_come_back(guard):
+    ev = Evaluator()
+    assert guard.compute("2 + 3", ev) == 5.0
+    assert guard.compute("Ans * 2", ev) == 10.0
+    assert ev.ans == 10.0
+    exact = Evaluator(number_mode="EXACT")
+    assert str(guard.compute("1/3 + 1/6", exact)) == "1/2"
+
+
+def test_solve_and_integrate_in_the_worker(guard):
+    ev = Evaluator()
+    result = guard.compute_command("solve(x^2 - 2, 1)", ev)
+    assert result.value == pytest.approx(2 ** 0.5)
+    assert result.evaluations > 0
+    assert ev.ans == result.value
+    assert guard.compute("integrate(x, 0, 2)", ev) == pytest.approx(2.0)
+    assert ev.ans == pytest.approx(2.0)
+
+
+def test_quantities_come_back(guard):
+    ev = Evaluator()
+    result = guard.compute("5 km + 300 m in mi", ev)
+    assert result.unit.name == "mi"
+    assert ev.ans == result.value == pytest.approx(5300 / 1609.344)
+
+
+def test_errors_keep_their_type(guard):
+    ev = Evaluator()
+    with pytest.raises(ParseError) as info:
+        guard.compute("2 +", ev)
+    assert info.value.pos == 3
+    assert guard.evaluate("1/0", ev) == "Division by zero"
+    assert "too large" in guard.evaluate("(10^6)!", ev)
+
+
+def test_timeout_kills_the_worker(guard):
+    # 200000! przechodzi przez limit kosztu
+    ev = Evaluator(max_bits=MAX_EXACT_BITS)
+    ev.ans = 5.0
+    guard.compute("1", Evaluator())             # proces roboczy już działa
+    restarts = guard.restarts
+    guard.timeout = 0.02
+    try:
+        with pytest.raises(EvaluationTimeout):
+            guard.compute("200000!", ev)
+    finally:
+        guard.timeout = 0.5
+    assert ev.ans == 5.0
+    assert guard.restarts == restarts + 1
+    # Następne obliczenie dostaje nowy proces roboczy
+    assert guard.compute("Ans + 1", ev) == 6.0
+
+
+def test_cancel_from_another_thread(guard):
+    ev = Evaluator(max_bits=MAX_EXACT_BITS)
+    guard.compute("1", ev)
+    timer = threading.Timer(0.05, guard.cancel)
+    timer.start()
+    timeout, guard.timeout = guard.timeout, None
+    try:
+        with pytest.raises(EvaluationCancelled):
+            guard.compute("200000!", ev)
+    finally:
+        guard.timeout = timeout
+        timer.join()
+    # Anulowanie bezczynnego procesu nie psuje następnego obliczenia
+    guard.cancel()
+    assert guard.compute("2 * 3", ev) == 6.0
+
+
+def test_worker_metrics_come_back(guard):
+    metrics.reset()
+    metrics.enable(slow_threshold=10.0)
+    try:
+        ev = Evaluator(max_bits=MAX_EXACT_BITS)
+        guard.compute("2 * 3", ev)
+        assert guard.evaluate("1/0", ev) == "Division by zero"
+        guard.timeout = 0.02
+        try:
+            with pytest.raises(EvaluationTimeout):
+                guard.compute("200000!", ev)
+        finally:
+            guard.timeout = 0.5
+        data = metrics.snapshot()
+    finally:
+        metrics.disable()
+        metrics.reset()
+    assert data["stages"]["evaluate"]["count"] == 1
+    assert data["stages"]["total"]["count"] == 3
+    assert data["errors"] == {"division_by_zero": 1, "timeout": 1}
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="RLIMIT_AS")
+def test_memory_budget():
+    ev = Evaluator(number_mode="EXACT", max_bits=1 << 40)
+    expression = " * ".join(["2^2000000"] * 16)      # ~4 MB
+    with GuardedEvaluator(timeout=30, max_memory=2 * 1024 * 1024) as g:
+        assert g.evaluate(expression, ev) == "Error: Out of memory"
+        assert g.compute("1 + 1", Evaluator()) == 2.0
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        GuardedEvaluator(timeout=0)
+    with pytest.raises(ValueError):
+        GuardedEvaluator(max_memory=-1)
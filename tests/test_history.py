@@ -0,0 +1,455 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src.calculator import history
+from src.calculator.history import (
+    HistoryChanges,
+    HistoryFollower,
+    HistoryPager,
+    HistoryRecord,
+    HistoryStore,
+    HistoryWriter,
+    migrate_legacy,
+)
+
+
+def record(i: int) -> HistoryRecord:
+    return HistoryRecord(f"2026-01-01 00:00:{i % 60:02d}", f"{i} + 1", str(i + 1))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(tmp_path / "history.jsonl")
+
+
+# ────────────────────────────────────────────────
+# Append + tail
+# ────────────────────────────────────────────────
+
+def test_append_and_tail(store):
+    for i in range(10):
+        store.append(record(i))
+    assert store.tail(3) == [record(7), record(8), record(9)]
+    assert store.tail(100) == [record(i) for i in range(10)]
+    assert list(store) == [record(i) for i in range(10)]
+
+
+def test_append_writes_one_line_per_record(store):
+    store.append_many([record(1), record(2)])
+    lines = store.path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["e"] for line in lines] == ["1 + 1", "2 + 1"]
+
+
+def test_tail_of_missing_file_is_empty(store):
+    assert store.tail(5) == []
+    assert list(store) == []
+
+
+def test_record_format_matches_history_panel():
+    assert record(5).format() == "[2026-01-01 00:00:05] 5 + 1 = 6"
+
+
+def test_tail_reads_across_blocks_without_parsing_everything(store, monkeypatch):
+    monkeypatch.setattr(HistoryStore, "BLOCK_SIZE", 256)
+    store.append_many(record(i) for i in range(2000))
+
+    calls = []
+    real_loads = history.json.loads
+    monkeypatch.setattr(history.json, "loads",
+                        lambda s: calls.append(s) or real_loads(s))
+
+    assert store.tail(25) == [record(i) for i in range(1975, 2000)]
+    assert len(calls) == 25
+
+
+def test_read_before_pages_backwards(store, monkeypatch):
+    monkeypatch.setattr(HistoryStore, "BLOCK_SIZE", 100)
+    store.append_many(record(i) for i in range(30))
+
+    page, offset = store.read_before(None, 12)
+    assert page == [record(i) for i in range(18, 30)]
+    page, offset = store.read_before(offset, 12)
+    assert page == [record(i) for i in range(6, 18)]
+    page, offset = store.read_before(offset, 12)
+    assert page == [record(i) for i in range(6)]
+    assert offset == 0
+
+
+def test_torn_last_line_is_repaired_on_open(tmp_path):
+    path = tmp_path / "history.jsonl"
+    store = HistoryStore(path)
+    store.append(record(1))
+    with path.open("ab") as f:
+        f.write(b'{"t": "2026-01-01 00:00:00", "e": "bro')
+
+    store = HistoryStore(path)
+    store.append(record(2))
+    assert store.tail(10) == [record(1), record(2)]
+
+
+# ────────────────────────────────────────────────
+# Clear + compaction
+# ────────────────────────────────────────────────
+
+def test_clear_hides_older_records(store):
+    store.append_many([record(1), record(2)])
+    store.clear()
+    store.append(record(3))
+    assert store.tail(10) == [record(3)]
+    assert list(store) == [record(3)]
+    assert store.read_before(None, 10) == ([record(3)], 0)
+
+
+def test_compaction_drops_dead_data(tmp_path):
+    store = HistoryStore(tmp_path / "history.jsonl", compact_threshold=200)
+    store.append_many(record(i) for i in range(3))
+    store.clear()                       # < 200 bytes dead – no compaction yet
+    assert store.size() > 0
+    store.append_many(record(i) for i in range(10))
+    size_before = store.size()
+    store.clear()                       # now over the threshold
+    assert store.size() < size_before
+    store.append(record(42))
+    assert store.tail(10) == [record(42)]
+
+
+def test_compact_keeps_live_records(store):
+    store.append_many([record(1), record(2)])
+    store.clear()
+    store.append_many([record(3), record(4)])
+    store.compact()
+    assert store.path.read_text(encoding="utf-8").count("\n") == 2
+    assert store.tail(10) == [record(3), record(4)]
+
+
+# ────────────────────────────────────────────────
+# Migration from history.json
+# ────────────────────────────────────────────────
+
+def test_migrate_legacy_history(tmp_path, store):
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps({
+        "entries": [
+            "[2025-12-31 23:59:59] 2 + 2 = 4",
+            "garbage",
+            "[2026-01-01 00:00:00] π = 3.14159",
+        ],
+        "last_updated": "2026-01-01T00:00:00",
+    }), encoding="utf-8")
+
+    assert migrate_legacy(legacy, store) == 2
+    assert not legacy.exists()
+    assert (tmp_path / "history.json.bak").exists()
+    assert store.tail(10) == [
+        HistoryRecord("2025-12-31 23:59:59", "2 + 2", "4"),
+        HistoryRecord("2026-01-01 00:00:00", "π", "3.14159"),
+    ]
+
+
+def test_migrate_legacy_runs_once(tmp_path, store):
+    legacy = tmp_path / "history.json"
+    legacy.write_text("{}", encoding="utf-8")
+    store.append(record(1))
+    assert migrate_legacy(legacy, store) == 0
+    assert legacy.exists()
+
+
+class SlowWriteStore(HistoryStore):
+    def _write(self, data):
+        time.sleep(0.05)                # okno, w którym drugie okno też startuje
+        return super()._write(data)
+
+
+def test_two_instances_migrate_once(tmp_path):
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps({"entries": [f"[2026-01-01 00:00:0{i}] {i} = {i}"
+                                              for i in range(5)]}), encoding="utf-8")
+    path = tmp_path / "history.jsonl"
+    barrier = threading.Barrier(2)
+    results = []
+
+    def start():
+        store = SlowWriteStore(path)
+        barrier.wait()
+        results.append(migrate_legacy(legacy, store))
+
+    threads = [threading.Thread(target=start) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [0, 5]
+    assert len(HistoryStore(path).tail(10)) == 5
+
+
+# ────────────────────────────────────────────────
+# Background writer
+# ────────────────────────────────────────────────
+
+class SlowStore(HistoryStore):
+    """Simulates a slow (e.g. network) filesystem."""
+
+    delay = 0.2
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.writes = []
+
+    def append_many(self, records):
+        time.sleep(self.delay)
+        records = list(records)
+        self.writes.append(len(records))
+        super().append_many(records)
+
+    def clear(self):
+        time.sleep(self.delay)
+        super().clear()
+
+
+def test_writer_calls_return_within_latency_budget(tmp_path):
+    store = SlowStore(tmp_path / "history.jsonl")
+    writer = HistoryWriter(store, flush_interval=0.05)
+    budget = 0.005
+
+    for i in range(200):
+        start = time.perf_counter()
+        writer.append(record(i))
+        assert time.perf_counter() - start < budget
+    start = time.perf_counter()
+    writer.clear()
+    writer.append(record(999))
+    assert time.perf_counter() - start < budget
+
+    assert writer.flush(timeout=10)
+    writer.close()
+    assert store.tail(10) == [record(999)]
+
+
+def test_writer_coalesces_bursts(tmp_path):
+    store = SlowStore(tmp_path / "history.jsonl")
+    writer = HistoryWriter(store, flush_interval=0.1)
+    for i in range(50):
+        writer.append(record(i))
+    writer.close()
+    assert sum(store.writes) == 50
+    assert len(store.writes) <= 2
+    assert store.tail(100) == [record(i) for i in range(50)]
+
+
+def test_writer_flushes_after_interval(tmp_path):
+    store = HistoryStore(tmp_path / "history.jsonl")
+    writer = HistoryWriter(store, flush_interval=0.01)
+    writer.append(record(1))
+    deadline = time.monotonic() + 5
+    while not store.tail(1) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.tail(1) == [record(1)]
+    writer.close()
+
+
+# ────────────────────────────────────────────────
+# Paged history window
+# ────────────────────────────────────────────────
+
+def test_rows_after_reads_forward_from_offset(store):
+    store.append_many(record(i) for i in range(10))
+    rows, _ = store.rows_before(None, 4)
+    after = store.rows_after(rows[0].start, 3)
+    assert [row.record for row in after] == [record(6), record(7), record(8)]
+    assert after[0].end == after[1].start
+
+
+def test_pager_starts_with_latest_page(store):
+    store.append_many(record(i) for i in range(1000))
+    pager = HistoryPager(store, page_size=10, max_pages=3)
+    assert pager.load_latest() == [record(i) for i in range(990, 1000)]
+    assert pager.has_older and not pager.has_newer
+
+
+def test_pager_window_stays_bounded_while_scrolling(store):
+    store.append_many(record(i) for i in range(1000))
+    pager = HistoryPager(store, page_size=10, max_pages=3)
+    pager.load_latest()
+
+    for _ in range(10):
+        added, dropped = pager.load_older()
+        assert len(added) == 10
+        assert len(pager.rows) <= 30
+    assert pager.records == [record(i) for i in range(890, 920)]
+    assert pager.has_newer
+
+    added, dropped = pager.load_newer()
+    assert added == [record(i) for i in range(920, 930)]
+    assert dropped == 10
+    assert pager.records[0] == record(900)
+
+    while pager.has_newer:
+        pager.load_newer()
+    assert pager.records[-1] == record(999)
+
+
+def test_pager_reaches_oldest_page(store):
+    store.append_many(record(i) for i in range(25))
+    pager = HistoryPager(store, page_size=10, max_pages=5)
+    pager.load_latest()
+    while pager.has_older:
+        pager.load_older()
+    assert pager.records == [record(i) for i in range(25)]
+
+
+def test_pager_syncs_session_rows_before_trimming(store):
+    writer = HistoryWriter(store, flush_interval=10)
+    pager = HistoryPager(store, page_size=5, max_pages=2, flush=writer.flush)
+    store.append_many(record(i) for i in range(20))
+    pager.load_latest()
+
+    for i in range(20, 23):
+        pager.append(record(i))
+        writer.append(record(i))
+    assert pager.rows[-1].start is None
+
+    pager.load_older()
+    assert all(row.start is not None for row in pager.rows)
+    assert pager.has_newer
+
+    while pager.has_newer:
+        pager.load_newer()
+    assert pager.records[-1] == record(22)
+    writer.close()
+
+
+def test_pager_append_and_clear(store):
+    pager = HistoryPager(store, page_size=2, max_pages=2)
+    pager.load_latest()
+    dropped = [pager.append(record(i)) for i in range(6)]
+    assert dropped == [0, 0, 0, 0, 1, 1]
+    assert pager.has_older
+    pager.clear()
+    assert pager.records == [] and not pager.has_older
+
+
+# ────────────────────────────────────────────────
+# Several instances sharing one file
+# ────────────────────────────────────────────────
+
+def test_concurrent_writers_and_compaction_lose_nothing(tmp_path):
+    path = tmp_path / "history.jsonl"
+    stop = threading.Event()
+
+    def write(n):
+        # Osobny obiekt na wątek – jak osobne okna i procesy
+        own = HistoryStore(path)
+        for i in range(n, n + 150, 3):
+            own.append_many(record(j) for j in range(i, i + 3))
+
+    def compact():
+        other = HistoryStore(path)
+        while not stop.is_set():
+            other.compact()
+
+    compactor = threading.Thread(target=compact)
+    compactor.start()
+    writers = [threading.Thread(target=write, args=(n,)) for n in range(0, 600, 150)]
+    for t in writers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    compactor.join()
+    records = HistoryStore(path).read_all()
+    records.sort(key=lambda r: int(r.result))
+    assert records == [record(i) for i in range(600)]
+
+
+def store_rows(path, offset):
+    return [row.record for row in HistoryStore(path).rows_after(offset, 10)]
+
+
+def test_follower_reads_only_foreign_appends(tmp_path):
+    path = tmp_path / "history.jsonl"
+    mine, theirs = HistoryStore(path), HistoryStore(path)
+    theirs.append(record(0))
+    follower = HistoryFollower(mine)
+    assert follower.poll() == HistoryChanges([])
+
+    mine.append(record(1))
+    theirs.append_many([record(2), record(3)])
+    mine.append(record(4))
+    changes = follower.poll()
+    assert [row.record for row in changes.rows] == [record(2), record(3)]
+    assert not changes.cleared and not changes.reset
+    # Offsety wierszy pasują do pliku
+    assert store_rows(path, changes.rows[0].start) == [record(2), record(3), record(4)]
+    assert follower.offset == path.stat().st_size
+    assert follower.poll() == HistoryChanges([])
+
+
+def test_follower_waits_for_complete_lines(tmp_path):
+    path = tmp_path / "history.jsonl"
+    store = HistoryStore(path)
+    follower = HistoryFollower(store)
+    line = json.dumps({"t": "2026-01-01 00:00:00", "e": "1 + 1", "r": "2"}).encode()
+    with path.open("ab") as f:
+        f.write(line[:10])
+    assert follower.poll() == HistoryChanges([])
+    with path.open("ab") as f:
+        f.write(line[10:] + b"\n")
+    assert [row.record.result for row in follower.poll().rows] == ["2"]
+
+
+def test_follower_sees_foreign_clear_and_compaction(tmp_path):
+    path = tmp_path / "history.jsonl"
+    mine, theirs = HistoryStore(path), HistoryStore(path, compact_threshold=1 << 30)
+    mine.append_many(record(i) for i in range(5))
+    follower = HistoryFollower(mine)
+
+    theirs.append(record(5))
+    theirs.clear()
+    theirs.append(record(6))
+    changes = follower.poll()
+    assert changes.cleared and [row.record for row in changes.rows] == [record(6)]
+
+    theirs.compact()
+    assert follower.poll().reset
+    theirs.append(record(7))
+    assert [row.record for row in follower.poll().rows] == [record(7)]
+    # Obcięty plik też wymusza ponowne wczytanie
+    path.write_bytes(b"")
+    assert follower.poll().reset
+
+
+def test_unchanged_file_costs_one_stat(tmp_path, monkeypatch):
+    store = HistoryStore(tmp_path / "history.jsonl")
+    store.append_many(record(i) for i in range(1000))
+    follower = HistoryFollower(store)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file opened")
+
+    monkeypatch.setattr(type(store.path), "open", fail)
+    for _ in range(100):
+        assert follower.poll() == HistoryChanges([])
+
+
+def test_pager_follows_other_instances(tmp_path):
+    path = tmp_path / "history.jsonl"
+    mine, theirs = HistoryStore(path), HistoryStore(path)
+    theirs.append_many(record(i) for i in range(8))
+    pager = HistoryPager(mine, page_size=3, max_pages=2)
+    pager.load_latest()
+    pager.append(record(8))
+    mine.append(record(8))
+    theirs.append_many([record(9), record(10), record(11)])
+
+    changes, dropped = pager.follow()
+    assert [row.record for row in changes.rows] == [record(9), record(10), record(11)]
+    assert dropped == 1 and pager.has_older
+    assert pager.records == [record(i) for i in range(6, 12)]
+
+    theirs.clear()
+    changes, _ = pager.follow()
+    assert changes.cleared
+    assert pager.load_latest() == []
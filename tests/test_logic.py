@@ -1,6 +1,34 @@
 import pytest
 import math
-from src.calculator.logic import evaluate_expression, set_angle_mode
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from fractions import Fraction
+from src.calculator import logic
+from src.calculator.logic import (
+    Evaluator,
+    IncrementalParser,
+    ParseError,
+    ProgramCache,
+    add_spaces,
+    cache_info,
+    clear_cache,
+    compile_expression,
+    evaluate_expression,
+    evaluate_rpn,
+    evaluate_tree,
+    evaluate_vectorized,
+    exact_factorial,
+    explain,
+    format_number,
+    integrate,
+    optimize,
+    parse_command,
+    set_angle_mode,
+    set_cache_size,
+    shunting_yard,
+    solve,
+    tokenize,
+)
 
 
 # ────────────────────────────────────────────────
@@ -117,4 +145,788 @@ def test_error_cases(expr, expected_substring):
     if expected_substring:
         assert expected_substring in result, f"Expected '{expected_substring}' in '{result}'"
     else:
-        assert result == "", f"Expected empty string, got '{result}'"
\ No newline at end of file
+        assert result == "", f"Expected empty string, got '{result}'"
+
+# ────────────────────────────────────────────────
+# Compiled program cache
+# ────────────────────────────────────────────────
+
+def test_cache_hits_on_repeated_and_normalized_expressions():
+    clear_cache()
+    evaluate_expression("2 + 3")
+    evaluate_expression("2 + 3")
+    evaluate_expression("  2   +  3 ")
+    info = cache_info()
+    assert info["misses"] == 1
+    assert info["hits"] == 2
+    assert info["size"] == 1
+
+
+def test_cache_stores_program_not_value():
+    clear_cache()
+    evaluate_expression("3")
+    assert evaluate_expression("Ans + 1") == "4.0"
+    assert evaluate_expression("Ans + 1") == "5.0"
+
+    set_angle_mode("DEG")
+    assert_result_close(evaluate_expression("sin 90"), 1.0)
+    set_angle_mode("RAD")
+    assert_result_close(evaluate_expression("sin 90"), math.sin(90))
+    set_angle_mode("DEG")
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ProgramCache(maxsize=2)
+    cache.get("1 + 1")
+    cache.get("2 + 2")
+    cache.get("1 + 1")          # 1 + 1 becomes most recent
+    cache.get("3 + 3")          # evicts 2 + 2
+    info = cache.info()
+    assert info["evictions"] == 1
+    assert info["size"] == 2
+
+    cache.get("2 + 2")
+    assert cache.info()["misses"] == 4
+
+
+def test_cache_resize_and_clear():
+    set_cache_size(1)
+    try:
+        evaluate_expression("1 + 2")
+        evaluate_expression("2 + 3")
+        assert cache_info()["size"] == 1
+        clear_cache()
+        assert cache_info() == {
+            "hits": 0, "misses": 0, "evictions": 0, "size": 0, "maxsize": 1,
+        }
+    finally:
+        set_cache_size(256)
+
+    with pytest.raises(ValueError):
+        ProgramCache(maxsize=-1)
+
+
+# ────────────────────────────────────────────────
+# Lexer
+# ────────────────────────────────────────────────
+
+def test_tokenize_emits_typed_tokens():
+    tokens = tokenize("sin(π) + 2.5!")
+    assert [(t.kind, t.value, t.pos) for t in tokens] == [
+        ("function", "sin", 0),
+        ("paren", "(", 3),
+        ("constant", "π", 4),
+        ("paren", ")", 5),
+        ("operator", "+", 7),
+        ("number", "2.5", 9),
+        ("operator", "!", 12),
+    ]
+
+
+@pytest.mark.parametrize("expr, expected", [
+    ("2π",              "2 * π"),
+    ("3(4)",            "3 * ( 4 )"),
+    ("(1+2)(3+4)",      "( 1 + 2 ) * ( 3 + 4 )"),
+    ("2sin 30",         "2 * sin 30"),
+    ("2Ans",            "2 * Ans"),
+    ("5x²",             "5 x²"),
+    ("-2^2",            "- 2 ^ 2"),
+])
+def test_tokenize_implicit_multiplication_and_unary_minus(expr, expected):
+    values = ("-" if t.value == "neg" else t.value for t in tokenize(expr))
+    assert " ".join(values) == expected
+
+
+@pytest.mark.parametrize("expr, expected", [
+    ("-2^2",            "-4.0"),
+    ("2^-1",            "0.5"),
+    ("10 - -2",         "12.0"),
+    ("(1+2)(3+4)",      "21.0"),
+    ("1e3 + 1",         "1001.0"),
+])
+def test_unary_minus_and_implicit_multiplication_values(expr, expected):
+    assert evaluate_expression(expr) == expected
+
+
+@pytest.mark.parametrize("expr, expected", [
+    ("SIN(30)",         "sin ( 30 )"),
+    ("Log 100 + LN e",  "log 100 + ln e"),
+    ("2ANS",            "2 * Ans"),
+    ("3X²",             "3 x²"),
+])
+def test_function_and_constant_names_ignore_case(expr, expected):
+    assert add_spaces(expr) == expected
+    assert Evaluator().compute(expr) == Evaluator().compute(expected)
+
+
+def test_variables_stay_case_sensitive():
+    assert compile_expression("x + X").variables == ("x", "X")
+
+
+@pytest.mark.parametrize("expr, pos", [
+    ("2 + #",           4),
+    ("2 * * 3",         4),
+    ("(2 + 3",          0),
+    ("2 + 3)",          5),
+    ("2 +",             3),
+])
+def test_tokenize_reports_error_position(expr, pos):
+    with pytest.raises(ParseError) as exc:
+        tokenize(expr)
+    assert exc.value.pos == pos
+    assert f"position {pos}" in str(exc.value)
+
+
+# ────────────────────────────────────────────────
+# Compiled expressions
+# ────────────────────────────────────────────────
+
+@pytest.mark.parametrize("expr", [
+    "2 + 3 * 4",
+    "2 ^ 3 ^ 2",
+    "0.1 + 0.2",
+    "-2^2 + 10 / 4",
+    "sin 30 + cos(60) * tan 45",
+    "asin 0.5 - acos 0.5 + atan 1",
+    "√16 + ³√27 + x² 5 + x³ 2 + 25 % + 1/x 8",
+    "5 ! / 3!",
+    "ln e + log 100 + exp 1",
+    "2π(1 + e)",
+    "((((1 + 2) * 3) - 4) / 5) ^ 0.5",
+    "1e400 - 1",
+])
+def test_compiled_matches_interpreter(expr):
+    set_angle_mode("DEG")
+    expected = evaluate_rpn(shunting_yard(expr))
+    actual = compile_expression(expr).compile()()
+    assert actual == expected
+    assert type(actual) is type(expected)
+
+
+@pytest.mark.parametrize("expr", [
+    "(-2)^Ans", "(-2)^x", "(-0.5)^Ans * (-3)", "2 - (-2)^3",
+])
+def test_negative_literals_survive_compilation(expr):
+    ev = Evaluator()
+    results = []
+    for _ in range(logic.COMPILE_THRESHOLD + 2):
+        ev.ans = 2.0
+        results.append(ev.compute(expr, {"x": 3.0} if "x" in expr else None))
+    assert len(set(results)) == 1
+    constants = {**logic.CONSTANTS, "Ans": 2.0}
+    expected = evaluate_rpn(shunting_yard(expr), {"x": 3.0}, constants=constants)
+    assert results[0] == expected
+
+
+def test_compiled_reads_ans_at_call_time():
+    program = compile_expression("Ans * 2").compile()
+    evaluate_expression("21")
+    assert program() == 42.0
+    evaluate_expression("5")
+    assert program() == 10.0
+
+
+def test_compiled_handles_deep_nesting():
+    expr = "(" * 500 + "1" + " + 1)" * 500
+    assert compile_expression(expr).compile()() == 501.0
+
+
+@pytest.mark.parametrize("expr, error", [
+    ("1 / 0",           ZeroDivisionError),
+    ("√ -1",            ValueError),
+    ("2.5 !",           ValueError),
+])
+def test_compiled_raises_like_interpreter(expr, error):
+    with pytest.raises(error):
+        evaluate_rpn(shunting_yard(expr))
+    with pytest.raises(error):
+        compile_expression(expr).compile()()
+
+
+def test_programs_compile_after_first_reuse():
+    clear_cache()
+    program = compile_expression("3 * 7 + 1")
+    assert not program.compiled
+    assert program() == 22.0
+    assert not program.compiled
+    assert program() == 22.0
+    assert program.compiled
+    assert "return" in program.source
+
+
+# ────────────────────────────────────────────────
+# Optimizer
+# ────────────────────────────────────────────────
+
+def operators(expr):
+    nodes = optimize(shunting_yard(expr)).nodes
+    return [node.value for node in nodes if node.kind == "operator"]
+
+
+def test_constant_subtrees_are_folded():
+    assert operators("2^10 + 3! * (π - π)") == []
+    assert optimize(shunting_yard("2^10 + 3!")).nodes[-1].value == 1030.0
+
+
+def test_ans_variables_and_angle_functions_are_not_folded():
+    assert operators("Ans + 1") == ["+"]
+    assert operators("x * (2 + 3)") == ["*"]
+    assert operators("sin(π / 4)") == ["sin"]
+
+
+def test_errors_are_not_folded():
+    assert operators("1 / 0") == ["/"]
+    assert operators("√ -1") == ["√"]
+
+
+def test_identical_subexpressions_share_one_node():
+    assert operators("sin(π/4)*Ans + sin(π/4)*(Ans+1)") == ["sin", "*", "+", "*", "+"]
+    assert operators("(x + 1) * (1 + x)") == ["+", "*"]
+    # Odejmowanie nie jest przemienne
+    assert operators("(x - 1) * (1 - x)") == ["-", "-", "*"]
+
+
+def test_explain_lists_computed_nodes():
+    assert explain("(x + 1) * (x + 1)") == "t2 = x + 1.0\nt3 = t2 * t2"
+    assert explain("2 * 3") == "6.0"
+
+
+@pytest.mark.parametrize("expr", [
+    "sin(π/4)*Ans + sin(π/4)*(Ans+1)",
+    "(2 + 3)! - 5! + √(4^2 + 3^2)",
+    "-(1 + 2) * -(2 + 1) + 1e400 - 1e400",
+    "ln e + log 100 + exp 1 + 25 %",
+])
+def test_optimized_tree_matches_interpreter(expr):
+    set_angle_mode("DEG")
+    expected = evaluate_rpn(shunting_yard(expr))
+    tree = optimize(shunting_yard(expr))
+    for actual in (evaluate_tree(tree), compile_expression(expr).compile()()):
+        assert actual == expected or (math.isnan(actual) and math.isnan(expected))
+
+
+# ────────────────────────────────────────────────
+# Exact number mode
+# ────────────────────────────────────────────────
+
+@pytest.mark.parametrize("expr, expected", [
+    ("1/3 * 3",             1),
+    ("0.1 + 0.2",           Fraction(3, 10)),
+    ("50!/(25!*25!)",       126410606437752),
+    ("2^100",               2 ** 100),
+    ("2^-2",                Fraction(1, 4)),
+    ("8^(2/3)",             4),
+    ("√(9/4) + ³√-27",      Fraction(-3, 2)),
+    ("25 % + 1/x 4",        Fraction(1, 2)),
+    ("1e400 / 1e399",       10),
+])
+def test_exact_mode_keeps_integers_and_fractions(expr, expected):
+    ev = Evaluator(number_mode="EXACT")
+    for _ in range(3):  # interpreter, then the compiled program
+        result = ev.compute(expr)
+        assert result == expected
+        assert type(result) is type(expected)
+
+
+def test_exact_mode_falls_back_to_float_for_transcendentals():
+    ev = Evaluator(number_mode="EXACT")
+    assert ev.compute("√2") == math.sqrt(2)
+    assert ev.compute("sin 30 + 1/2") == pytest.approx(1.0)
+    assert isinstance(ev.compute("ln e + 1"), float)
+
+
+@pytest.mark.parametrize("expr, expected_substring", [
+    ("1/0",         "Division by zero"),
+    ("0^-1",        "Division by zero"),
+    ("2.5!",        "Factorial"),
+    ("2^10^10",     "Error"),
+])
+def test_exact_mode_errors(expr, expected_substring):
+    assert expected_substring in Evaluator(number_mode="EXACT").evaluate(expr)
+
+
+def test_exact_mode_is_cached_separately():
+    clear_cache()
+    exact, flt = Evaluator(number_mode="EXACT"), Evaluator()
+    assert exact.compute("1/4") == Fraction(1, 4)
+    assert flt.compute("1/4") == 0.25
+    assert cache_info()["size"] == 2
+
+
+def test_exact_factorial_reuses_recent_results():
+    assert exact_factorial(300) == math.factorial(300)
+    assert exact_factorial(310) == math.factorial(310)
+    assert exact_factorial(Fraction(5)) == 120
+    with pytest.raises(ValueError):
+        exact_factorial(-1)
+
+
+# ────────────────────────────────────────────────
+# Cost limits
+# ────────────────────────────────────────────────
+
+@pytest.mark.parametrize("mode, expr", [
+    ("FLOAT", "20!^20!"),
+    ("FLOAT", "(10^6)!"),
+    ("FLOAT", "1e300!"),
+    ("EXACT", "1000!^1000!"),
+    ("EXACT", "(2^4000000)x³"),
+    ("EXACT", "((3^500000)x³)x³"),
+])
+def test_pathological_expressions_are_rejected_quickly(mode, expr):
+    ev = Evaluator(number_mode=mode)
+    with pytest.raises(OverflowError):
+        ev.compute(expr)
+    assert "too large" in ev.evaluate(expr)
+
+
+def test_estimate_bits():
+    assert logic.estimate_bits(shunting_yard("2 + 3 * 4")) == 0
+    bits = math.factorial(100).bit_length()
+    assert logic.estimate_bits(shunting_yard("100!")) == bits
+    # Górne oszacowanie: bit_length(3) * 5000
+    bits = logic.estimate_bits(shunting_yard("3^5000"), "EXACT")
+    assert (3 ** 5000).bit_length() <= bits <= 10000
+    assert logic.estimate_bits(shunting_yard("(10^6)!")) > 10 ** 7
+    # Błąd w trakcie szacowania przerywa przebieg; prawdziwe liczenie go zgłosi
+    assert logic.estimate_bits(shunting_yard("1/0 + 5!")) == 0
+
+
+def test_cost_limit_is_configurable_and_follows_ans():
+    ev = Evaluator(number_mode="EXACT", max_bits=1000)
+    assert ev.compute("2^999") == 2 ** 999
+    with pytest.raises(logic.CostLimitError):
+        ev.compute("2^1001")
+    ev.ans = 10
+    assert ev.compute("Ans!") == math.factorial(10)
+    ev.ans = 500
+    with pytest.raises(logic.CostLimitError):
+        ev.compute("Ans!")
+
+
+def test_results_are_capped_at_what_str_can_display():
+    ev = Evaluator(number_mode="EXACT")
+    ev.compute("7")
+    assert "too large" in ev.evaluate("100000!")
+    assert ev.ans == 7
+    # 4 295 cyfr – jeszcze się mieści
+    assert ev.compute("3^9000") == 3 ** 9000
+    with pytest.raises(logic.CostLimitError):
+        logic.result_text(10 ** 5000)
+
+
+def test_repeated_products_of_a_big_ans_are_estimated():
+    ev = Evaluator(number_mode="EXACT", max_bits=logic.MAX_EXACT_BITS)
+    ev.ans = ans = 3 ** 200_000
+    assert "too large" in ev.evaluate(" * ".join(["Ans"] * 32))
+    assert ev.ans is ans
+    assert ev.compute("Ans - Ans") == 0
+
+
+def test_large_factorials():
+    result = Evaluator(number_mode="DECIMAL").evaluate("100000!")
+    assert result.startswith("2.824229407960")
+    assert "too large" in Evaluator(number_mode="DECIMAL").evaluate("1e20!")
+
+
+def test_cost_errors_are_classified():
+    with pytest.raises(OverflowError) as info:
+        Evaluator().compute("(10^6)!")
+    assert logic.error_kind(info.value) == "cost_limit"
+    assert logic.describe_error(MemoryError()) == "Error: Out of memory"
+    assert logic.error_kind(TimeoutError("slow")) == "timeout"
+
+
+# ────────────────────────────────────────────────
+# Decimal number mode
+# ────────────────────────────────────────────────
+
+def test_decimal_mode_uses_configured_precision():
+    ev = Evaluator(number_mode="DECIMAL", decimal_digits=60)
+    third = ev.compute("1/3")
+    assert isinstance(third, Decimal)
+    assert str(third) == "0." + "3" * 60
+    assert ev.compute("0.1 + 0.2") == Decimal("0.3")
+    ev.set_decimal_digits(80)
+    assert len(str(ev.compute("π")).replace(".", "")) == 80
+
+
+def test_decimal_mode_respects_angle_mode_and_ans():
+    ev = Evaluator(number_mode="DECIMAL", decimal_digits=40)
+    assert ev.compute("sin 30 + cos 60") == 1
+    ev.set_angle_mode("RAD")
+    assert ev.compute("4 atan 1") == ev.compute("π")
+    assert ev.compute("Ans / π") == 1
+    assert ev.compute("x^2", {"x": 0.5}) == Decimal("0.25")
+
+
+def test_decimal_mode_programs_are_not_folded_across_precisions():
+    low = Evaluator(number_mode="DECIMAL", decimal_digits=10)
+    high = Evaluator(number_mode="DECIMAL", decimal_digits=30)
+    for _ in range(3):
+        assert str(low.compute("2/3 + π")) == "3.808259321"
+        assert str(high.compute("2/3 + π")) == "3.80825932025645990512931004995"
+
+
+@pytest.mark.parametrize("expr, expected_substring", [
+    ("1/0",     "Division by zero"),
+    ("√-1",     "math domain error"),
+    ("ln 0",    "math domain error"),
+    ("2.5!",    "Factorial"),
+])
+def test_decimal_mode_errors(expr, expected_substring):
+    assert expected_substring in Evaluator(number_mode="DECIMAL").evaluate(expr)
+
+
+def test_invalid_modes_are_rejected():
+    with pytest.raises(ValueError):
+        Evaluator(number_mode="BINARY")
+    with pytest.raises(ValueError):
+        Evaluator(decimal_digits=0)
+
+
+# ────────────────────────────────────────────────
+# Incremental parser (live preview)
+# ────────────────────────────────────────────────
+
+def type_out(parser, text, ev=None):
+    ev = ev or Evaluator()
+    return [ev.preview(parser, text[:i]) for i in range(1, len(text) + 1)]
+
+
+def test_preview_while_typing():
+    values = [p.value for p in type_out(IncrementalParser(), "2 + 3 * (4 - 1")]
+    assert values[0] == 2.0
+    assert values[2] is None            # "2 +" – niekompletne
+    assert values[-1] == 11.0           # brakujący nawias jest domyślny
+
+
+@pytest.mark.parametrize("edits", [
+    ["sin 30 + e", "sin 30 + ex", "sin 30 + exp", "sin 30 + exp 1"],
+    ["2e", "2e+", "2e+5", "2e+", "2e"],
+    ["1/x", "1/x ", "1/x 4", "1/x 4 + 1"],
+    ["12 * 34 + 5", "12 * 3 + 5", "2 * 3 + 5", "(2 * 3 + 5", "(2 * 3) + 5"],
+    ["5!", "5!!", "5 !", "-5", "--5", "+5", "2 + +5"],
+])
+def test_incremental_matches_fresh_parse(edits):
+    ev, parser = Evaluator(), IncrementalParser()
+    for text in edits:
+        incremental = ev.preview(parser, text)
+        fresh = ev.preview(IncrementalParser(), text)
+        assert incremental.value == fresh.value
+        assert type(incremental.error) is type(fresh.error)
+        if incremental.value is not None and text.count("(") == text.count(")"):
+            assert incremental.value == Evaluator().compute(text)
+
+
+def test_preview_reports_errors_and_keeps_ans():
+    ev = Evaluator()
+    ev.compute("7")
+    parser = IncrementalParser()
+    assert isinstance(ev.preview(parser, "Ans / 0").error, ZeroDivisionError)
+    assert ev.preview(parser, "Ans / 2").value == 3.5
+    assert ev.preview(parser, "2 + #").value is None
+    assert ev.ans == 7.0
+
+
+def test_preview_follows_mode_changes():
+    ev, parser = Evaluator(), IncrementalParser()
+    assert ev.preview(parser, "sin 90").value == pytest.approx(1.0)
+    ev.set_angle_mode("RAD")
+    assert ev.preview(parser, "sin 90").value == pytest.approx(math.sin(90))
+    ev.set_number_mode("EXACT")
+    assert ev.preview(parser, "1/3").value == Fraction(1, 3)
+
+
+def test_preview_skips_huge_results():
+    ev, parser = Evaluator(), IncrementalParser()
+    assert isinstance(ev.preview(parser, "230000!").error, logic.CostLimitError)
+    assert ev.preview(parser, "171!").value == math.factorial(171)
+    exact = Evaluator(number_mode="EXACT", max_bits=1 << 40)
+    exact.ans = 3 ** 500000
+    preview = exact.preview(parser, "Ans*Ans*Ans*Ans")
+    assert isinstance(preview.error, logic.CostLimitError)
+    assert exact.preview(parser, "2^20000").value == 2 ** 20000
+
+
+def test_appending_rescans_only_the_tail(monkeypatch):
+    parser, ev = IncrementalParser(), Evaluator()
+    text = "1 + " * 2000 + "1"
+    assert ev.preview(parser, text).value == 2001.0
+
+    scanned = []
+    scan = logic._scan
+    def counting_scan(*args):
+        for lexeme in scan(*args):
+            scanned.append(lexeme)
+            yield lexeme
+
+    monkeypatch.setattr(logic, "_scan", counting_scan)
+    assert ev.preview(parser, text + " * 2").value == 2002.0
+    assert len(scanned) <= 6
+
+
+# ────────────────────────────────────────────────
+# Result formatting
+# ────────────────────────────────────────────────
+
+@pytest.mark.parametrize("value, mode, expected", [
+    ("4.0",                     "FLOAT", "4"),
+    (0.1 + 0.2,                 "FLOAT", "0.3"),
+    (1e15,                      "FLOAT", "1.00000000e+15"),
+    (-0.0,                      "FLOAT", "0"),
+    (2 / 3,                     "FIXED", "0.6667"),
+    (2.0,                       "FIXED", "2"),
+    (Decimal("0.500000"),       "DEC",   "0.5"),
+    (Decimal("1E+2"),           "DEC",   "100"),
+    (Decimal("1.5E+60"),        "DEC",   "1.5E+60"),
+    ("Division by zero",        "FLOAT", "Division by zero"),
+])
+def test_format_number(value, mode, expected):
+    assert format_number(value, mode) == expected
+
+
+@pytest.mark.parametrize("value, mode, expected", [
+    (math.factorial(171),               "FLOAT", "1.24101807e+309"),
+    (-(10 ** 400),                      "FIXED", "-1.00000000e+400"),
+    (Fraction(10 ** 400, 3),            "FLOAT", "3.33333333e+399"),
+    (2 ** 3_000_000,                    "FLOAT", "9.70491964e+903089"),
+    (2 ** 3_000_000,                    "DEC",   "9.70491964e+903089"),
+], ids=["171!", "-10^400", "10^400/3", "2^3000000", "2^3000000-DEC"])
+def test_format_number_beyond_float_range(value, mode, expected):
+    # Bez str() – int o ponad 4300 cyfrach go nie przechodzi
+    assert format_number(value, mode) == expected
+
+
+# ────────────────────────────────────────────────
+# Variables and vectorized evaluation
+# ────────────────────────────────────────────────
+
+def test_variables_in_compiled_expressions():
+    program = compile_expression("2x + y^2")
+    assert program.variables == ("x", "y")
+    assert program({"x": 1.5, "y": 3.0}) == 12.0
+    assert program.compile()({"x": 1.5, "y": 3.0}) == 12.0
+    assert evaluate_rpn(shunting_yard("2x + y^2"), {"x": 1.5, "y": 3.0}) == 12.0
+
+
+def test_unknown_variable_is_an_error():
+    assert "Unknown variable 'x'" in evaluate_expression("2x + 1")
+    with pytest.raises(ValueError):
+        compile_expression("x + 1")()
+
+
+def test_one_over_x_is_division_without_argument():
+    assert compile_expression("1/x")({"x": 4.0}) == 0.25
+    assert evaluate_expression("1/x 8") == "0.125"
+
+
+def test_evaluate_vectorized_without_numpy(monkeypatch):
+    monkeypatch.setattr(logic, "_numpy", lambda: None)
+    set_angle_mode("DEG")
+    result = evaluate_vectorized("√x + sin(y) + 3!", x=[4.0, -1.0, 9.0],
+                                 y=[0.0, 30.0, 90.0])
+    assert list(result.errors) == [0, 1, 0]
+    assert result.values[0] == pytest.approx(8.0)
+    assert math.isnan(result.values[1])
+    assert result.values[2] == pytest.approx(10.0)
+
+
+def test_evaluate_vectorized_errors_become_nan_mask(monkeypatch):
+    monkeypatch.setattr(logic, "_numpy", lambda: None)
+    result = evaluate_vectorized("1 / x + x!", x=[0.0, 2.0, 2.5])
+    assert list(result.errors) == [1, 0, 1]
+    assert result.values[1] == 2.5
+
+
+def test_evaluate_vectorized_requires_all_variables():
+    with pytest.raises(ValueError, match="y"):
+        evaluate_vectorized("x + y", x=[1.0])
+
+
+def test_evaluate_vectorized_with_numpy():
+    np = pytest.importorskip("numpy")
+    set_angle_mode("DEG")
+    x = np.array([4.0, -1.0, 0.0, 5.0])
+    result = evaluate_vectorized("√x + 1/x(x) + sin(30) + x!", x=x)
+    assert result.errors.tolist() == [False, True, True, False]
+    assert result.values[0] == pytest.approx(2 + 0.25 + 0.5 + 24)
+    assert result.values[3] == pytest.approx(math.sqrt(5) + 0.2 + 0.5 + 120)
+
+
+# ────────────────────────────────────────────────
+# Solve and integrate
+# ────────────────────────────────────────────────
+
+@pytest.mark.parametrize("expr, x0, root", [
+    ("x^2 - 2", 1, math.sqrt(2)),
+    ("x^3 - 2x - 5", 2, 2.0945514815423265),
+    ("cos x - x", 0, 0.9998477415310881),        # DEG
+    ("e^x - 10", 0, math.log(10)),
+    ("ln x", 5, 1.0),
+    ("(x - 3)^2", 0, 3.0),                 # pierwiastek podwójny, bez zmiany znaku
+])
+def test_solve(expr, x0, root):
+    result = solve(expr, x0)
+    assert result.value == pytest.approx(root, abs=1e-7)
+    assert abs(result.residual) < 1e-9
+    assert 0 < result.evaluations < 200
+
+
+def test_solve_brackets_far_roots_and_counts_evaluations():
+    result = solve("sin x", 100)                   # DEG: najbliższy pierwiastek to 180
+    assert result.value == pytest.approx(180)
+    assert result.bracketed
+    assert solve("sin x", 100, angle_mode="RAD").value == pytest.approx(32 * math.pi)
+    assert solve("x^2 - 2", 1).evaluations <= 15
+
+
+@pytest.mark.parametrize("expr, message", [
+    ("x^2 + 1", "No root"),
+    ("1/x", "discontinuity"),
+    ("x + y", "Unknown variable 'y'"),
+])
+def test_solve_errors(expr, message):
+    with pytest.raises(ValueError, match=message):
+        solve(expr, 1)
+
+
+def test_solve_respects_evaluation_budget():
+    with pytest.raises(ValueError, match="5 evaluations"):
+        solve("x^2 + 1", 1, max_evaluations=5)
+
+
+@pytest.mark.parametrize("expr, a, b, expected", [
+    ("x^2", 0, 3, 9.0),
+    ("sin x", 0, 180, 360 / math.pi),            # DEG
+    ("1/x", 1, math.e, 1.0),
+    ("1/√x", 0, 1, 2.0),                           # osobliwość na brzegu
+    ("e^(-x^2)", -math.inf, math.inf, math.sqrt(math.pi)),
+    ("1/(1 + x^2)", 0, math.inf, math.pi / 2),
+    ("x^2", 3, 0, -9.0),
+])
+def test_integrate(expr, a, b, expected):
+    result = integrate(expr, a, b)
+    assert result.converged
+    assert result.value == pytest.approx(expected, rel=1e-8)
+    assert result.error < 1e-6
+    assert result.evaluations >= 15
+
+
+def test_integrate_smooth_function_needs_one_rule():
+    assert integrate("x^3 - x", -1, 2).evaluations == 15
+
+
+def test_integrate_errors():
+    with pytest.raises(ValueError):
+        integrate("√x", -1, 1)
+    result = integrate("sin(1/x)", 0.001, 1, angle_mode="RAD", max_evaluations=100)
+    assert not result.converged
+
+
+@pytest.mark.parametrize("call", [
+    lambda: logic.compile_function("x + 100000!"),
+    lambda: solve("x - 100000!", 1),
+    lambda: integrate("x + 100000!", 0, 1),
+])
+def test_numeric_commands_respect_cost_limit(call):
+    # 100000! nie zależy od x – liczyłby się przy kompilacji i każdym wywołaniu
+    with pytest.raises(logic.CostLimitError, match="too large"):
+        call()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("solve(x^2 - 2, 1)", ("solve", ["x^2 - 2", "1"])),
+    ("integrate(sin x, 0, π)", ("integrate", ["sin x", "0", "π"])),
+    ("∫(max(x, 1), -1, 2)", ("integrate", ["max(x, 1)", "-1", "2"])),
+    ("2 + 3", None),
+])
+def test_parse_command(text, expected):
+    assert parse_command(text) == expected
+
+
+def test_commands_through_evaluator():
+    ev = Evaluator()
+    assert ev.evaluate("solve(x^2 - 2, 1)") == str(math.sqrt(2))
+    assert float(ev.evaluate("∫(2x, 0, Ans)")) == pytest.approx(2.0)
+    assert ev.ans == pytest.approx(2.0)
+    assert "takes 2 arguments" in ev.evaluate("solve(x)")
+    assert ev.ans == pytest.approx(2.0)            # błąd nie zmienia Ans
+    gauss = float(ev.evaluate("∫(e^(-x^2), -∞, inf)"))
+    assert gauss == pytest.approx(math.sqrt(math.pi))
+    result = ev.compute_command("integrate(x, 0, 2)")
+    assert result.value == pytest.approx(2.0) and result.evaluations == 15
+
+
+# ────────────────────────────────────────────────
+# Evaluator instances
+# ────────────────────────────────────────────────
+
+def test_evaluators_keep_separate_state():
+    deg, rad = Evaluator("DEG"), Evaluator("RAD")
+    assert_result_close(deg.evaluate("sin 90"), 1.0)
+    assert_result_close(rad.evaluate("sin 90"), math.sin(90))
+
+    deg.evaluate("2 + 2")
+    rad.evaluate("10 * 10")
+    assert deg.evaluate("Ans") == "4.0"
+    assert rad.evaluate("Ans") == "100.0"
+
+    deg.memory_add(5)
+    deg.memory_subtract(2)
+    assert deg.memory_recall() == 3
+    assert rad.memory_recall() == 0
+
+
+def test_module_functions_wrap_default_evaluator():
+    set_angle_mode("RAD")
+    assert logic.ANGLE_MODE == "RAD"
+    assert logic.DEFAULT_EVALUATOR.angle_mode == "RAD"
+    set_angle_mode("DEG")
+    evaluate_expression("6 * 7")
+    assert logic.CONSTANTS["Ans"] == 42.0 == logic.DEFAULT_EVALUATOR.ans
+    # Nowa instancja nie przejmuje Ans domyślnej
+    assert Evaluator().ans == 0.0
+
+    with pytest.raises(ValueError):
+        Evaluator("GRAD")
+
+
+def test_concurrent_mixed_angle_mode_evaluations():
+    evaluators = {"DEG": Evaluator("DEG"), "RAD": Evaluator("RAD")}
+    exprs = ["sin 30", "cos 60 + tan 45", "asin 0.5 * 2", "atan 1 - acos 0"]
+    expected = {
+        (mode, expr): float(Evaluator(mode).evaluate(expr))
+        for mode in evaluators for expr in exprs
+    }
+
+    def job(i):
+        mode = "DEG" if i % 2 else "RAD"
+        expr = exprs[i % len(exprs)]
+        if i % 7 == 0:
+            # Przełączanie trybu domyślnej instancji nie może wpływać na wyniki
+            set_angle_mode("RAD" if i % 2 else "DEG")
+        return mode, expr, float(evaluators[mode].evaluate(expr))
+
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(job, range(4000)))
+    finally:
+        set_angle_mode("DEG")
+
+    assert len(results) == 4000
+    for mode, expr, value in results:
+        assert value == expected[mode, expr]
+
+
+def test_concurrent_ans_chains_do_not_interfere():
+    def chain(start):
+        ev = Evaluator()
+        ev.evaluate(str(start))
+        for _ in range(200):
+            ev.evaluate("Ans + 1")
+        return start, float(ev.evaluate("Ans"))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for start, final in pool.map(chain, range(0, 4000, 100)):
+            assert final == start + 200
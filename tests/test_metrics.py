@@ -0,0 +1,157 @@
+import json
+
+import pytest
+
+from src.calculator import metrics
+from src.calculator.__main__ import main
+from src.calculator.logic import Evaluator, clear_cache, error_kind
+from src.calculator.metrics import METRICS, Histogram
+
+
+@pytest.fixture
+def enabled():
+    clear_cache()
+    metrics.reset()
+    metrics.enable(slow_threshold=10.0)
+    yield METRICS
+    metrics.disable()
+    metrics.reset()
+
+
+# ────────────────────────────────────────────────
+# Histogram
+# ────────────────────────────────────────────────
+
+def test_histogram_buckets_and_percentiles():
+    hist = Histogram()
+    for _ in range(90):
+        hist.add(3e-6)       # 3 µs -> kubełek < 4 µs
+    for _ in range(10):
+        hist.add(1e-3)       # 1 ms -> kubełek < 1024 µs
+    data = hist.to_dict()
+    assert data["count"] == 100
+    assert data["buckets_us"] == {"<4": 90, "<1024": 10}
+    assert data["p50_s"] == pytest.approx(4e-6)
+    assert data["p99_s"] == pytest.approx(1e-3)     # obcięte do max
+    assert data["min_s"] == 3e-6
+    assert data["mean_s"] == pytest.approx((90 * 3e-6 + 10 * 1e-3) / 100)
+
+
+def test_empty_histogram():
+    assert Histogram().to_dict()["p90_s"] == 0.0
+
+
+def test_drain_and_merge():
+    worker = metrics.Metrics(slow_threshold=0.0)
+    worker.observe("evaluate", 3e-6)
+    worker.error("syntax")
+    worker.finished("2 +", 1e-3, "syntax")
+    state = worker.drain()
+    assert worker.snapshot()["stages"] == {}
+    main_metrics = metrics.Metrics()
+    main_metrics.observe("evaluate", 1e-3)
+    main_metrics.merge(state)
+    data = main_metrics.snapshot()
+    assert data["stages"]["evaluate"]["count"] == 2
+    assert data["stages"]["evaluate"]["min_s"] == 3e-6
+    assert data["errors"] == {"syntax": 1}
+    assert [c["expression"] for c in data["slow"]] == ["2 +"]
+
+
+# ────────────────────────────────────────────────
+# Instrumentacja Evaluatora
+# ────────────────────────────────────────────────
+
+def test_disabled_records_nothing():
+    metrics.reset()
+    clear_cache()
+    Evaluator().compute("1 + 2")
+    assert metrics.snapshot()["stages"] == {}
+
+
+def test_stages_counted(enabled):
+    ev = Evaluator()
+    for _ in range(3):
+        ev.compute("2 * (3 + 4)")
+    stages = metrics.snapshot()["stages"]
+    assert stages["total"]["count"] == 3
+    assert stages["lookup"]["count"] == 3
+    assert stages["evaluate"]["count"] == 3
+    # Parsowanie tylko przy pierwszym (nietrafionym w cache) wywołaniu
+    assert stages["tokenize"]["count"] == 1
+    assert stages["shunting_yard"]["count"] == 1
+    assert stages["compile"]["count"] == 1
+
+
+@pytest.mark.parametrize("expr, kind", [
+    ("1 / 0", "division_by_zero"),
+    ("2 +", "syntax"),
+    ("(1", "syntax"),
+    ("√(-1)", "domain"),
+    ("(-3)!", "domain"),
+    ("x + 1", "syntax"),
+])
+def test_errors_by_kind(enabled, expr, kind):
+    with pytest.raises((ArithmeticError, ValueError)):
+        Evaluator().compute(expr)
+    data = metrics.snapshot()
+    assert data["errors"] == {kind: 1}
+    assert data["stages"]["total"]["count"] == 1
+
+
+def test_decimal_errors_classified():
+    ev = Evaluator(number_mode="DECIMAL")
+    with pytest.raises(ArithmeticError) as info:
+        ev.compute("0 / 0")
+    assert error_kind(info.value) in ("division_by_zero", "domain")
+
+
+def test_slow_log(enabled):
+    enabled.slow_threshold = 0.0
+    ev = Evaluator()
+    ev.compute("1 + 1")
+    with pytest.raises(ZeroDivisionError):
+        ev.compute("1 / 0")
+    slow = metrics.snapshot()["slow"]
+    assert [(c["expression"], c["error"]) for c in slow] == [
+        ("1 + 1", None), ("1 / 0", "division_by_zero")]
+
+
+def test_measure_is_noop_when_disabled():
+    metrics.reset()
+    with METRICS.measure("history"):
+        pass
+    assert "history" not in metrics.snapshot()["stages"]
+
+
+# ────────────────────────────────────────────────
+# Zrzut i polecenie "metrics"
+# ────────────────────────────────────────────────
+
+def test_dump_and_report(enabled, tmp_path, capsys):
+    Evaluator().compute("sin(30) + 1")
+    with pytest.raises(ZeroDivisionError):
+        Evaluator().compute("1/0")
+    path = tmp_path / "metrics.json"
+    metrics.dump(path)
+    assert json.loads(path.read_text(encoding="utf-8"))["stages"]["total"]["count"] == 2
+
+    assert main(["metrics", str(path)]) == 0
+    out = capsys.readouterr().out
+    assert "total" in out and "division_by_zero=1" in out
+
+
+def test_batch_metrics(tmp_path, capsys, monkeypatch):
+    import io
+    clear_cache()
+    monkeypatch.setattr("sys.stdin", io.StringIO("1 + 1\n1 / 0\n"))
+    path = tmp_path / "m.json"
+    try:
+        assert main(["batch", "--metrics", "--metrics-json", str(path)]) == 0
+    finally:
+        metrics.disable()
+        metrics.reset()
+    err = capsys.readouterr().err
+    assert "evaluate" in err
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["errors"] == {"division_by_zero": 1}
@@ -0,0 +1,122 @@
+import statistics
+import time
+
+import pytest
+
+from src.calculator.history import HistoryRecord, HistoryStore
+from src.calculator.search import HistoryIndex, build_index, terms
+
+
+def rec(ts: str, expr: str, result: str) -> HistoryRecord:
+    return HistoryRecord(ts, expr, result)
+
+
+@pytest.fixture
+def index():
+    idx = HistoryIndex()
+    idx.add_many([
+        rec("2026-01-01 09:00:00", "sin(30)", "0.5"),
+        rec("2026-01-02 10:00:00", "2 + 2", "4"),
+        rec("2026-01-15 11:00:00", "√16 * π", "12.5664"),
+        rec("2026-02-01 12:00:00", "sin(90) + 1", "2"),
+        rec("2026-02-03 13:00:00", "log 100", "2"),
+    ])
+    return idx
+
+
+def expressions(results):
+    return [r.expression for _, r in results]
+
+
+# ────────────────────────────────────────────────
+# Terms and queries
+# ────────────────────────────────────────────────
+
+def test_terms_skip_arithmetic_punctuation():
+    assert terms("√16 * π + sin(30.5)") == ["√", "16", "π", "sin", "30.5"]
+
+
+def test_prefix_search_newest_first(index):
+    assert expressions(index.search("si")) == ["sin(90) + 1", "sin(30)"]
+    assert expressions(index.search("12.56")) == ["√16 * π"]
+
+
+def test_all_terms_must_match(index):
+    assert expressions(index.search("sin 9")) == ["sin(90) + 1"]
+    assert expressions(index.search("π √")) == ["√16 * π"]
+    assert index.search("sin 4") == []
+
+
+def test_results_are_searched_too(index):
+    assert expressions(index.search("2")) == ["log 100", "sin(90) + 1", "2 + 2"]
+
+
+def test_date_range(index):
+    found = index.search("", start="2026-01-02", end="2026-01-31")
+    assert expressions(found) == ["√16 * π", "2 + 2"]
+    assert expressions(index.search("sin from:2026-01-10")) == ["sin(90) + 1"]
+    assert expressions(index.search("to:2026-01-01")) == ["sin(30)"]
+
+
+def test_limit(index):
+    assert len(index.search("", limit=2)) == 2
+
+
+def test_incremental_add_is_searchable(index):
+    doc = index.add(rec("2026-03-01 08:00:00", "exp 1", "2.71828"))
+    assert index.search("2.718") == [(doc, index.records[doc])]
+    assert len(index) == 6
+
+
+def test_long_prefixes_after_many_new_terms():
+    idx = HistoryIndex()
+    idx.MERGE_AFTER = 10
+    for i in range(50):
+        idx.add(rec("2026-01-01 00:00:00", f"{123450 + i} + 1", "x"))
+    assert expressions(idx.search("123456")) == ["123456 + 1"]
+    assert len(idx.search("12345", limit=100)) == 10
+    assert len(idx.search("1234", limit=100)) == 50
+    # Duża paczka (jak przy budowie indeksu w tle) scala listę od razu
+    idx.add_many(rec("2026-01-02 00:00:00", f"{987600 + i} * 2", "y")
+                 for i in range(100))
+    assert idx._long_terms == sorted(idx._long_terms) and not idx._new_long_terms
+    assert expressions(idx.search("987654")) == ["987654 * 2"]
+
+
+def test_out_of_order_timestamps_stay_sorted():
+    idx = HistoryIndex()
+    idx.add(rec("2026-01-02 00:00:00", "b", "1"))
+    idx.add(rec("2026-01-01 00:00:00", "a", "1"))
+    assert expressions(idx.search("", end="2026-01-01")) == ["a"]
+
+
+def test_clear(index):
+    index.clear()
+    assert len(index) == 0
+    assert index.search("sin") == []
+
+
+def test_build_index_from_store_snapshot(tmp_path):
+    store = HistoryStore(tmp_path / "history.jsonl")
+    store.append(rec("2026-01-01 00:00:00", "1 + 1", "2"))
+    snapshot = store.size()
+    store.append(rec("2026-01-01 00:00:01", "2 + 2", "4"))
+    assert expressions(build_index(store, snapshot).search("")) == ["1 + 1"]
+    assert len(build_index(store)) == 2
+
+
+def test_queries_are_sub_millisecond_on_large_history():
+    idx = HistoryIndex()
+    funcs = ["sin", "cos", "tan", "ln", "log", "√", "exp"]
+    idx.add_many(
+        rec(f"2025-{1 + i % 12:02d}-01 00:00:00", f"{funcs[i % 7]}({i % 997}) + {i}",
+            str(i * 3))
+        for i in range(50_000)
+    )
+    for query in ("sin 42", "cos", "1", "exp 77", "from:2025-03-01 to:2025-03-31"):
+        samples = []
+        for _ in range(15):
+            start = time.perf_counter()
+            idx.search(query, limit=50)
+            samples.append(time.perf_counter() - start)
+        assert statistics.median(samples) < 0.001, query
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import sys
+import time
+
+import pytest
+
+from src.calculator import server as server_module
+from src.calculator.server import EvalServer
+
+
+async def start(**kwargs):
+    server = EvalServer(**kwargs)
+    listener = await server.start_tcp("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    return server, port
+
+
+async def connect(port):
+    return await asyncio.open_connection("127.0.0.1", port)
+
+
+async def call(reader, writer, request):
+    writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10))
+
+
+# ────────────────────────────────────────────────
+# Protokół
+# ────────────────────────────────────────────────
+
+def test_eval_and_errors():
+    async def scenario():
+        server, port = await start()
+        reader, writer = await connect(port)
+        try:
+            reply = await call(reader, writer, {"id": 1, "expr": "2 + 3"})
+            assert reply == {"id": 1, "result": "5.0"}
+            assert await call(reader, writer, {"id": 2, "expr": "1/0"}) == {
+                "id": 2, "error": "Division by zero", "kind": "division_by_zero"}
+            reply = await call(reader, writer, {"id": 3, "op": "nope"})
+            assert reply["kind"] == "protocol"
+            writer.write(b"not json\n")
+            assert json.loads(await reader.readline())["kind"] == "protocol"
+            assert (await call(reader, writer, {"op": "ping"})) == {"ok": True}
+        finally:
+            writer.close()
+            await server.close()
+
+    run(scenario())
+
+
+def test_sessions_keep_angle_mode_and_ans():
+    async def scenario():
+        server, port = await start()
+        a = await connect(port)
+        b = await connect(port)
+        try:
+            await call(*a, {"op": "set", "angle": "RAD"})
+            await call(*a, {"expr": "10"})
+            await call(*b, {"expr": "1"})
+            assert (await call(*a, {"expr": "Ans * 2"}))["result"] == "20.0"
+            assert (await call(*b, {"expr": "sin(90)"}))["result"] == "1.0"    # DEG
+            assert (await call(*a, {"expr": "cos(0)"}))["result"] == "1.0"
+
+            # Sesja nazwana jest wspólna dla połączeń
+            await call(*a, {"session": "shared", "expr": "7"})
+            reply = await call(*b, {"session": "shared", "expr": "Ans + 1"})
+            assert reply["result"] == "8.0"
+            state = (await call(*b, {"op": "session"}))["session"]
+            assert state["angle"] == "DEG" and state["ans"] == "1.0"
+        finally:
+            for _, writer in (a, b):
+                writer.close()
+            await server.close()
+
+    run(scenario())
+
+
+def test_pipelined_requests_keep_session_order():
+    async def scenario():
+        server, port = await start(batch_window=0.002)
+        reader, writer = await connect(port)
+        try:
+            writer.write(b"".join(
+                json.dumps({"id": i, "expr": "Ans + 1"}).encode() + b"\n"
+                for i in range(200)))
+            await writer.drain()
+            replies = [json.loads(await reader.readline()) for _ in range(200)]
+            results = {r["id"]: r["result"] for r in replies}
+            assert results == {i: str(float(i + 1)) for i in range(200)}
+            stats = server.stats()
+            assert stats["batches"] < 200          # żądania zostały spakowane
+            assert stats["batch_size_max"] > 1
+        finally:
+            writer.close()
+            await server.close()
+
+    run(scenario())
+
+
+def test_many_clients():
+    async def client(port, n):
+        reader, writer = await connect(port)
+        try:
+            for i in range(20):
+                reply = await call(reader, writer, {"expr": f"{n} * 100 + {i}"})
+                assert reply["result"] == str(float(n * 100 + i))
+        finally:
+            writer.close()
+
+    async def scenario():
+        server, port = await start()
+        try:
+            await asyncio.gather(*(client(port, n) for n in range(30)))
+            assert server.stats()["connections_total"] == 30
+            assert server.stats()["completed"] == 600
+        finally:
+            await server.close()
+
+    run(scenario())
+
+
+def test_timeout(monkeypatch):
+    def slow(session, expression):
+        time.sleep(0.3)
+        return {"result": expression}
+
+    monkeypatch.setattr(server_module, "_compute", slow)
+
+    async def scenario():
+        server, port = await start(timeout=0.1)
+        reader, writer = await connect(port)
+        try:
+            writer.write(b'{"id": 1, "expr": "a"}\n{"id": 2, "expr": "b"}\n')
+            await writer.drain()
+            replies = [json.loads(await reader.readline()) for _ in range(2)]
+            assert all(r["kind"] == "timeout" for r in replies)
+            stats = (await call(reader, writer, {"op": "stats"}))["stats"]
+            assert stats["timeouts"] == 2
+            assert stats["errors"] == {"timeout": 2}
+        finally:
+            writer.close()
+            await server.close()
+
+    run(scenario())
+
+
+def test_guard_stops_runaway_evaluation():
+    from src.calculator.guard import GuardedEvaluator
+
+    async def scenario():
+        guard = GuardedEvaluator(timeout=0.1)
+        server, port = await start(timeout=5.0, guard=guard)
+        reader, writer = await connect(port)
+        try:
+            assert (await call(reader, writer, {"expr": "1 + 1"}))["result"] == "2.0"
+            # ln przy 100 000 cyfrach liczy się sekundami
+            await call(reader, writer, {"op": "set", "number_mode": "DECIMAL",
+                                        "decimal_digits": 100_000})
+            reply = await call(reader, writer, {"expr": "ln 3"})
+            assert reply["kind"] == "timeout" and "longer than" in reply["error"]
+            # Wątek obliczeniowy nie utknął
+            await call(reader, writer, {"op": "set", "number_mode": "FLOAT"})
+            assert (await call(reader, writer, {"expr": "Ans + 1"}))["result"] == "3.0"
+            assert guard.restarts == 1
+        finally:
+            writer.close()
+            await server.close()
+
+    run(scenario())
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix sockets")
+def test_unix_socket(tmp_path):
+    async def scenario():
+        server = EvalServer()
+        path = str(tmp_path / "calc.sock")
+        await server.start_unix(path)
+        reader, writer = await asyncio.open_unix_connection(path)
+        try:
+            assert (await call(reader, writer, {"expr": "3!"}))["result"] == "6"
+        finally:
+            writer.close()
+            await server.close()
+
+    run(scenario())
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# Budżet na import całego stosu bez GUI (z kompilacją źródeł, bez .pyc)
+IMPORT_BUDGET_MS = 150
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=str(SRC), PYTHONDONTWRITEBYTECODE="1")
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, env=env, check=True
+    )
+
+
+def cumulative_import_us(stderr: str, module: str) -> int:
+    for line in stderr.splitlines():
+        parts = [p.strip() for p in line.removeprefix("import time:").split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    pytest.fail(f"{module} not found in -X importtime output")
+
+
+@pytest.mark.parametrize("module", [
+    "calculator.logic", "calculator.batch", "calculator.__main__",
+])
+def test_headless_imports_do_not_load_tkinter(module):
+    proc = run_python("-c", f"import sys, {module}; print('tkinter' in sys.modules)")
+    assert proc.stdout.strip() == "False"
+
+
+def test_batch_command_does_not_load_tkinter():
+    code = (
+        "import io, sys; sys.stdin = io.StringIO('1 + 1\\n');"
+        "from calculator.__main__ import main; main(['batch']);"
+        "print('tkinter' in sys.modules)"
+    )
+    assert run_python("-c", code).stdout.split() == ["2.0", "False"]
+
+
+def test_import_time_budget():
+    proc = run_python("-X", "importtime", "-c", "import calculator.__main__")
+    elapsed_ms = cumulative_import_us(proc.stderr, "calculator.__main__") / 1000
+    assert elapsed_ms < IMPORT_BUDGET_MS, f"import took {elapsed_ms:.1f} ms"
@@ -0,0 +1,173 @@
+import io
+import json
+import math
+import random
+import statistics
+from bisect import bisect
+
+import pytest
+
+from src.calculator.__main__ import main
+from src.calculator.stats import (
+    RunningStats,
+    TDigest,
+    parse_numbers,
+    read_blocks,
+    stats_of_stream,
+)
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = random.Random(7)
+    return [rng.gauss(10, 3) for _ in range(50_000)]
+
+
+# ────────────────────────────────────────────────
+# Moments and sum
+# ────────────────────────────────────────────────
+
+def test_add_and_update_match_statistics(data):
+    one_by_one = RunningStats()
+    for x in data[:5000]:
+        one_by_one.add(x)
+    chunked = RunningStats()
+    for i in range(0, 5000, 700):
+        chunked.update(data[i:min(i + 700, 5000)])
+    for stats in (one_by_one, chunked):
+        assert stats.count == 5000
+        head = data[:5000]
+        assert stats.mean == pytest.approx(statistics.fmean(head), rel=1e-12)
+        assert stats.variance == pytest.approx(statistics.variance(head), rel=1e-10)
+        assert stats.pvariance == pytest.approx(statistics.pvariance(head), rel=1e-10)
+        assert stats.min == min(head) and stats.max == max(head)
+
+
+def test_sum_is_compensated():
+    stats = RunningStats()
+    for x in [1e16, 1.0, -1e16] * 1000:
+        stats.add(x)
+    assert stats.sum == 1000.0
+    # Wariancja przy dużym przesunięciu nie traci cyfr
+    shifted = RunningStats()
+    shifted.update([1e9 + x for x in (4, 7, 13, 16)])
+    assert shifted.variance == 30.0
+
+
+def test_errors_on_too_little_data():
+    stats = RunningStats()
+    with pytest.raises(ValueError):
+        stats.summary()
+    stats.add(2.0)
+    with pytest.raises(ValueError):
+        _ = stats.variance
+    assert stats.summary()["stdev"] == 0.0
+
+
+# ────────────────────────────────────────────────
+# Quantiles (t-digest)
+# ────────────────────────────────────────────────
+
+@pytest.mark.parametrize("q", [0.001, 0.01, 0.1, 0.5, 0.9, 0.99, 0.999])
+def test_quantile_rank_error_is_small(data, q):
+    stats = RunningStats()
+    for i in range(0, len(data), 1000):
+        stats.update(data[i:i + 1000])
+    ordered = sorted(data)
+    rank = bisect(ordered, stats.quantile(q)) / len(ordered)
+    assert rank == pytest.approx(q, abs=0.002)
+
+
+def test_digest_memory_is_bounded(data):
+    digest = TDigest(100)
+    for x in data:
+        digest.add(x)
+    assert digest.count == len(data)
+    assert len(digest.means) <= 200
+    assert digest.quantile(0) == min(data) and digest.quantile(1) == max(data)
+    with pytest.raises(ValueError):
+        digest.quantile(1.5)
+
+
+def test_small_inputs_are_exact():
+    stats = RunningStats()
+    stats.update([3.0, 1.0, 2.0])
+    assert stats.quantile(0.5) == 2.0
+
+
+# ────────────────────────────────────────────────
+# Merging partial results
+# ────────────────────────────────────────────────
+
+def test_merge_equals_single_pass(data):
+    whole = RunningStats()
+    whole.update(data)
+    parts = [RunningStats() for _ in range(4)]
+    for i, part in enumerate(parts):
+        part.update(data[i::4])
+    merged = RunningStats()
+    for part in parts:
+        # Przez JSON – tak wyniki przechodzą między procesami
+        merged.merge(RunningStats.from_dict(json.loads(json.dumps(part.to_dict()))))
+    assert merged.count == whole.count
+    assert merged.mean == pytest.approx(whole.mean, rel=1e-12)
+    assert merged.variance == pytest.approx(whole.variance, rel=1e-10)
+    assert merged.sum == math.fsum(data)
+    assert merged.quantile(0.5) == pytest.approx(whole.quantile(0.5), abs=0.02)
+
+
+def test_merge_with_empty():
+    stats = RunningStats()
+    stats.update([1.0, 2.0])
+    stats.merge(RunningStats())
+    assert RunningStats().merge(stats).mean == 1.5
+
+
+# ────────────────────────────────────────────────
+# Reading numbers
+# ────────────────────────────────────────────────
+
+def test_parse_numbers_skips_non_numeric():
+    numbers = parse_numbers("value\n1, 2.5;3e2\tnan inf x\n-4")
+    assert numbers == ([1.0, 2.5, 300.0, -4.0], 4)
+
+
+def test_blocks_never_split_numbers():
+    text = " ".join(str(i) for i in range(5000))
+    blocks = list(read_blocks(io.StringIO(text), block_size=37))
+    assert "".join(blocks) == text
+    numbers = [x for b in blocks for x in parse_numbers(b)[0]]
+    assert numbers == list(map(float, range(5000)))
+    assert list(read_blocks(io.StringIO("123456789"), block_size=2)) == ["123456789"]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_stats_of_stream(workers):
+    text = "\n".join(str(i) for i in range(1, 10_001))
+    stats = stats_of_stream(io.StringIO(text), workers=workers, block_size=1000,
+                            max_in_flight=2)
+    assert stats.count == 10_000
+    assert stats.sum == 50_005_000
+    assert stats.quantile(0.5) == pytest.approx(5000.5, abs=10)
+
+
+def test_stats_cli_save_and_merge(tmp_path, capsys):
+    (tmp_path / "a.txt").write_text("1 2 3\n", encoding="utf-8")
+    (tmp_path / "b.csv").write_text("x,y\n4,5\n6,oops\n", encoding="utf-8")
+    for name, state in (("a.txt", "a.json"), ("b.csv", "b.json")):
+        assert main(["stats", str(tmp_path / name),
+                     "--save", str(tmp_path / state)]) == 0
+    capsys.readouterr()
+    assert main(["stats", "--merge", str(tmp_path / "a.json"), str(tmp_path / "b.json"),
+                 "--json", "-q", "0.5"]) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["count"] == 6
+    assert summary["mean"] == 3.5
+    assert summary["skipped"] == 3
+    assert summary["quantiles"] == {"0.5": 3.5}
+
+
+def test_stats_cli_without_numbers(tmp_path, capsys):
+    (tmp_path / "empty.txt").write_text("no numbers here", encoding="utf-8")
+    assert main(["stats", str(tmp_path / "empty.txt")]) == 1
+    assert "No numbers" in capsys.readouterr().err
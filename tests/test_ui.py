@@ -1,5 +1,10 @@
-import pytest
+import time
 import tkinter as tk
+
+import pytest
+
+from src.calculator.history import HistoryRecord, HistoryStore
+from src.calculator.logic import MAX_EXACT_BITS
 from src.calculator.ui import CalculatorGUI
 
 
@@ -10,6 +15,16 @@ def gui():
     gui_obj = CalculatorGUI(root)
     yield gui_obj
     root.destroy()
+    gui_obj.guard.close()
+
+
+def wait_for_result(gui, timeout=10.0):
+    """Obliczenia idą w tle – obsługujemy pętlę Tk, aż wynik wróci"""
+    deadline = time.monotonic() + timeout
+    while gui._busy and time.monotonic() < deadline:
+        gui.root.update()
+        time.sleep(0.01)
+    gui.root.update()
 
 
 def test_window_title(gui):
@@ -29,6 +44,7 @@ def test_digit_button_appends_text(gui):
     assert btn_5 is not None, "Przycisk '5' nie znaleziony"
 
     btn_5.invoke()  # symuluje kliknięcie
+    gui.root.update_idletasks()     # pole odświeża się w cyklu bezczynności
     assert gui.entry_var.get() == "5"
 
 
@@ -39,6 +55,7 @@ def test_ac_clears_entry(gui):
     assert ac_btn is not None
 
     ac_btn.invoke()
+    gui.root.update_idletasks()
     assert gui.entry_var.get() == ""
 
 
@@ -49,6 +66,7 @@ def test_unary_sqrt_immediate_action(gui):
     assert sqrt_btn is not None
 
     sqrt_btn.invoke()
+    wait_for_result(gui)
     result = gui.entry_var.get()
     assert result in ("4", "4.0", "4.0000")
 
@@ -60,6 +78,7 @@ def test_unary_one_over_x_immediate_action(gui):
     assert one_over_x_btn is not None
 
     one_over_x_btn.invoke()
+    wait_for_result(gui)
     result = gui.entry_var.get()
     assert result in ("0.125", "0.1250")
 
@@ -72,6 +91,7 @@ def test_calculate_simple_addition(gui):
     gui.buttons_dict["+"].invoke()   # jeśli masz spację w tekście przycisku
     gui.buttons_dict["3"].invoke()
     gui.buttons_dict["="].invoke()
+    wait_for_result(gui)
 
     assert gui.entry_var.get() in ("5", "5.0")
 
@@ -82,6 +102,7 @@ def test_history_updates_on_calculate(gui):
     old_count = gui.history_box.size()
 
     gui.buttons_dict["="].invoke()
+    wait_for_result(gui)
 
     new_count = gui.history_box.size()
     assert new_count == old_count + 1
@@ -98,9 +119,11 @@ def test_toggle_sign_changes_number(gui):
     assert sign_btn is not None
 
     sign_btn.invoke()
+    gui.root.update_idletasks()
     assert gui.entry_var.get() == "-42"
 
     sign_btn.invoke()
+    gui.root.update_idletasks()
     assert gui.entry_var.get() == "42"
 
 
@@ -109,6 +132,7 @@ def test_memory_mr_recall(gui, qtbot):
     gui.entry_var.set("100.0")
     m_plus_btn = gui.buttons_dict.get("M+")
     m_plus_btn.invoke()
+    wait_for_result(gui)
 
     # Wyczyść pole
     gui.entry_var.set("")
@@ -117,4 +141,86 @@ def test_memory_mr_recall(gui, qtbot):
     mr_btn = gui.buttons_dict.get("MR")
     mr_btn.invoke()
 
-    assert gui.entry_var.get() == "100.0"
\ No newline at end of file
+    assert gui.entry_var.get() == "100.0"
+
+def test_window_stays_responsive_and_cancel_stops_evaluation(gui):
+    gui.evaluator.max_bits = MAX_EXACT_BITS     # 200000! przechodzi przez limit kosztu
+    gui.entry_var.set("200000!")
+    gui.buttons_dict["="].invoke()
+    # Okno obsługuje zdarzenia w trakcie liczenia
+    gui.root.update()
+    assert gui._busy
+    gui.cancel_evaluation()
+    assert not gui._busy
+    assert gui.entry_var.get() == "200000!"
+    assert gui.status_label.cget("text") == "Cancelled"
+
+
+def test_superseded_result_is_dropped(gui):
+    gui.evaluator.max_bits = MAX_EXACT_BITS
+    gui.entry_var.set("200000!")
+    gui.buttons_dict["="].invoke()
+    gui.entry_var.set("6 * 7")
+    gui.buttons_dict["="].invoke()
+    wait_for_result(gui)
+    assert gui.entry_var.get() == "42"
+    assert "200000!" not in gui.history_box.get(tk.END)
+
+
+def test_solve_from_buttons_reports_evaluations(gui):
+    gui.entry_var.set("")
+    for char in ("solve", "x", "^", "2", "-", "2", ",", "1", ")"):
+        gui.append(char)
+    gui.root.update_idletasks()
+    assert gui.entry_var.get() == "solve(x^2-2, 1)"
+    gui.calculate()
+    wait_for_result(gui)
+    assert gui.entry_var.get().startswith("1.41421")
+    assert gui.status_label.cget("text").endswith("evaluations")
+    assert gui.evaluator.ans == pytest.approx(2 ** 0.5)
+
+
+def test_unit_result_keeps_its_unit(gui):
+    gui.entry_var.set("5 km + 300 m in mi")
+    gui.calculate()
+    wait_for_result(gui)
+    assert gui.entry_var.get() == "3.29327 mi"
+    assert gui.evaluator.ans == pytest.approx(5300 / 1609.344)
+
+
+def test_history_from_another_instance_appears(gui):
+    other = HistoryStore(gui.history_file)
+    other.append(HistoryRecord("2026-01-01 00:00:00", "40 + 2", "42"))
+    gui.sync_history()
+    assert gui.history_box.get(tk.END) == "[2026-01-01 00:00:00] 40 + 2 = 42"
+    assert gui.history_pager.records[-1].result == "42"
+
+
+def test_statistics_of_clipboard_sets_ans(gui):
+    gui.root.clipboard_clear()
+    gui.root.clipboard_append("1\n2\n3\n4\n")
+    gui.statistics()
+    wait_for_result(gui)
+    assert gui.entry_var.get() == "2.5"
+    assert gui.evaluator.ans == 2.5
+    assert "n=4" in gui.status_label.cget("text")
+
+
+def test_button_edits_redraw_once_per_idle_cycle(gui):
+    gui.entry_var.set("2*(")
+    writes = []
+    gui.entry_var.trace_add("write", lambda *_: writes.append(gui.entry_var.get()))
+    for ch in "1+3":
+        gui.append(ch)
+    gui.toggle_sign()
+    gui.backspace()
+    assert writes == []                 # nic nie rysujemy przed cyklem bezczynności
+    gui.root.update_idletasks()
+    assert gui.entry_var.get() == "2*(1+-"
+    assert gui.paren_label.cget("text") == "() depth: 1"
+    # Pisanie z klawiatury też trafia do bufora
+    gui.entry.insert(tk.END, "4))")
+    gui.append("5")
+    gui.root.update_idletasks()
+    assert gui.entry_var.get() == "2*(1+-4))5"
+    assert gui.paren_label.cget("text") == "() depth: -1"
@@ -0,0 +1,197 @@
+import pytest
+
+from src.calculator import logic
+from src.calculator.logic import (
+    Evaluator,
+    IncrementalParser,
+    compile_expression,
+    evaluate_expression,
+    format_number,
+)
+from src.calculator.units import (
+    DIMENSIONLESS,
+    UNITS,
+    Quantity,
+    UnitRegistry,
+    multiply_units,
+    pack_dimensions,
+    power_unit,
+    split_conversion,
+    unpack_dimensions,
+)
+
+
+@pytest.fixture
+def ev():
+    return Evaluator()
+
+
+# ────────────────────────────────────────────────
+# Dimensions and the registry
+# ────────────────────────────────────────────────
+
+def test_dimensions_pack_and_unpack():
+    dims = pack_dimensions([1, 1, -2])          # kg*m/s^2
+    assert unpack_dimensions(dims) == (1, 1, -2, 0, 0, 0, 0, 0)
+    assert UNITS.get("N").dims == dims
+    assert multiply_units(UNITS.get("m"), UNITS.get("m"), -1).dims == DIMENSIONLESS
+    assert power_unit(UNITS.get("s"), -3).dims == pack_dimensions([0, 0, -3])
+    with pytest.raises(ValueError):
+        power_unit(UNITS.get("m"), 10_000)
+
+
+@pytest.mark.parametrize("source, target, factor", [
+    ("ft", "in", 12.0),
+    ("mi", "km", 1.609344),
+    ("in", "cm", 2.54),
+    ("kWh", "J", 3.6e6),
+    ("GiB", "MiB", 1024.0),
+    ("h", "s", 3600.0),
+    ("lb", "oz", 16.0),
+])
+def test_pair_factors_are_correctly_rounded(source, target, factor):
+    assert UNITS.factor(UNITS.get(source), UNITS.get(target)) == factor
+
+
+def test_every_unit_is_one_word_for_the_lexer():
+    for name in UNITS.names():
+        assert compile_expression(f"2 {name}").variables == (name,)
+
+
+def test_registry_loads_tables_on_first_use():
+    calls = []
+
+    def table():
+        calls.append(1)
+        return [("yd", "0.9144 m"), ("furlong", "220 yd")]
+
+    registry = UnitRegistry()
+    registry.add_table(table)
+    registry.define("chain", "0.1 furlong")
+    assert calls == []
+    assert registry.factor(registry.get("furlong"), registry.get("chain")) == 10.0
+    assert calls == [1]
+    with pytest.raises(ValueError, match="Cannot convert"):
+        registry.factor(registry.get("chain"), registry.get("s"))
+
+
+@pytest.mark.parametrize("name, definition", [
+    ("m", "100 cm"),
+    ("2x", "1 m"),
+    ("foo", "3 parsec"),
+    ("bar", "1 m ! 2"),
+])
+def test_bad_definitions(name, definition):
+    registry = UnitRegistry()
+    registry.define(name, definition)
+    with pytest.raises(ValueError):
+        registry.get("m")
+
+
+# ────────────────────────────────────────────────
+# Arithmetic with quantities
+# ────────────────────────────────────────────────
+
+def test_quantity_arithmetic():
+    km, m = Quantity.of("km", 5), Quantity.of("m", 300)
+    assert km + m == Quantity.of("km", 5.3)
+    assert (m - km).unit.name == "m"
+    assert km / m == pytest.approx(5000 / 300)
+    assert str(Quantity.of("m", 3.0) ** 2) == "9.0 m^2"
+    assert str(2 / Quantity.of("s")) == "2.0 1/s"
+    with pytest.raises(ValueError, match="plain number"):
+        km + 1
+    with pytest.raises(ValueError, match="Cannot convert"):
+        km + Quantity.of("s")
+    with pytest.raises(ValueError, match="whole number"):
+        km ** 0.5
+
+
+@pytest.mark.parametrize("text, parts", [
+    ("5 km + 300 m in mi", ("5 km + 300 m", "mi")),
+    ("60 km/h to m/s", ("60 km/h", "m/s")),
+    ("5 ft in in", ("5 ft", "in")),
+    ("5 in", ("5 in", None)),
+    ("2 + 3", ("2 + 3", None)),
+])
+def test_split_conversion(text, parts):
+    assert split_conversion(text) == parts
+
+
+# ────────────────────────────────────────────────
+# Unit expressions in the evaluator
+# ────────────────────────────────────────────────
+
+@pytest.mark.parametrize("expression, value, unit", [
+    ("5 km + 300 m in mi", 5300 / 1609.344, "mi"),
+    ("60 km/h to m/s", 60 / 3.6, "m/s"),
+    ("100 m / (9.58 s)", 100 / 9.58, "m/s"),
+    ("3 ft^2 in in^2", 432.0, "in^2"),
+    ("2 h + 30 min in min", 150.0, "min"),
+    ("1 kWh in MJ", 3.6, "MJ"),
+    ("2 kg*m^2/s^2 in J", 2.0, "J"),
+    ("5 km", 5.0, "km"),
+])
+def test_unit_expressions(ev, expression, value, unit):
+    result = ev.compute(expression)
+    assert result.value == pytest.approx(value, rel=1e-15)
+    assert result.unit.name == unit
+    assert ev.ans == result.value
+
+
+@pytest.mark.parametrize("expression, text", [
+    ("2 m + km + km", "2002.0 m"),
+    ("km + 2 m", "1.002 km"),
+    ("s * m", "1.0 s*m"),
+])
+def test_unit_order_survives_compilation(expression, text):
+    # Skompilowany program nie może zamienić kolejności składników z jednostkami
+    ev = Evaluator()
+    runs = range(logic.COMPILE_THRESHOLD + 2)
+    assert {str(ev.compute(expression)) for _ in runs} == {text}
+
+
+def test_dimensionless_result_is_a_plain_number(ev):
+    assert ev.compute("km/m") == 1000.0
+    assert ev.compute("Ans m in cm") == Quantity.of("cm", 100_000.0)
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("5 km in s", "Cannot convert km to s"),
+    ("5 km + 3", "Cannot add km and a plain number"),
+    ("sin(5 m)", "plain numbers"),
+    ("5 km in 3 m", "Expected a unit"),
+    ("3 in km", "Cannot convert a plain number to km"),  # "in" to zawsze przeliczenie
+    ("5 parsec", "Unknown variable 'parsec'"),
+])
+def test_unit_errors(ev, expression, message):
+    with pytest.raises(ValueError, match=message):
+        ev.compute(expression)
+
+
+def test_plain_expressions_are_unchanged(ev):
+    assert ev.compute("2 + 3") == 5.0
+    assert "Unknown variable 'x'" in evaluate_expression("2x + 1")
+    assert ev.compute("x^2", {"x": 3}) == 9.0
+    exact = Evaluator(number_mode="EXACT")
+    exact.compute("1/3")
+    # Jednostki liczą się we float, także z dokładnym Ans
+    assert exact.compute("Ans m in cm").value == pytest.approx(100 / 3)
+
+
+def test_huge_exact_ans_only_matters_when_used():
+    exact = Evaluator(number_mode="EXACT")
+    exact.compute("1000!")
+    assert exact.compute("5 km + 300 m in mi").value == pytest.approx(5300 / 1609.344)
+    exact.compute("1000!")
+    with pytest.raises(ValueError, match="Ans is too large"):
+        exact.compute("Ans m in km")
+
+
+def test_format_and_preview(ev):
+    assert format_number(ev.compute("5 km + 300 m in mi")) == "3.29327 mi"
+    assert format_number(Quantity.of("m", 2.5), "FIXED", 2) == "2.5 m"
+    parser = IncrementalParser()
+    assert ev.preview(parser, "5 km").value == Quantity.of("km", 5.0)
+    assert ev.preview(parser, "5 km +") == (None, None)
+    assert isinstance(ev.preview(parser, "5 km + 1").error, ValueError)